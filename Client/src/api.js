@@ -6,18 +6,43 @@ const api = axios.create({
   baseURL: `${BASE_URL}/api`,
 })
 
+// Bytes per PUT; a dropped connection only costs the chunk in flight
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+const UPLOAD_MAX_RETRIES = 5
+
 export const uploadVideo = async (file, onProgress) => {
-  const formData = new FormData()
-  formData.append("file", file)
-
-  const response = await api.post("/upload", formData, {
-    onUploadProgress: (progressEvent) => {
-      const percentage = Math.round(
-        (progressEvent.loaded * 100) / progressEvent.total,
-      )
-      if (onProgress) onProgress(percentage)
-    },
-  })
+  const initData = new FormData()
+  initData.append("filename", file.name)
+  initData.append("total_size", file.size)
+  const { upload_id: uploadId } = (await api.post("/uploads", initData)).data
+
+  let offset = 0
+  let retries = 0
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE)
+    try {
+      const response = await api.put(`/uploads/${uploadId}`, chunk, {
+        params: { offset },
+        headers: { "Content-Type": "application/octet-stream" },
+        onUploadProgress: (progressEvent) => {
+          if (onProgress) {
+            onProgress(
+              Math.round(((offset + progressEvent.loaded) * 100) / file.size),
+            )
+          }
+        },
+      })
+      offset = response.data.offset
+      retries = 0
+    } catch (err) {
+      if (++retries > UPLOAD_MAX_RETRIES) throw err
+      // Resume from whatever the server actually stored
+      await new Promise((resolve) => setTimeout(resolve, 1000 * retries))
+      offset = (await api.get(`/uploads/${uploadId}`)).data.offset
+    }
+  }
+
+  const response = await api.post(`/uploads/${uploadId}/finalize`)
   return response.data
 }
 
@@ -27,6 +52,7 @@ export const startTranscription = async (
   mode,
   wordsPerLine,
   originalFilename,
+  contentHash,
 ) => {
   const formData = new FormData()
   formData.append("file_path", filePath)
@@ -34,6 +60,7 @@ export const startTranscription = async (
   formData.append("mode", mode)
   if (wordsPerLine) formData.append("words_per_line", wordsPerLine)
   if (originalFilename) formData.append("original_filename", originalFilename)
+  if (contentHash) formData.append("content_hash", contentHash)
 
   const response = await api.post("/transcribe", formData)
   return response.data
@@ -44,7 +71,23 @@ export const getJobStatus = async (jobId) => {
   return response.data
 }
 
-export const downloadSubtitles = (jobId) => {
-  window.open(`${BASE_URL}/api/download/${jobId}`, "_blank")
+// Opens a Server-Sent Events stream for a job. Returns a function that closes it.
+export const subscribeToJob = (jobId, { onStatus, onSegment, onError }) => {
+  const source = new EventSource(`${BASE_URL}/api/events/${jobId}`)
+  source.addEventListener("status", (e) => onStatus && onStatus(JSON.parse(e.data)))
+  source.addEventListener("segment", (e) => onSegment && onSegment(JSON.parse(e.data)))
+  source.onerror = (e) => onError && onError(e)
+  return () => source.close()
+}
+
+// Queued jobs are dropped; running ones stop at their next safe point
+export const cancelJob = async (jobId) => {
+  const response = await api.delete(`/jobs/${jobId}`)
+  return response.data
+}
+
+// format: "srt" (default), "vtt", "ass" or "json"
+export const downloadSubtitles = (jobId, format = "srt") => {
+  window.open(`${BASE_URL}/api/download/${jobId}?format=${format}`, "_blank")
 }
 
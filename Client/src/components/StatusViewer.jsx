@@ -5,8 +5,14 @@ import {
   AlertOctagon,
   Download,
   RefreshCw,
+  XCircle,
 } from "lucide-react"
-import { getJobStatus, downloadSubtitles } from "../api"
+import {
+  getJobStatus,
+  subscribeToJob,
+  downloadSubtitles,
+  cancelJob,
+} from "../api"
 import ProgressBar from "./ui/ProgressBar"
 import Button from "./ui/Button"
 
@@ -15,31 +21,64 @@ const StatusViewer = ({ jobId, onReset }) => {
   const [message, setMessage] = useState("Initializing...")
   const [progress, setProgress] = useState(0)
   const [error, setError] = useState(null)
+  const [format, setFormat] = useState("srt")
+  const [cancelling, setCancelling] = useState(false)
 
   useEffect(() => {
     if (!jobId) return
 
-    const interval = setInterval(async () => {
-      try {
-        const data = await getJobStatus(jobId)
-        setStatus(data.status)
-        setMessage(data.message)
-        // Ensure progress is a number
-        if (data.progress !== undefined) {
-          setProgress(data.progress)
-        }
+    let interval = null
+    let closeStream = null
 
-        if (data.status === "completed" || data.status === "failed") {
-          clearInterval(interval)
-          if (data.status === "failed") setError(data.message)
-          if (data.status === "completed") setProgress(100)
-        }
-      } catch (err) {
-        console.error("Polling error", err)
+    const applyUpdate = (data) => {
+      // SSE status events may carry only the fields that changed
+      if (data.status !== undefined) setStatus(data.status)
+      if (data.message !== undefined) setMessage(data.message)
+      // Ensure progress is a number
+      if (data.progress !== undefined) {
+        setProgress(data.progress)
       }
-    }, 1000)
 
-    return () => clearInterval(interval)
+      if (
+        data.status === "completed" ||
+        data.status === "failed" ||
+        data.status === "cancelled"
+      ) {
+        if (closeStream) closeStream()
+        if (interval) clearInterval(interval)
+        if (data.status === "failed") setError(data.message)
+        if (data.status === "completed") setProgress(100)
+      }
+    }
+
+    // Fallback for environments where the event stream can't be held open
+    const startPolling = () => {
+      if (interval) return
+      interval = setInterval(async () => {
+        try {
+          applyUpdate(await getJobStatus(jobId))
+        } catch (err) {
+          console.error("Polling error", err)
+        }
+      }, 1000)
+    }
+
+    if (typeof EventSource !== "undefined") {
+      closeStream = subscribeToJob(jobId, {
+        onStatus: applyUpdate,
+        onError: () => {
+          closeStream()
+          startPolling()
+        },
+      })
+    } else {
+      startPolling()
+    }
+
+    return () => {
+      if (closeStream) closeStream()
+      if (interval) clearInterval(interval)
+    }
   }, [jobId])
 
   // Auto-download when completed
@@ -54,6 +93,21 @@ const StatusViewer = ({ jobId, onReset }) => {
     }
   }, [status, jobId])
 
+  const handleCancel = async () => {
+    setCancelling(true)
+    try {
+      const data = await cancelJob(jobId)
+      // A queued job is cancelled at once; a running one reports it via status updates
+      if (data.status === "cancelled") {
+        setStatus("cancelled")
+        setMessage("Cancelled")
+      }
+    } catch (err) {
+      console.error("Cancel error", err)
+      setCancelling(false)
+    }
+  }
+
   const getStatusColor = () => {
     switch (status) {
       case "completed":
@@ -125,13 +179,25 @@ const StatusViewer = ({ jobId, onReset }) => {
       {/* Actions */}
       <div className="flex flex-col gap-3 pt-6 sm:pt-8">
         {status === "completed" && (
-          <Button
-            onClick={() => downloadSubtitles(jobId)}
-            className="w-full"
-            variant="primary"
-          >
-            <Download size={20} /> Download Subtitles
-          </Button>
+          <div className="flex gap-3">
+            <select
+              value={format}
+              onChange={(e) => setFormat(e.target.value)}
+              className="rounded-xl border border-white/10 bg-white/5 px-4 py-3 text-white focus:outline-none focus:ring-2 focus:ring-indigo-500/50 focus:border-indigo-500 transition-all"
+            >
+              <option value="srt" className="bg-gray-900">SRT</option>
+              <option value="vtt" className="bg-gray-900">WebVTT</option>
+              <option value="ass" className="bg-gray-900">ASS</option>
+              <option value="json" className="bg-gray-900">JSON</option>
+            </select>
+            <Button
+              onClick={() => downloadSubtitles(jobId, format)}
+              className="w-full"
+              variant="primary"
+            >
+              <Download size={20} /> Download Subtitles
+            </Button>
+          </div>
         )}
 
         {status === "failed" && (
@@ -140,7 +206,20 @@ const StatusViewer = ({ jobId, onReset }) => {
           </div>
         )}
 
-        {(status === "completed" || status === "failed") && (
+        {(status === "pending" || status === "processing") && (
+          <Button
+            onClick={handleCancel}
+            variant="secondary"
+            className="w-full"
+            disabled={cancelling}
+          >
+            <XCircle size={18} /> {cancelling ? "Cancelling..." : "Cancel"}
+          </Button>
+        )}
+
+        {(status === "completed" ||
+          status === "failed" ||
+          status === "cancelled") && (
           <Button onClick={onReset} variant="secondary" className="w-full">
             <RefreshCw size={18} /> Start New Transcription
           </Button>
@@ -31,6 +31,7 @@ const UploadForm = ({ onJobCreated, onError }) => {
         mode,
         wordsPerLine,
         uploadRes.original_filename,
+        uploadRes.content_hash,
       )
       onJobCreated(transcribeRes.job_id)
     } catch (err) {
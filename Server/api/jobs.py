@@ -0,0 +1,326 @@
+"""
+Job functions run by the scheduler: in the API process (JOB_BACKEND=local)
+or in worker processes (python worker.py) that claim them from the durable
+queue. Nothing here depends on the HTTP layer.
+"""
+import os
+import time
+import functools
+import logging
+from services.audio import SAMPLE_RATE, prepare_audio, probe_duration
+from services.transcription import get_cached_segments, needs_word_timestamps, run_whisper, refine_and_resegment
+from services.metrics import current_timer, stage, track_job
+from services.subtitle import OUTPUT_FORMATS, SUBTITLE_FORMATS, read_json_subtitles, write_subtitles
+from services.cancellation import JobCancelled, JobLost, check_cancelled, confirm_ownership, job_lost
+from services.cache import file_sha256
+from services.job_store import job_store
+from services.events import event_bus
+from services.models import DEFAULT_MODEL_SIZE
+from services.artifacts import ArtifactStore
+from services.batch import run_batch
+
+# Directories
+UPLOAD_DIR = "uploads"
+OUTPUT_DIR = "outputs"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# Content-addressed media lives under uploads/media; subtitle files stay in outputs/
+artifact_store = ArtifactStore(os.path.join(UPLOAD_DIR, "media"))
+
+logger = logging.getLogger(__name__)
+
+# Every job change is pushed to SSE subscribers; deleted jobs leave the bus
+job_store.add_listener(lambda job_id, fields: event_bus.publish(job_id, "status", fields))
+job_store.add_delete_listener(lambda job_ids: [event_bus.forget(job_id) for job_id in job_ids])
+
+def segment_publisher(job_id: str, stage: str):
+    """
+    Callback publishing segments as they are produced.
+    stage: 'draft' for raw Whisper text, 'final' for refined text
+    """
+    def publish(index, segment):
+        event_bus.publish(job_id, "segment", {
+            "index": index,
+            "stage": stage,
+            "start": segment["start"],
+            "end": segment["end"],
+            "text": segment["text"].strip(),
+        })
+    return publish
+
+def timed_job(fn):
+    """
+    Runs a job function with a JobTimer current on its thread, so pipeline
+    stages are timed into the job record and the process-wide metrics.
+    """
+    @functools.wraps(fn)
+    def run(job_id: str, *args, **kwargs):
+        created_at = (job_store.get(job_id) or {}).get("created_at")
+        with track_job(job_id, queued_seconds=time.time() - created_at if created_at else None):
+            return fn(job_id, *args, **kwargs)
+    return run
+
+def timing_fields(status: str) -> dict:
+    """Stage timings, RTF etc. of the current job, for its final job record update."""
+    timer = current_timer()
+    return timer.finish(status) if timer else {}
+
+def write_outputs(job_id: str, segments: list, formats: list = OUTPUT_FORMATS) -> dict:
+    """
+    Writes the job's subtitles in each format (always including JSON, which
+    other formats can later be rendered from). Files are named by job id so
+    jobs of the same source never overwrite each other.
+    """
+    outputs = {}
+    with stage("write"):
+        for fmt in dict.fromkeys([*formats, "json"]):
+            extension = SUBTITLE_FORMATS[fmt][1]
+            outputs[fmt] = write_subtitles(segments, os.path.join(OUTPUT_DIR, f"{job_id}{extension}"), fmt)
+            artifact_store.register(outputs[fmt], "output", owner=job_id)
+    return outputs
+
+def finish_job(job_id: str, raw_segments: list, mode: str, words_per_line: int = None, max_chars_per_line: int = None, original_filename: str = None, formats: list = OUTPUT_FORMATS, progress_callback=None, romanization_policy: str = None):
+    """
+    Stages after Whisper: refinement, resegmentation and writing the subtitle files.
+    """
+    segments = refine_and_resegment(
+        raw_segments, mode,
+        words_per_line=words_per_line,
+        max_chars=max_chars_per_line,
+        progress_callback=progress_callback,
+        segment_callback=segment_publisher(job_id, "final"),
+        romanization_policy=romanization_policy,
+    )
+
+    confirm_ownership()
+    job_store.update(job_id, message="Generating subtitles...", progress=95)
+    outputs = write_outputs(job_id, segments, formats)
+
+    base_name = os.path.splitext(original_filename)[0] if original_filename else job_id
+    job_store.update(
+        job_id,
+        status="completed",
+        message="Done",
+        progress=100,
+        outputs=outputs,
+        srt_path=outputs.get("srt"),
+        download_filename=f"{base_name}.srt", # Store the friendly name for download
+        **timing_fields("completed"),
+    )
+
+@timed_job
+def process_transcription(job_id: str, video_path: str, language: str, mode: str, words_per_line: int = None, original_filename: str = None, content_hash: str = None, model_size: str = DEFAULT_MODEL_SIZE, max_chars_per_line: int = None, romanization_policy: str = None, engine: str = None):
+    """
+    Runs the full transcription pipeline on a scheduler worker thread.
+    """
+    try:
+        job_store.update(job_id, status="processing", message="Checking transcript cache...", progress=5)
+
+        # Word alignment costs inference time; only resegmented jobs use it
+        word_timestamps = needs_word_timestamps(words_per_line, max_chars_per_line)
+
+        # 0. Identical media seen before? Then skip ffmpeg and Whisper entirely
+        if not content_hash:
+            with stage("hash"):
+                content_hash = file_sha256(video_path)
+        with stage("cache_lookup"):
+            raw_segments = get_cached_segments(content_hash, language, mode, model_size, engine, word_timestamps)
+        job_store.update(job_id, content_hash=content_hash, transcript_cache_hit=raw_segments is not None)
+        check_cancelled()
+        
+        # Callback to update progress from transcription service
+        def update_progress(data):
+            # Map transcription progress (0-100) to overall job progress (15-90)
+            # data can be a simple number or a dict if we want more info
+            if isinstance(data, (int, float)):
+                scaled_progress = 15 + (data * 0.75) 
+                job_store.update_progress(job_id, progress=int(scaled_progress))
+
+        if raw_segments is None:
+            job_store.update(job_id, message="Extracting audio...")
+
+            # 1. Extract Audio (decoded in memory unless AUDIO_DECODE_MODE=file or the media is very long)
+            audio_path = os.path.join(UPLOAD_DIR, f"{job_id}.wav")
+            with stage("decode"):
+                audio = prepare_audio(video_path, audio_path)
+            current_timer().media_seconds = (
+                len(audio) / SAMPLE_RATE if not isinstance(audio, str) else probe_duration(video_path)
+            )
+            
+            job_store.update(job_id, message="Transcribing...", progress=15)
+
+            # 2. Transcribe
+            raw_segments = run_whisper(
+                audio, language, mode,
+                progress_callback=update_progress,
+                content_hash=content_hash,
+                model_size=model_size,
+                engine=engine,
+                word_timestamps=word_timestamps,
+                segment_callback=segment_publisher(job_id, "draft"),
+            )
+            # Free the decoded PCM before the (possibly long) refinement stage
+            del audio
+        else:
+            job_store.update(job_id, message="Reusing cached transcription...", progress=50)
+            current_timer().media_seconds = probe_duration(video_path) or (raw_segments[-1]["end"] if raw_segments else None)
+            publish_draft = segment_publisher(job_id, "draft")
+            for index, segment in enumerate(raw_segments):
+                publish_draft(index, segment)
+
+        job_store.save_segments(job_id, raw_segments)
+        finish_job(
+            job_id, raw_segments, mode,
+            words_per_line=words_per_line,
+            max_chars_per_line=max_chars_per_line,
+            original_filename=original_filename,
+            progress_callback=update_progress,
+            romanization_policy=romanization_policy,
+        )
+        
+    except JobLost:
+        # Another worker owns the job now, including its WAV and media reference
+        logger.warning(f"Job {job_id} was taken over by another worker")
+    except JobCancelled:
+        logger.info(f"Job {job_id} cancelled")
+        job_store.update(job_id, status="cancelled", message="Cancelled", **timing_fields("cancelled"))
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        job_store.update(job_id, status="failed", message=str(e), **timing_fields("failed"))
+    finally:
+        if not job_lost():
+            # The extracted WAV is per job; the media stays cached until the sweeper evicts it
+            wav_path = os.path.join(UPLOAD_DIR, f"{job_id}.wav")
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+            artifact_store.release(video_path, job_id)
+
+@timed_job
+def process_derived(job_id: str, parent_id: str, mode: str, words_per_line: int = None, max_chars_per_line: int = None, output_format: str = None, romanization_policy: str = None):
+    """
+    Re-styles a finished job from its stored raw segments; Whisper never runs.
+    """
+    try:
+        parent = job_store.get(parent_id)
+        current_timer().media_seconds = (parent or {}).get("media_seconds")
+        formats = [output_format] if output_format else OUTPUT_FORMATS
+        unchanged = (
+            parent is not None
+            and mode == (parent.get("mode") or "native")
+            and words_per_line == parent.get("words_per_line")
+            and max_chars_per_line == parent.get("max_chars_per_line")
+            and (mode != "romanized" or romanization_policy == parent.get("romanization_policy"))
+        )
+        parent_json = (parent or {}).get("outputs", {}).get("json")
+
+        # Carried over so this job can be derived from in turn
+        raw_segments = job_store.get_segments(parent_id)
+        if raw_segments is not None:
+            job_store.save_segments(job_id, raw_segments)
+
+        if unchanged and parent_json and os.path.exists(parent_json):
+            # Only the output format differs: rewrite the parent's final cues
+            confirm_ownership()
+            job_store.update(job_id, status="processing", message="Generating subtitles...", progress=90)
+            outputs = write_outputs(job_id, read_json_subtitles(parent_json), formats)
+            job_store.update(
+                job_id,
+                status="completed",
+                message="Done",
+                progress=100,
+                outputs=outputs,
+                srt_path=outputs.get("srt"),
+                download_filename=parent.get("download_filename", f"{job_id}.srt"),
+                **timing_fields("completed"),
+            )
+            return
+
+        if raw_segments is None:
+            raise RuntimeError("Raw segments of the parent job are no longer stored")
+
+        job_store.update(job_id, status="processing", message="Reusing parent transcription...", progress=50)
+
+        def update_progress(data):
+            if isinstance(data, (int, float)):
+                job_store.update_progress(job_id, progress=int(15 + data * 0.75))
+
+        finish_job(
+            job_id, raw_segments, mode,
+            words_per_line=words_per_line,
+            max_chars_per_line=max_chars_per_line,
+            original_filename=(parent or {}).get("original_filename"),
+            formats=formats,
+            progress_callback=update_progress,
+            romanization_policy=romanization_policy,
+        )
+    except JobLost:
+        logger.warning(f"Job {job_id} was taken over by another worker")
+    except JobCancelled:
+        logger.info(f"Job {job_id} cancelled")
+        job_store.update(job_id, status="cancelled", message="Cancelled", **timing_fields("cancelled"))
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        job_store.update(job_id, status="failed", message=str(e), **timing_fields("failed"))
+
+@timed_job
+def process_batch(job_id: str, items: list, force: bool = False):
+    """
+    Runs a manifest through run_batch on one scheduler worker: one warm
+    model, ffmpeg decoding of the next file overlapped with inference.
+    """
+    total = len(items)
+    results = [{"path": item["path"], "status": "pending"} for item in items]
+    done = 0
+
+    def item_done(index, result):
+        nonlocal done
+        done += 1
+        results[index] = result
+        job_store.update(job_id, items=results, message=f"{done}/{total} files", progress=int(done / total * 100))
+
+    try:
+        job_store.update(job_id, status="processing", message=f"0/{total} files", progress=0)
+        summary = run_batch(items, force=force, item_callback=item_done)
+        confirm_ownership()
+        counts = {key: summary[key] for key in ("completed", "skipped", "failed")}
+        status = "failed" if counts["failed"] == total else "completed"
+        job_store.update(
+            job_id,
+            status=status,
+            message=f"{counts['completed']} transcribed, {counts['skipped']} up to date, {counts['failed']} failed",
+            progress=100,
+            items=summary["items"],
+            **counts,
+            **timing_fields(status),
+        )
+    except JobLost:
+        logger.warning(f"Batch {job_id} was taken over by another worker")
+    except JobCancelled:
+        logger.info(f"Batch {job_id} cancelled")
+        job_store.update(job_id, status="cancelled", message=f"Cancelled after {done}/{total} files", items=results, **timing_fields("cancelled"))
+    except Exception as e:
+        logger.error(f"Batch {job_id} failed: {e}")
+        job_store.update(job_id, status="failed", message=str(e), items=results, **timing_fields("failed"))
+    finally:
+        if not job_lost():
+            artifact_store.release_owner(job_id)
+
+def recover_expired(queue) -> dict:
+    """
+    Records what the durable queue did with jobs whose worker stopped
+    heartbeating: requeued ones are pending again, the rest are finished
+    and give up their files. Run by workers and by the API.
+    """
+    outcome = queue.requeue_expired()
+    for job_id in outcome["requeued"]:
+        logger.warning(f"Job {job_id} lost its worker, requeued")
+        job_store.update(job_id, status="pending", message="Requeued after its worker stopped responding", progress=0)
+    for job_id in outcome["failed"]:
+        logger.error(f"Job {job_id} lost its worker too many times")
+        job_store.update(job_id, status="failed", message=f"Worker lost {queue.max_attempts} times while running this job")
+        artifact_store.release_owner(job_id)
+    for job_id in outcome["cancelled"]:
+        job_store.update(job_id, status="cancelled", message="Cancelled")
+        artifact_store.release_owner(job_id)
+    return outcome
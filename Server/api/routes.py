@@ -1,186 +1,623 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
-import shutil
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 import os
+import time
 import uuid
 import logging
-import json
-from typing import Dict
-from services.audio import extract_audio
-from services.transcription import transcribe_audio
-from services.subtitle import generate_srt
+import threading
+import hashlib
+import asyncio
+import aiofiles
+from services.audio import probe_duration
+from services.transcription import transcript_cache
+from services.transliteration import normalize_policy
+from services.metrics import registry as metrics_registry
+from services.subtitle import SUBTITLE_FORMATS, read_json_subtitles, render_subtitles, write_subtitles
+from services.scheduler import JOB_BACKEND, QueueFullError, scheduler
+from services.job_queue import JOB_HEARTBEAT_SECONDS, JOB_LEASE_SECONDS
+from services.refinement import refinement_cache
+from services.cache import HASH_CHUNK_SIZE
+from services.job_store import FINISHED_STATUSES, job_store
+from services.events import event_bus, format_sse
+from services.models import DEFAULT_MODEL_SIZE, model_registry, validate_model
+from services.lifecycle import lifecycle
+from services.uploads import MAX_UPLOAD_BYTES, UploadManager, UploadNotFound, UploadOffsetMismatch, UploadTooLarge
+from services.batch import load_manifest
+from api.jobs import OUTPUT_DIR, UPLOAD_DIR, artifact_store, process_batch, process_derived, process_transcription, recover_expired
 
 router = APIRouter()
 
-# Directories
-UPLOAD_DIR = "uploads"
-OUTPUT_DIR = "outputs"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# /api/batch writes here (kept across runs so up-to-date files are skipped; not swept)
+BATCH_OUTPUT_DIR = os.getenv("BATCH_OUTPUT_DIR", "batch_outputs")
 
-# Persistence File
+uploads = UploadManager(UPLOAD_DIR)
+
+# Legacy persistence file, imported into the job store once
 JOBS_FILE = "jobs.json"
 
 logger = logging.getLogger(__name__)
 
-def load_jobs() -> Dict[str, Dict]:
-    if os.path.exists(JOBS_FILE):
-        try:
-            with open(JOBS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Failed to load jobs: {e}")
-    return {}
+# Files from before the artifact store (and from older versions) become sweepable
+def output_owner(path: str):
+    # Outputs are named after their job; older ones after the upload and stay unowned
+    job_id = os.path.splitext(os.path.basename(path))[0]
+    return job_id if job_store.get(job_id) is not None else None
 
-def save_jobs():
-    try:
-        with open(JOBS_FILE, "w", encoding="utf-8") as f:
-            json.dump(jobs, f, indent=4)
-    except Exception as e:
-        logger.error(f"Failed to save jobs: {e}")
+def scan_artifacts():
+    artifact_store.scan(UPLOAD_DIR, "media")
+    artifact_store.scan(OUTPUT_DIR, "output", owner_of=output_owner)
+
+# A deleted or purged job takes its subtitle files with it
+job_store.add_delete_listener(lambda job_ids: [artifact_store.release_owner(job_id, delete=True) for job_id in job_ids])
 
-# Load jobs on startup
-jobs: Dict[str, Dict] = load_jobs()
+def drop_rejected_job(job_id: str):
+    """
+    Removes a job the queue turned away. Its references are released
+    first so the delete listener leaves the media in place: the client is
+    told to retry with the same upload.
+    """
+    artifact_store.release_owner(job_id)
+    job_store.delete(job_id)
 
-async def process_transcription(job_id: str, video_path: str, language: str, mode: str, words_per_line: int = None, original_filename: str = None):
+def recover_jobs():
     """
-    Background task to handle the full transcription pipeline.
+    Legacy jobs.json import, then jobs a previous process left unfinished:
+    locally queued jobs lived in its memory and cannot resume; jobs in the
+    durable queue (JOB_BACKEND=queue) carry on. Sibling API processes
+    create a job's record just before enqueueing it, so in queue mode only
+    jobs untouched for a lease period count as lost.
     """
     try:
-        jobs[job_id]["status"] = "processing"
-        jobs[job_id]["message"] = "Extracting audio..."
-        jobs[job_id]["progress"] = 5
-        save_jobs()
-        
-        # 1. Extract Audio
-        audio_path = os.path.join(UPLOAD_DIR, f"{job_id}.wav")
-        extract_audio(video_path, audio_path)
-        
-        jobs[job_id]["message"] = "Transcribing..."
-        jobs[job_id]["progress"] = 15
-        save_jobs()
-        
-        # Callback to update progress from transcription service
-        def update_progress(data):
-            # Map transcription progress (0-100) to overall job progress (15-90)
-            # data can be a simple number or a dict if we want more info
-            if isinstance(data, (int, float)):
-                scaled_progress = 15 + (data * 0.75) 
-                jobs[job_id]["progress"] = int(scaled_progress)
-                save_jobs()
-
-        # 2. Transcribe
-        segments = transcribe_audio(audio_path, language, mode, words_per_line=words_per_line, progress_callback=update_progress)
-        
-        jobs[job_id]["message"] = "Generating subtitles..."
-        jobs[job_id]["progress"] = 95
-        save_jobs()
-        
-        # 3. Generate SRT
-        srt_content = generate_srt(segments)
-        
-        # Determine SRT filename
-        if original_filename:
-             base_name = os.path.splitext(original_filename)[0]
-             srt_filename = f"{base_name}.srt"
-        else:
-             srt_filename = f"{job_id}.srt"
-             
-        srt_path = os.path.join(OUTPUT_DIR, srt_filename)
-        
-        with open(srt_path, "w", encoding="utf-8") as f:
-            f.write(srt_content)
-            
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["message"] = "Done"
-        jobs[job_id]["progress"] = 100
-        jobs[job_id]["srt_path"] = srt_path
-        jobs[job_id]["download_filename"] = srt_filename # Store the friendly name for download
-        save_jobs()
-        
-        # Cleanup audio/video temp files (optional - keeping for debug for now)
-        # os.remove(video_path)
-        # os.remove(audio_path)
-        
+        migrated = job_store.import_json(JOBS_FILE)
+        if migrated:
+            logger.info(f"Imported {migrated} jobs from {JOBS_FILE}")
     except Exception as e:
-        logger.error(f"Job {job_id} failed: {e}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["message"] = str(e)
-        save_jobs()
+        logger.error(f"Failed to import {JOBS_FILE}: {e}")
+
+    if JOB_BACKEND == "queue":
+        interrupted = job_store.fail_interrupted(keep=scheduler.contains, min_age=JOB_LEASE_SECONDS)
+    else:
+        interrupted = job_store.fail_interrupted()
+    for interrupted_id in interrupted:
+        artifact_store.release_owner(interrupted_id)
+
+def start_maintenance():
+    """
+    Startup work of a serving process, called from the app lifespan so that
+    importing this module (uvicorn's reloader, every worker process) stays
+    cheap: recovers interrupted jobs, then runs in the background the
+    artifact scan, stale partial upload cleanup, job retention and the
+    artifact TTL/quota sweep.
+    """
+    recover_jobs()
+    threading.Thread(target=scan_artifacts, name="artifact-scan", daemon=True).start()
+    artifact_store.start_sweeper(tasks=[uploads.purge_stale, job_store.purge_expired])
+    if JOB_BACKEND == "queue":
+        threading.Thread(target=monitor_queue, name="queue-monitor", daemon=True).start()
+
+def monitor_queue():
+    """
+    JOB_BACKEND=queue: jobs run in worker processes, so their status changes
+    never reach this process's event bus. Every heartbeat interval this
+    publishes a fresh snapshot of each job with an open SSE stream when it
+    changed, and requeues the jobs of workers that stopped heartbeating
+    (in case no other worker is alive to do it).
+    """
+    seen = {}
+    while True:
+        try:
+            recover_expired(scheduler)
+            subscribed = event_bus.subscribed_jobs()
+            for job_id in subscribed:
+                job = job_store.get(job_id)
+                if job is None:
+                    continue
+                state = (job.get("status"), job.get("progress"), job.get("message"))
+                if seen.get(job_id) != state:
+                    seen[job_id] = state
+                    event_bus.publish(job_id, "status", job)
+            seen = {job_id: state for job_id, state in seen.items() if job_id in subscribed}
+        except Exception as e:
+            print(f"Queue monitor failed: {e}")
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+
+# Metrics read from the other components whenever /metrics is scraped
+CACHES = {"refinement": refinement_cache, "transcripts": transcript_cache}
+
+def cache_samples(key: str):
+    return lambda: [({"cache": name}, cache.stats()[key]) for name, cache in CACHES.items()]
+
+metrics_registry.callback("matrix_queue_depth", "Jobs waiting for a worker.", lambda: scheduler.stats()["queued"])
+metrics_registry.callback("matrix_jobs_running", "Jobs currently on a worker.", lambda: scheduler.stats()["running"])
+metrics_registry.callback("matrix_jobs_stored", "Jobs in the job store by status.", lambda: [({"status": status}, count) for status, count in job_store.counts().items()])
+metrics_registry.callback("matrix_cache_hits_total", "Cache hits.", cache_samples("hits"), kind="counter")
+metrics_registry.callback("matrix_cache_misses_total", "Cache misses.", cache_samples("misses"), kind="counter")
+metrics_registry.callback("matrix_cache_evictions_total", "Cache evictions.", cache_samples("evictions"), kind="counter")
+metrics_registry.callback("matrix_cache_entries", "Entries stored per cache.", cache_samples("entries"))
+metrics_registry.callback("matrix_models_resident", "Whisper models currently loaded.", lambda: len(model_registry.resident()))
+metrics_registry.callback("matrix_ready", "1 once heavy imports and preloaded models are ready.", lambda: int(lifecycle.readiness()["ready"]))
+metrics_registry.callback("matrix_startup_seconds", "Seconds from process start until requests were accepted.", lambda: lifecycle.startup_seconds or 0)
+metrics_registry.callback("matrix_artifact_bytes", "Disk used by tracked media and subtitle files.", lambda: artifact_store.stats()["bytes"])
+metrics_registry.callback("matrix_artifact_evictions_total", "Files removed by TTL, quota or job deletion.", lambda: artifact_store.evictions, kind="counter")
+metrics_registry.callback("matrix_sse_subscribers", "Open Server-Sent Events streams.", event_bus.subscriber_count)
+
+# Seconds between SSE keep-alive comments on a quiet stream
+SSE_KEEPALIVE_SECONDS = 15
 
 @router.post("/upload")
 async def upload_video(file: UploadFile = File(...)):
     """
     Uploads a video file and returns a temporary file ID.
+    The content hash is computed while the bytes are written so repeat
+    uploads of the same media can reuse cached transcriptions.
     """
     file_id = str(uuid.uuid4())
     file_extension = os.path.splitext(file.filename)[1]
     file_path = os.path.join(UPLOAD_DIR, f"{file_id}{file_extension}")
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    digest = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await file.read(HASH_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                break
+            digest.update(chunk)
+            await buffer.write(chunk)
+    if size > MAX_UPLOAD_BYTES:
+        os.remove(file_path)
+        raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES} byte upload limit")
+
+    file_path = await run_in_threadpool(artifact_store.store_media, file_path, digest.hexdigest(), file_extension)
         
     return {
         "file_id": file_id, 
         "file_path": file_path,
-        "original_filename": file.filename
+        "original_filename": file.filename,
+        "content_hash": digest.hexdigest()
     }
 
+# --------------------------------------------------------------------------
+# Resumable chunked uploads: init -> PUT chunks at an offset -> finalize
+# --------------------------------------------------------------------------
+@router.post("/uploads")
+async def init_upload(filename: str = Form(...), total_size: int = Form(None)):
+    try:
+        return uploads.init(filename, total_size)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """
+    Returns the number of bytes received so far; clients resume from this offset.
+    """
+    try:
+        return await uploads.status(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+@router.put("/uploads/{upload_id}")
+async def append_upload(upload_id: str, request: Request, offset: int):
+    """
+    Appends the raw request body at `offset`.
+    """
+    try:
+        return await uploads.append(upload_id, offset, request.stream())
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Upload-Offset": str(e.expected)})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str):
+    try:
+        result = await uploads.finalize(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete: {e}", headers={"Upload-Offset": str(e.expected)})
+    extension = os.path.splitext(result["original_filename"])[1]
+    result["file_path"] = await run_in_threadpool(artifact_store.store_media, result["file_path"], result["content_hash"], extension)
+    return result
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    try:
+        await uploads.abort(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return {"upload_id": upload_id, "status": "aborted"}
+
 @router.post("/transcribe")
 async def start_transcription(
-    background_tasks: BackgroundTasks,
     file_path: str = Form(...),
     language: str = Form(...),
     mode: str = Form(...),
     words_per_line: int = Form(None),
-    original_filename: str = Form(None)
+    max_chars_per_line: int = Form(None),
+    original_filename: str = Form(None),
+    content_hash: str = Form(None),
+    model_size: str = Form(None),
+    romanization_policy: str = Form(None),
+    priority: int = Form(0),
+    engine: str = Form(None)
 ):
     """
-    Starts the transcription process in the background.
+    Queues the transcription on the worker pool.
+    engine: inference backend ('whisper', 'whisper-int8', 'faster-whisper'),
+            WHISPER_ENGINE if not given
+    priority: higher runs first; with QUEUE_POLICY=shortest-first, equal
+              priorities run shortest media first
+    Responds 503 when the queue is full so clients can retry later.
     """
+    model_size = model_size or DEFAULT_MODEL_SIZE
+    try:
+        engine = await run_in_threadpool(validate_model, model_size, engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        romanization_policy = normalize_policy(romanization_policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {
+    # Held until the job finishes, so the sweeper can't evict the media under it
+    if not artifact_store.acquire(file_path, job_id):
+        raise HTTPException(status_code=404, detail="Uploaded file not found (it may have expired); please upload it again")
+
+    job_store.create(job_id, {
         "status": "pending",
         "message": "Queued",
         "progress": 0,
-        "srt_path": None
-    }
-    save_jobs()
+        "srt_path": None,
+        "model_size": model_size,
+        "engine": engine,
+        "language": language,
+        "mode": mode,
+        "words_per_line": words_per_line,
+        "max_chars_per_line": max_chars_per_line,
+        "romanization_policy": romanization_policy,
+        "original_filename": original_filename,
+        "priority": priority,
+    })
+
+    # Only the shortest-first policy needs the duration up front
+    media_seconds = await run_in_threadpool(probe_duration, file_path) if scheduler.policy == "shortest-first" else None
     
-    background_tasks.add_task(process_transcription, job_id, file_path, language, mode, words_per_line, original_filename)
+    try:
+        position = scheduler.submit(
+            job_id, process_transcription, job_id, file_path, language, mode,
+            priority=priority,
+            media_seconds=media_seconds,
+            words_per_line=words_per_line,
+            original_filename=original_filename,
+            content_hash=content_hash,
+            model_size=model_size,
+            max_chars_per_line=max_chars_per_line,
+            romanization_policy=romanization_policy,
+            engine=engine,
+        )
+    except QueueFullError as e:
+        drop_rejected_job(job_id)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     
-    return {"job_id": job_id}
+    return {"job_id": job_id, "queue_position": position}
+
+@router.post("/jobs/{job_id}/derive")
+async def derive_job(
+    job_id: str,
+    mode: str = Form(None),
+    words_per_line: int = Form(None),
+    max_chars_per_line: int = Form(None),
+    output_format: str = Form(None),
+    romanization_policy: str = Form(None),
+    priority: int = Form(0),
+):
+    """
+    Creates a new job from a finished one with a different mode, line
+    settings or output format. The parent's raw Whisper segments are reused,
+    so only refinement, resegmentation and writing run again.
+    Settings left out are inherited from the parent.
+    """
+    parent = job_store.get(job_id)
+    if parent is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if parent["status"] != "completed":
+        raise HTTPException(status_code=400, detail="Job not completed")
+    if output_format is not None and output_format not in SUBTITLE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{output_format}'. Available: {', '.join(SUBTITLE_FORMATS)}")
+
+    try:
+        romanization_policy = normalize_policy(romanization_policy or parent.get("romanization_policy"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    settings = {
+        "mode": mode or parent.get("mode") or "native",
+        "romanization_policy": romanization_policy,
+        "words_per_line": words_per_line if words_per_line is not None else parent.get("words_per_line"),
+        "max_chars_per_line": max_chars_per_line if max_chars_per_line is not None else parent.get("max_chars_per_line"),
+    }
+
+    derived_id = str(uuid.uuid4())
+    job_store.create(derived_id, {
+        "status": "pending",
+        "message": "Queued",
+        "progress": 0,
+        "srt_path": None,
+        "parent_job_id": job_id,
+        "model_size": parent.get("model_size"),
+        "engine": parent.get("engine"),
+        "language": parent.get("language"),
+        "original_filename": parent.get("original_filename"),
+        "content_hash": parent.get("content_hash"),
+        "priority": priority,
+        **settings,
+    })
+
+    try:
+        position = scheduler.submit(
+            derived_id, process_derived, derived_id, job_id,
+            priority=priority,
+            media_seconds=parent.get("media_seconds"),
+            output_format=output_format,
+            **settings,
+        )
+    except QueueFullError as e:
+        drop_rejected_job(derived_id)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    return {"job_id": derived_id, "parent_job_id": job_id, "queue_position": position}
+
+@router.post("/batch")
+async def start_batch(request: Request):
+    """
+    Queues a whole backlog as one job. The JSON body is a manifest of
+    server-side media paths (see services/batch.py):
+
+        {"defaults": {"language": "hi", "mode": "native", "formats": ["srt", "vtt"]},
+         "items": ["media/a.mp4", {"path": "media/b.mp4", "mode": "translate"}],
+         "force": false, "priority": 0}
+
+    Outputs go under BATCH_OUTPUT_DIR ('output' / 'output_dir' are relative
+    to it); files whose outputs are newer than the source are skipped
+    unless force is set. Progress and per-file results are in the job
+    record (GET /api/status/{job_id}); DELETE /api/jobs/{job_id} stops it.
+    """
+    try:
+        manifest = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON manifest")
+    options = manifest if isinstance(manifest, dict) else {}
+    try:
+        priority = int(options.get("priority") or 0)
+        items = load_manifest(manifest, output_root=BATCH_OUTPUT_DIR)
+        engines = {}
+        for item in items:
+            requested = (item["model_size"], item["engine"])
+            if requested not in engines:
+                engines[requested] = await run_in_threadpool(validate_model, *requested)
+            item["engine"] = engines[requested]
+            item["romanization_policy"] = normalize_policy(item["romanization_policy"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job_id = str(uuid.uuid4())
+    # Media from uploads/ is held until the batch is done; missing files fail individually
+    for item in items:
+        artifact_store.acquire(item["path"], job_id)
+
+    job_store.create(job_id, {
+        "kind": "batch",
+        "status": "pending",
+        "message": "Queued",
+        "progress": 0,
+        "srt_path": None,
+        "total": len(items),
+        "force": bool(options.get("force")),
+        "priority": priority,
+        "items": [{"path": item["path"], "status": "pending"} for item in items],
+    })
+
+    try:
+        position = scheduler.submit(job_id, process_batch, job_id, items, force=bool(options.get("force")), priority=priority)
+    except QueueFullError as e:
+        drop_rejected_job(job_id)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    return {"job_id": job_id, "files": len(items), "queue_position": position}
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancels a queued or running job. A queued job is dropped right away
+    (200). A running one is signalled (202) and stops at its next safe
+    point: ffmpeg is killed, Whisper stops before its next 30 s window and
+    pending LLM calls are cancelled; its status then becomes 'cancelled'.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+
+    if scheduler.cancel(job_id) == "cancelling":
+        return JSONResponse({"job_id": job_id, "status": "cancelling"}, status_code=202)
+
+    # Dropped from the queue (or never queued in this process): it will not run
+    job_store.update(job_id, status="cancelled", message="Cancelled")
+    artifact_store.release_owner(job_id)
+    return {"job_id": job_id, "status": "cancelled"}
 
 @router.get("/status/{job_id}")
 async def get_status(job_id: str):
-    if job_id not in jobs:
-        # Try reloading just in case another worker updated it (though we are single process usually)
-        # global jobs
-        # jobs = load_jobs()
-        pass
-        
-    if job_id not in jobs:
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return jobs[job_id]
+    if job["status"] == "pending":
+        position = scheduler.queue_position(job_id)
+        if position:
+            job["queue_position"] = position
+            job["message"] = f"Queued (position {position})"
+    return job
+
+@router.get("/events/{job_id}")
+async def stream_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream for one job.
+    Sends a 'status' snapshot first, then every 'status' change and each
+    'segment' (draft Whisper text, then refined text) as it is produced.
+    Reconnecting clients get missed segments replayed via Last-Event-ID.
+    The stream ends once the job completes or fails.
+    With JOB_BACKEND=queue the job runs in a worker process: status is
+    relayed by monitor_queue and segment events are not streamed.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    try:
+        last_event_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_event_id = 0
+
+    async def stream():
+        queue, replay = event_bus.subscribe(job_id, last_event_id)
+        try:
+            # Read the snapshot after subscribing so no change falls in between
+            snapshot = job_store.get(job_id) or job
+            if snapshot["status"] == "pending":
+                position = scheduler.queue_position(job_id)
+                if position:
+                    snapshot["queue_position"] = position
+            yield format_sse({"id": last_event_id, "event": "status", "data": snapshot})
+            for event in replay:
+                yield format_sse(event)
+            if snapshot["status"] in FINISHED_STATUSES:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+                if event["event"] == "status" and event["data"].get("status") in FINISHED_STATUSES:
+                    return
+        finally:
+            event_bus.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/jobs/{job_id}/segments")
+async def get_partial_segments(job_id: str, format: str = "json"):
+    """
+    Subtitles produced so far for a running job (refined text where available).
+    format: 'json' (with stage per segment) or a subtitle format (srt, vtt, ass)
+    Empty with JOB_BACKEND=queue, where segments stay in the worker process.
+    """
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    segments = event_bus.partial_segments(job_id) or []
+    if format != "json":
+        if format not in SUBTITLE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unknown format '{format}'")
+        return PlainTextResponse(render_subtitles(segments, format), media_type=SUBTITLE_FORMATS[format][2])
+    return {"job_id": job_id, "segments": segments}
+
+@router.get("/jobs")
+async def list_jobs(status: str = None, limit: int = 100):
+    return {
+        "counts": job_store.counts(),
+        "jobs": job_store.list(status=status, limit=min(max(1, limit), 1000)),
+    }
+
+@router.get("/models")
+async def get_models():
+    return model_registry.stats()
+
+@router.get("/queue")
+async def get_queue():
+    return scheduler.stats()
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {
+        "refinement": refinement_cache.stats(),
+        "transcripts": transcript_cache.stats(),
+        "artifacts": artifact_store.stats(),
+    }
+
+def subtitle_output(job_id: str, job: dict, fmt: str) -> str:
+    """
+    Path of the job's subtitles in fmt. Formats not written at completion
+    are rendered once from the stored JSON output and remembered.
+    """
+    outputs = dict(job.get("outputs") or {})
+    if fmt == "srt" and "srt" not in outputs and job.get("srt_path"):
+        outputs["srt"] = job["srt_path"]  # jobs finished before multi-format output
+    if fmt in outputs and os.path.exists(outputs[fmt]):
+        return outputs[fmt]
+
+    source = outputs.get("json")
+    if not source or not os.path.exists(source):
+        raise HTTPException(status_code=404, detail=f"{fmt.upper()} subtitles are not available for this job")
+    path = os.path.splitext(source)[0] + SUBTITLE_FORMATS[fmt][1]
+    write_subtitles(read_json_subtitles(source), path, fmt)
+    artifact_store.register(path, "output", owner=job_id)
+    outputs[fmt] = path
+    job_store.update(job_id, outputs=outputs)
+    return path
+
+@router.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return lifecycle.health()
+
+@router.get("/ready")
+async def ready():
+    """Readiness: 200 once models are warm, 503 (with details) until then."""
+    status = lifecycle.readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@router.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of the metrics in services/metrics.py."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @router.get("/download/{job_id}")
-async def download_subtitle(job_id: str):
-    if job_id not in jobs:
+async def download_subtitle(job_id: str, format: str = "srt"):
+    """format: srt (default), vtt, ass or json"""
+    job = job_store.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
         
-    if jobs[job_id]["status"] != "completed":
+    if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Job not completed")
-    
-    # Verify file exists
-    if not os.path.exists(jobs[job_id]["srt_path"]):
-         raise HTTPException(status_code=404, detail="SRT file missing from disk")
+
+    if format not in SUBTITLE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Available: {', '.join(SUBTITLE_FORMATS)}")
+
+    path = await run_in_threadpool(subtitle_output, job_id, job, format)
 
     # Use the friendly filename if available, otherwise default
-    download_name = jobs[job_id].get("download_filename", "subtitles.srt")
+    base_name = os.path.splitext(job.get("download_filename", "subtitles.srt"))[0]
+    _, extension, media_type = SUBTITLE_FORMATS[format]
 
     return FileResponse(
-        jobs[job_id]["srt_path"], 
-        media_type="application/x-subrip", 
-        filename=download_name
+        path, 
+        media_type=media_type, 
+        filename=f"{base_name}{extension}"
     )
@@ -0,0 +1,81 @@
+"""
+Transcribes a backlog of media files without the HTTP server, keeping one
+model loaded and decoding the next file while the current one transcribes.
+
+    python batch.py videos/*.mp4 --language hi --mode native --output-dir subs
+    python batch.py nightly.json --formats srt vtt
+
+A .json argument is a manifest (see services/batch.py); relative paths in
+it resolve against the manifest's directory. Flags given here override the
+manifest's defaults; settings on individual items still win. Files whose
+outputs are newer than the source are skipped unless --force is given.
+Prints a JSON summary and exits with status 1 if any file failed.
+"""
+import os
+import sys
+import json
+import argparse
+
+from services.batch import load_manifest, run_batch
+from services.models import validate_model
+from services.subtitle import SUBTITLE_FORMATS
+from services.transliteration import normalize_policy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="media files, or one manifest .json")
+    parser.add_argument("--language", help="'en', 'hi', 'gu', ...")
+    parser.add_argument("--mode", choices=["native", "romanized", "translate"])
+    parser.add_argument("--model", dest="model_size", help="model size (default WHISPER_MODEL)")
+    parser.add_argument("--engine", help="whisper, whisper-int8 or faster-whisper (default WHISPER_ENGINE)")
+    parser.add_argument("--words-per-line", type=int)
+    parser.add_argument("--max-chars", dest="max_chars_per_line", type=int)
+    parser.add_argument("--romanization-policy", choices=["llm", "local", "local-then-llm"])
+    parser.add_argument("--formats", nargs="+", choices=list(SUBTITLE_FORMATS))
+    parser.add_argument("--output-dir", help="where subtitles go (default: next to each file)")
+    parser.add_argument("--force", action="store_true", help="re-transcribe files whose outputs are up to date")
+    parser.add_argument("--prefetch", type=int, help="files decoded ahead (default BATCH_PREFETCH)")
+    parser.add_argument("--summary", help="also write the JSON summary to this file")
+    args = parser.parse_args()
+
+    overrides = {
+        key: value for key, value in vars(args).items()
+        if value is not None and key not in ("inputs", "force", "prefetch", "summary")
+    }
+    if len(args.inputs) == 1 and args.inputs[0].endswith(".json"):
+        with open(args.inputs[0], encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, list):
+            manifest = {"items": manifest}
+        manifest["defaults"] = {**(manifest.get("defaults") or {}), **overrides}
+        base_dir = os.path.dirname(os.path.abspath(args.inputs[0]))
+    else:
+        manifest = {"defaults": overrides, "items": args.inputs}
+        base_dir = None
+
+    try:
+        items = load_manifest(manifest, base_dir=base_dir)
+        for item in items:
+            item["engine"] = validate_model(item["model_size"], item["engine"])
+            item["romanization_policy"] = normalize_policy(item["romanization_policy"])
+    except ValueError as e:
+        sys.exit(f"Invalid batch: {e}")
+
+    def report(index, result):
+        detail = result.get("error") or (f"{result['seconds']}s" if "seconds" in result else "up to date")
+        print(f"[{result['status']}] {result['path']} ({detail})", file=sys.stderr)
+
+    options = {"prefetch": args.prefetch} if args.prefetch is not None else {}
+    summary = run_batch(items, force=args.force, item_callback=report, **options)
+
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    print(text)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compares single-pass Whisper against long-media chunked mode on CPU.
+
+    python benchmarks/chunked_speedup.py lecture.mp4 --workers 2 4 --model base
+
+Model loading is excluded from both timings: the single-pass model and every
+chunk worker pool are warmed up on a short clip before the clock starts.
+Prints a JSON report with wall time, real-time factor and speedup per run.
+
+Speedup is bounded by cores: each worker runs a whole model, so on a
+machine with fewer cores than workers chunked mode only adds overhead.
+
+No speedup has been measured with Whisper yet: the numbers for single
+pass vs chunked mode on real media and a multi-core CPU are still to be
+collected with this script. The only run so far was synthetic (1 core, a
+stand-in model taking 0.5 s per 30 s window, 30 min of audio, 600 s
+chunks), which only shows the scheduling bounds:
+
+    window is CPU-bound     2 workers 0.97x, 4 workers 0.96x
+    window waits (no CPU)   2 workers 1.48x, 3 workers 2.80x, 4 workers 2.85x
+
+The second row is the ceiling for three 600 s chunks, e.g. on a box with
+a core per worker.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.audio import SAMPLE_RATE, decode_audio
+from services.chunked import transcribe_chunked, CHUNK_SECONDS, CHUNK_OVERLAP_SECONDS
+from services.transcription import load_model, whisper_options
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("media", help="audio/video file to transcribe")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    audio = decode_audio(args.media)
+    duration = len(audio) / SAMPLE_RATE
+    options = whisper_options(args.language, "native")
+    warmup = audio[: SAMPLE_RATE * 5]
+
+    model = load_model(args.model)
+    model.transcribe(warmup, **options)
+    start = time.perf_counter()
+    single = model.transcribe(audio, **options)["segments"]
+    single_seconds = time.perf_counter() - start
+
+    report = {
+        "media": os.path.basename(args.media),
+        "duration_seconds": round(duration, 2),
+        "model": args.model,
+        "cpu_count": os.cpu_count(),
+        "chunk_seconds": CHUNK_SECONDS,
+        "overlap_seconds": CHUNK_OVERLAP_SECONDS,
+        "single_pass": {
+            "seconds": round(single_seconds, 2),
+            "rtf": round(single_seconds / duration, 4),
+            "segments": len(single),
+        },
+        "chunked": [],
+    }
+
+    for workers in args.workers:
+        # Submitting one short window per worker spawns every process and loads its model
+        transcribe_chunked(
+            audio[: SAMPLE_RATE * 5 * workers], options, args.model, workers=workers,
+            chunk_seconds=5, overlap_seconds=0,
+        )
+        start = time.perf_counter()
+        segments = transcribe_chunked(audio, options, args.model, workers=workers)
+        seconds = time.perf_counter() - start
+        report["chunked"].append({
+            "workers": workers,
+            "seconds": round(seconds, 2),
+            "rtf": round(seconds / duration, 4),
+            "speedup": round(single_seconds / seconds, 2),
+            "segments": len(segments),
+        })
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Compares inference engines on sample audio: load time, transcription speed
+and word error rate.
+
+    python benchmarks/engines.py samples/*.wav --model small --language en \\
+        --engines whisper whisper-int8 faster-whisper --references samples/
+
+For every audio file, a reference transcript is read from
+<references>/<file stem>.txt when --references is given. Otherwise the
+first engine's output serves as the reference, so the WER column shows how
+far the other engines drift from it. Text is compared after lowercasing and
+stripping punctuation. Prints a JSON report (per file and totals per engine).
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from services.audio import SAMPLE_RATE, decode_audio
+from services.engines import ENGINES, get_engine
+from services.models import model_registry
+from services.transcription import whisper_options
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s']|_")
+
+
+def normalize_words(text: str):
+    return _PUNCTUATION_RE.sub(" ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis) -> int:
+    """Word-level Levenshtein distance (substitutions + deletions + insertions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", nargs="+", help="audio or video files")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), help="engines to compare; the first is the baseline")
+    parser.add_argument("--model", default="small", help="model size")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--mode", default="native", help="decode options as for a job in this mode")
+    parser.add_argument("--references", help="directory with <stem>.txt reference transcripts")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per file (best is reported)")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    engines = []
+    for name in args.engines:
+        try:
+            engines.append(get_engine(name).name)
+        except ValueError as e:
+            print(f"Skipping {name}: {e}", file=sys.stderr)
+    if not engines:
+        sys.exit("No usable engines")
+
+    options = whisper_options(args.language, args.mode)
+    inputs = [(path, decode_audio(path)) for path in args.audio]
+    report = {
+        "benchmark": "engines",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "settings": {"model": args.model, "language": args.language, "mode": args.mode, "repeat": args.repeat,
+                     "reference": "files" if args.references else engines[0]},
+        "engines": {},
+    }
+
+    references = {}
+    if args.references:
+        for path, _ in inputs:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            with open(os.path.join(args.references, f"{stem}.txt"), encoding="utf-8") as f:
+                references[path] = normalize_words(f.read())
+
+    # One engine resident at a time: memory stays bounded and loads are measured cold
+    model_registry.max_resident = 1
+    for name in engines:
+        print(f"Benchmarking {name}:{args.model}...", file=sys.stderr)
+        started = time.perf_counter()
+        try:
+            model = model_registry.get(args.model, name)
+        except Exception as e:
+            print(f"Skipping {name}: failed to load: {e}", file=sys.stderr)
+            report["engines"][name] = {"error": str(e)}
+            continue
+        entry = {"load_seconds": round(time.perf_counter() - started, 3), "files": []}
+
+        for path, audio in inputs:
+            best = float("inf")
+            for _ in range(max(1, args.repeat)):
+                start = time.perf_counter()
+                result = model.transcribe(audio, **options)
+                best = min(best, time.perf_counter() - start)
+            words = normalize_words(" ".join(segment["text"] for segment in result["segments"]))
+            # Without reference files the baseline engine's output is the reference
+            reference = references.setdefault(path, words)
+            errors = word_errors(reference, words)
+            duration = len(audio) / SAMPLE_RATE
+            entry["files"].append({
+                "file": os.path.basename(path),
+                "media_seconds": round(duration, 2),
+                "seconds": round(best, 3),
+                "rtf": round(best / duration, 4) if duration else None,
+                "words": len(words),
+                "errors": errors,
+                "wer": round(errors / max(1, len(reference)), 4),
+            })
+
+        seconds = sum(item["seconds"] for item in entry["files"])
+        reference_words = sum(len(references[path]) for path, _ in inputs)
+        entry["seconds"] = round(seconds, 3)
+        entry["rtf"] = round(seconds / max(1e-9, sum(item["media_seconds"] for item in entry["files"])), 4)
+        entry["wer"] = round(sum(item["errors"] for item in entry["files"]) / max(1, reference_words), 4)
+        report["engines"][name] = entry
+
+    timed = [entry for entry in report["engines"].values() if "seconds" in entry]
+    for entry in timed:
+        entry["speedup"] = round(timed[0]["seconds"] / entry["seconds"], 2) if entry["seconds"] else None
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
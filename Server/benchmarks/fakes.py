@@ -0,0 +1,196 @@
+"""
+Deterministic stand-ins for the expensive external pieces, for benchmarks
+and tests:
+
+- StubWhisperModel / install_stub_whisper(): replaces whisper.load_model with
+  a model that emits fixed segments (and word timings) for any audio, with
+  an optional simulated real-time factor.
+- FakeLLMServer: a local OpenAI-compatible /chat/completions endpoint that
+  echoes the prompt back in sentence case after a fixed latency, keeping
+  the '[n] text' batch format intact. It can also fail the first requests
+  with HTTP 500 or merge batch replies into one line, to exercise retries
+  and the per-segment fallback.
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+VOCABULARY = [
+    "namaste", "doston", "aaj", "hum", "computer", "programming", "aur", "artificial",
+    "intelligence", "ke", "baare", "mein", "baat", "karenge", "ye", "bahut", "important", "topic", "hai",
+]
+
+
+class StubWhisperModel:
+    """
+    Emits one segment every `segment_seconds` of audio, each with 4-10 words
+    drawn deterministically from VOCABULARY. `rtf` > 0 sleeps for that
+    fraction of the audio duration to mimic inference cost.
+    """
+
+    def __init__(self, name: str = "stub", segment_seconds: float = 3.0, rtf: float = 0.0):
+        self.name = name
+        self.segment_seconds = segment_seconds
+        self.rtf = rtf
+
+    def parameters(self):
+        return []
+
+    def decode(self, segment, options=None):
+        # Called once per 30 s window like Whisper's, so per-window hooks
+        # (cancellation checks) see the same call pattern
+        if self.rtf > 0:
+            time.sleep(len(segment) / SAMPLE_RATE * self.rtf)
+
+    def transcribe(self, audio, **options):
+        if isinstance(audio, str):
+            import whisper
+            audio = whisper.load_audio(audio)
+        duration = len(audio) / SAMPLE_RATE
+        window = 30 * SAMPLE_RATE
+        for offset in range(0, len(audio), window):
+            self.decode(audio[offset:offset + window])
+
+        segments = []
+        start = 0.0
+        index = 0
+        while start + 0.5 < duration:
+            end = min(duration, start + self.segment_seconds * 0.9)
+            count = 4 + (index * 7) % 7
+            words = [VOCABULARY[(index * 31 + k * 17) % len(VOCABULARY)] for k in range(count)]
+            step = (end - start) / count
+            segment = {
+                "id": index,
+                "start": round(start, 3),
+                "end": round(end, 3),
+                "text": " " + " ".join(words),
+                "avg_logprob": -0.3,
+            }
+            if options.get("word_timestamps"):
+                segment["words"] = [
+                    {"word": " " + word, "start": round(start + k * step, 3), "end": round(start + (k + 1) * step, 3)}
+                    for k, word in enumerate(words)
+                ]
+            segments.append(segment)
+            start += self.segment_seconds
+            index += 1
+        return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": options.get("language")}
+
+
+def install_stub_whisper(segment_seconds: float = 3.0, rtf: float = 0.0):
+    """Patches whisper.load_model in this process (the registry looks it up on every load)."""
+    import whisper
+
+    def load_model(name, device=None, **kwargs):
+        return StubWhisperModel(name, segment_seconds, rtf)
+
+    whisper.load_model = load_model
+    return load_model
+
+
+def _sentence_case(line: str) -> str:
+    # '[n] text' batch lines keep their marker
+    marker, _, text = line.partition("] ") if line.startswith("[") else ("", "", line)
+    text = text[:1].upper() + text[1:]
+    return f"{marker}] {text}" if marker else text
+
+
+class _FakeLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_first = 0
+    merge_batches = False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        user = next((m["content"] for m in request.get("messages", []) if m["role"] == "user"), "")
+        if self.latency:
+            time.sleep(self.latency)
+        with self.server.lock:
+            self.server.requests += 1
+            failing = self.server.requests <= self.fail_first
+        if failing:
+            body = json.dumps({"error": {"message": "fake outage", "type": "server_error"}}).encode("utf-8")
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        lines = [_sentence_case(line) for line in user.splitlines()]
+        if self.merge_batches and len(lines) > 1:
+            # A model that ignores the batch format and merges the lines
+            lines = ["[1] " + " ".join(line.partition("] ")[2] for line in lines)]
+        reply = "\n".join(lines)
+        body = json.dumps({
+            "id": "fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeLLMServer:
+    """
+    with FakeLLMServer(latency=0.05) as server:
+        refinement.configure_llm(server.base_url)
+
+    services.refinement reads OPENROUTER_BASE_URL once at import, so setting
+    the variable only works before that import (as benchmarks/pipeline.py
+    does); afterwards use configure_llm, which also drops the cached client.
+
+    fail_first: the first n requests get HTTP 500 (retryable)
+    merge_batches: batch replies come back as a single '[1] ...' line
+    """
+
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0, fail_first: int = 0, merge_batches: bool = False):
+        handler = type("Handler", (_FakeLLMHandler,), {"latency": latency, "fail_first": fail_first, "merge_batches": merge_batches})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._server.requests = 0
+        self._server.lock = threading.Lock()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-llm", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def synthetic_audio(seconds: float) -> np.ndarray:
+    """A quiet 220 Hz tone as 16 kHz mono float32, shaped like decode_audio output."""
+    t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    return (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
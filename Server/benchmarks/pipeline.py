@@ -0,0 +1,203 @@
+"""
+End-to-end pipeline benchmark with a stub Whisper model and a local fake LLM.
+
+    python benchmarks/pipeline.py --sizes 60 600 1800 --repeat 3 --output bench.json
+
+For each input size (seconds of media) a synthetic video is generated with
+ffmpeg, then every stage is timed in isolation:
+
+    extract_audio        ffmpeg -> 16 kHz WAV file
+    decode_audio         ffmpeg -> in-memory PCM
+    transcribe_audio     full transcription path around the (stub) model
+    refine_text_with_llm one request per segment, sequential (first --llm-segments)
+    refine_segments      batched/concurrent refinement, cold and warm cache
+    resegment_text       word-timestamp resegmentation
+    generate_srt         SRT rendering in memory
+    write_subtitles      streaming SRT writer to disk
+    job_store            create + one progress tick per segment + completion
+
+Everything runs against temporary caches and a temporary job database, so
+runs are independent of local state. The JSON report (commit, machine,
+settings, per-stage timings) can be diffed between commits.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from benchmarks.fakes import FakeLLMServer, install_stub_whisper
+
+
+def make_media(path: str, seconds: float):
+    """Tiny test-pattern video with a tone, so ffmpeg has real demuxing/resampling to do."""
+    subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc=size=160x90:rate=1:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=44100:duration={seconds}",
+            "-c:v", "mpeg4", "-c:a", "aac", "-shortest", path,
+        ],
+        check=True,
+    )
+
+
+def timed(repeat: int, fn, *args, setup=None, **kwargs):
+    """Runs fn repeat times; returns summary timings and the last result."""
+    runs = []
+    result = None
+    for i in range(repeat):
+        if setup:
+            setup(i)
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        runs.append(time.perf_counter() - start)
+    summary = {
+        "best": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "runs": [round(r, 6) for r in runs],
+    }
+    return summary, result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=SERVER_DIR, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[60, 600, 1800], help="media durations in seconds")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM response time in seconds")
+    parser.add_argument("--llm-segments", type=int, default=20, help="segments refined one request at a time")
+    parser.add_argument("--stub-rtf", type=float, default=0.0, help="simulated Whisper real-time factor")
+    parser.add_argument("--words-per-line", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="matrix-bench-")
+    server = FakeLLMServer(latency=args.llm_latency).start()
+
+    # Configure the services before they are imported: isolated state, fake LLM,
+    # in-process transcription (the stub is not visible to chunk worker processes)
+    os.environ.update({
+        "CACHE_DIR": os.path.join(work_dir, "cache"),
+        "JOBS_DB": os.path.join(work_dir, "jobs.sqlite3"),
+        "OPENROUTER_BASE_URL": server.base_url,
+        "OPENROUTER_API_KEY": "benchmark",
+        "CHUNK_WORKERS": "0",
+        "LLM_REQUESTS_PER_SECOND": "0",
+        "ROMANIZATION_POLICY": "llm",
+        "PRELOAD_MODELS": "",
+    })
+    os.makedirs(os.environ["CACHE_DIR"], exist_ok=True)
+    install_stub_whisper(rtf=args.stub_rtf)
+
+    from services.audio import decode_audio, extract_audio
+    from services.job_store import job_store
+    from services.refinement import LLM_BATCH_SIZE, LLM_CONCURRENCY, refine_segments
+    from services.subtitle import generate_srt, write_subtitles
+    from services.transcription import WORD_TIMESTAMPS, load_model, refine_text_with_llm, resegment_text, transcribe_audio
+
+    report = {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "settings": {
+            **{key: value for key, value in vars(args).items() if key != "output"},
+            "llm_batch_size": LLM_BATCH_SIZE,
+            "llm_concurrency": LLM_CONCURRENCY,
+            "word_timestamps": WORD_TIMESTAMPS,
+        },
+        "results": [],
+    }
+
+    try:
+        load_model()  # model load is not part of any stage below
+        for seconds in args.sizes:
+            print(f"Benchmarking {seconds:g}s of media...", file=sys.stderr)
+            video_path = os.path.join(work_dir, f"media-{seconds:g}.mp4")
+            make_media(video_path, seconds)
+            wav_path = os.path.join(work_dir, f"media-{seconds:g}.wav")
+            stages = {}
+
+            stages["extract_audio"], _ = timed(args.repeat, extract_audio, video_path, wav_path)
+            stages["decode_audio"], audio = timed(args.repeat, decode_audio, video_path)
+            stages["transcribe_audio"], segments = timed(args.repeat, transcribe_audio, audio, "en", "native")
+
+            # Raw segments (with word timings) as stored for refinement/resegmentation
+            raw = load_model().transcribe(audio, language="en", word_timestamps=WORD_TIMESTAMPS)["segments"]
+            texts = [segment["text"] for segment in raw]
+
+            sample = texts[: args.llm_segments]
+            stages["refine_text_with_llm"], _ = timed(
+                1, lambda: [refine_text_with_llm(f"{text} {uuid.uuid4().hex[:6]}", "translate") for text in sample]
+            )
+            stages["refine_text_with_llm"]["segments"] = len(sample)
+            stages["refine_text_with_llm"]["per_segment"] = round(stages["refine_text_with_llm"]["best"] / max(1, len(sample)), 6)
+
+            # Cold: unique texts every run; warm: same texts again, served by the refinement cache
+            current = {}
+
+            def fresh_texts(run):
+                current["texts"] = [f"{text} {uuid.uuid4().hex[:6]}" for text in texts]
+
+            requests_before = server.requests
+            stages["refine_segments_cold"], _ = timed(args.repeat, lambda: refine_segments(current["texts"], "translate"), setup=fresh_texts)
+            stages["refine_segments_cold"]["requests_per_run"] = (server.requests - requests_before) / args.repeat
+            requests_before = server.requests
+            stages["refine_segments_warm"], _ = timed(args.repeat, lambda: refine_segments(current["texts"], "translate"))
+            stages["refine_segments_warm"]["requests_per_run"] = (server.requests - requests_before) / args.repeat
+
+            stages["resegment_text"], lines = timed(args.repeat, resegment_text, raw, args.words_per_line)
+            stages["generate_srt"], _ = timed(args.repeat, generate_srt, lines)
+            stages["write_subtitles"], _ = timed(args.repeat, write_subtitles, lines, os.path.join(work_dir, "out.srt"), "srt")
+
+            def job_lifecycle():
+                job_id = str(uuid.uuid4())
+                job_store.create(job_id, {"status": "pending", "message": "Queued", "progress": 0})
+                job_store.update(job_id, status="processing", message="Transcribing...")
+                for i in range(len(raw)):
+                    job_store.update_progress(job_id, progress=int(15 + 75 * i / len(raw)))
+                job_store.update(job_id, status="completed", message="Done", progress=100)
+
+            stages["job_store"], _ = timed(args.repeat, job_lifecycle)
+            stages["job_store"]["progress_ticks"] = len(raw)
+
+            report["results"].append({
+                "media_seconds": seconds,
+                "audio_samples": len(audio),
+                "segments": len(segments),
+                "raw_segments": len(raw),
+                "words": sum(len(segment.get("words", [])) for segment in raw),
+                "subtitle_lines": len(lines),
+                "stages": stages,
+            })
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
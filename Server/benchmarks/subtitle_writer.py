@@ -0,0 +1,98 @@
+"""
+Compares the previous in-memory, timedelta-based SRT generation with the
+streaming subtitle writer on a synthetic transcript.
+
+    python benchmarks/subtitle_writer.py --cues 100000 --repeat 5
+
+Each run writes to a temporary directory; the best of --repeat runs is
+reported. Prints a JSON report with seconds per format and the SRT speedup.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.subtitle import SUBTITLE_FORMATS, write_subtitles
+
+
+def legacy_format_timestamp(seconds):
+    td = timedelta(seconds=seconds)
+    total_seconds = int(td.total_seconds())
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    secs = total_seconds % 60
+    millis = int(td.microseconds / 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
+
+
+def legacy_write_srt(segments, path):
+    srt_content = []
+    for i, segment in enumerate(segments, start=1):
+        start_time = legacy_format_timestamp(segment["start"])
+        end_time = legacy_format_timestamp(segment["end"])
+        srt_content.append(f"{i}\n{start_time} --> {end_time}\n{segment['text']}\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(srt_content))
+
+
+def synthetic_segments(count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["namaste", "subtitle", "the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "kya", "hai"]
+    segments, t = [], 0.0
+    for _ in range(count):
+        duration = rng.uniform(0.8, 4.0)
+        text = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 9)))
+        segments.append({"start": t, "end": t + duration, "text": text})
+        t += duration + rng.uniform(0.0, 0.6)
+    return segments
+
+
+def best_of(repeat, fn, *args):
+    """Best wall time of repeat runs, plus peak allocations from one extra traced run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    # Tracing slows allocation-heavy code down a lot, so it is kept out of the timed runs
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_alloc_mb": round(peak / (1024 * 1024), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cues", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    segments = synthetic_segments(args.cues)
+    report = {"cues": args.cues, "repeat": args.repeat, "legacy_srt": None, "streaming": {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report["legacy_srt"] = best_of(args.repeat, legacy_write_srt, segments, os.path.join(tmp, "legacy.srt"))
+        for fmt, (_, extension, _) in SUBTITLE_FORMATS.items():
+            path = os.path.join(tmp, f"out{extension}")
+            report["streaming"][fmt] = best_of(args.repeat, write_subtitles, segments, path, fmt)
+
+    report["srt_speedup"] = round(report["legacy_srt"]["seconds"] / report["streaming"]["srt"]["seconds"], 2)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
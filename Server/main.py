@@ -1,10 +1,14 @@
+from services.lifecycle import lifecycle  # first, so startup time covers every import
 import sys
 import os
 import socket
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes import router
+from api.routes import router, start_maintenance
+from services.models import PRELOAD_MODELS
+from services.scheduler import JOB_BACKEND
 
 # --------------------------------------------------------------------------
 # 1. STRICT PYTHON VERSION CHECK
@@ -20,10 +24,34 @@ if sys.version_info[:2] != REQUIRED_VERSION:
     print("="*50 + "\n")
     sys.exit(1)
 
+# Uvicorn worker processes serving the API. More than one needs
+# JOB_BACKEND=queue: local jobs would be spread over separate in-memory queues
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+if API_WORKERS > 1 and JOB_BACKEND != "queue":
+    print("❌ API_WORKERS > 1 requires JOB_BACKEND=queue (jobs then run in python worker.py processes).")
+    sys.exit(1)
+
 # --------------------------------------------------------------------------
 # 2. APP SETUP
 # --------------------------------------------------------------------------
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Heavy imports and PRELOAD_MODELS load in the background; /api/ready
+    # reports when they are done so traffic can wait for a warm instance.
+    # With JOB_BACKEND=queue inference happens in worker.py processes and
+    # the API tier never loads a model.
+    if JOB_BACKEND == "queue":
+        lifecycle.start_warmup([], modules=())
+    else:
+        lifecycle.start_warmup(PRELOAD_MODELS)
+    # Fails jobs a previous process left behind, then keeps uploads/ and
+    # outputs/ within ARTIFACT_QUOTA_MB / ARTIFACT_TTL_HOURS
+    start_maintenance()
+    lifecycle.mark_serving()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -75,8 +103,8 @@ if __name__ == "__main__":
 
         print("✅ Press Ctrl+C to stop the server (Ports will be released)\n")
         
-        # Start Server
-        uvicorn.run("main:app", host="127.0.0.1", port=port, reload=True)
+        # Start Server (the reloader only works with a single process)
+        uvicorn.run("main:app", host="127.0.0.1", port=port, workers=API_WORKERS, reload=API_WORKERS == 1)
         
     except KeyboardInterrupt:
         print("\n🛑 Server shutting down...")
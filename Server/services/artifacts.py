@@ -0,0 +1,293 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from services.cache import CACHE_DIR
+
+load_dotenv()
+
+ARTIFACTS_DB = os.getenv("ARTIFACTS_DB", os.path.join(CACHE_DIR, "artifacts.sqlite3"))
+# Upper bound on the disk used by media and subtitle files (0 = no quota)
+ARTIFACT_QUOTA_MB = float(os.getenv("ARTIFACT_QUOTA_MB", "20480"))
+# Unreferenced files not used for this long are deleted (0 keeps them until the quota needs the space)
+ARTIFACT_TTL_HOURS = float(os.getenv("ARTIFACT_TTL_HOURS", "72"))
+# How often the background sweeper runs
+ARTIFACT_SWEEP_SECONDS = float(os.getenv("ARTIFACT_SWEEP_SECONDS", "300"))
+
+_EXTENSION_RE = re.compile(r"^\.[A-Za-z0-9]{1,8}$")
+# The quota never evicts files used this recently: a fresh upload must
+# survive until the client has started a job with it
+QUOTA_GRACE_SECONDS = 600
+
+
+class ArtifactStore:
+    """
+    Tracks the files jobs produce and consume (uploaded media, subtitle
+    outputs) so disk usage stays bounded.
+
+    - Media is stored content-addressed (media/ab/<sha256><ext>), so
+      identical uploads share one file and names never collide.
+    - Every file has a set of owners (usually job ids). A queued or running
+      job owns its media; a stored job owns its subtitle files.
+    - Files nobody owns are kept as a cache (re-uploading the same media
+      skips the transfer and hits the transcript cache) until they have not
+      been used for the TTL, or least-recently-used first once the total
+      size exceeds the quota.
+
+    Bookkeeping lives in a small SQLite file; a background sweeper applies
+    the TTL and quota, and writes that push usage over the quota trigger an
+    immediate sweep.
+    """
+
+    def __init__(self, media_dir: str, path: str = ARTIFACTS_DB, quota_mb: float = ARTIFACT_QUOTA_MB, ttl_hours: float = ARTIFACT_TTL_HOURS):
+        self.media_dir = media_dir
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_hours * 3600
+        self.evictions = 0
+        self.freed_bytes = 0
+        self._lock = threading.RLock()
+        self._sweeper: Optional[threading.Thread] = None
+
+        os.makedirs(media_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit mode; every statement runs under self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " path TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_last_used ON artifacts(last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifact_refs ("
+            " path TEXT NOT NULL,"
+            " owner TEXT NOT NULL,"
+            " PRIMARY KEY (path, owner))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_artifact_refs_owner ON artifact_refs(owner)")
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    # ----------------------------------------------------------------------
+    # Registration
+    # ----------------------------------------------------------------------
+    def media_path(self, content_hash: str, extension: str = "") -> str:
+        extension = extension.lower() if _EXTENSION_RE.match(extension or "") else ""
+        return os.path.join(self.media_dir, content_hash[:2], f"{content_hash}{extension}")
+
+    def store_media(self, source_path: str, content_hash: str, extension: str = "") -> str:
+        """
+        Moves a finished upload to its content-addressed path and returns
+        that path. If the same content is already stored, the new copy is
+        dropped and the existing file reused.
+        """
+        path = self.media_path(content_hash, extension)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(source_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(source_path, path)
+            self.register(path, "media")
+        return path
+
+    def register(self, path: str, kind: str, owner: Optional[str] = None):
+        """Records (or refreshes) a file, optionally owned by owner."""
+        key = self._key(path)
+        size = os.path.getsize(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM artifacts WHERE path = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (path, kind, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, kind, size, time.time()),
+            )
+            self._total += size - (row[0] if row else 0)
+            if owner is not None:
+                self._conn.execute("INSERT OR IGNORE INTO artifact_refs (path, owner) VALUES (?, ?)", (key, owner))
+            over_quota = self.quota_bytes > 0 and self._total > self.quota_bytes
+        if over_quota:
+            self.sweep()
+
+    def scan(self, directory: str, kind: str, owner_of: Optional[Callable] = None, skip_suffixes=(".part", ".upload.json")) -> int:
+        """
+        Registers files in directory that predate the artifact store, so the
+        sweeper sees them. owner_of(path) may name an owner for a file
+        (e.g. the job it belongs to); files without one are unreferenced.
+        """
+        with self._lock:
+            tracked = {row[0] for row in self._conn.execute("SELECT path FROM artifacts")}
+        rows, refs = [], []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                key = self._key(path)
+                if name.endswith(skip_suffixes) or key in tracked:
+                    continue
+                try:
+                    rows.append((key, kind, os.path.getsize(path), os.path.getmtime(path)))
+                except OSError:
+                    continue  # removed while scanning
+                owner = owner_of(path) if owner_of else None
+                if owner is not None:
+                    refs.append((key, owner))
+        if not rows:
+            return 0
+        # One transaction for the whole directory
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("INSERT OR IGNORE INTO artifacts (path, kind, size, last_used) VALUES (?, ?, ?, ?)", rows)
+            self._conn.executemany("INSERT OR IGNORE INTO artifact_refs (path, owner) VALUES (?, ?)", refs)
+            self._conn.execute("COMMIT")
+            self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+        return len(rows)
+
+    def is_tracked(self, path: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM artifacts WHERE path = ?", (self._key(path),)).fetchone() is not None
+
+    # ----------------------------------------------------------------------
+    # References
+    # ----------------------------------------------------------------------
+    def acquire(self, path: str, owner: str) -> bool:
+        """
+        Marks path as in use by owner so the sweeper leaves it alone.
+        False if the file no longer exists (e.g. it was evicted). Files the
+        store does not track (paths outside its directories) are not managed.
+        """
+        key = self._key(path)
+        with self._lock:
+            if not os.path.exists(path):
+                return False
+            if self.is_tracked(path):
+                self._conn.execute("UPDATE artifacts SET last_used = ? WHERE path = ?", (time.time(), key))
+                self._conn.execute("INSERT OR IGNORE INTO artifact_refs (path, owner) VALUES (?, ?)", (key, owner))
+        return True
+
+    def release(self, path: str, owner: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM artifact_refs WHERE path = ? AND owner = ?", (self._key(path), owner))
+            self._conn.execute("UPDATE artifacts SET last_used = ? WHERE path = ?", (time.time(), self._key(path)))
+
+    def release_owner(self, owner: str, delete: bool = False) -> int:
+        """
+        Drops every reference held by owner. With delete=True, files left
+        without owners are removed right away (e.g. the subtitles of a
+        deleted job) instead of waiting for the sweeper.
+        """
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute("SELECT path FROM artifact_refs WHERE owner = ?", (owner,))]
+            self._conn.execute("DELETE FROM artifact_refs WHERE owner = ?", (owner,))
+            if not delete:
+                return 0
+            orphans = [path for path in paths if not self._refs_locked(path)]
+            return self._remove_locked(orphans)
+
+    def _refs_locked(self, key: str) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM artifact_refs WHERE path = ?", (key,)).fetchone()[0]
+
+    # ----------------------------------------------------------------------
+    # Eviction
+    # ----------------------------------------------------------------------
+    def _remove_locked(self, keys: List[str]) -> int:
+        removed = 0
+        for key in keys:
+            row = self._conn.execute("SELECT size FROM artifacts WHERE path = ?", (key,)).fetchone()
+            try:
+                os.remove(key)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Failed to remove artifact {key}: {e}")
+                continue
+            self._conn.execute("DELETE FROM artifacts WHERE path = ?", (key,))
+            if row:
+                self._total -= row[0]
+                self.freed_bytes += row[0]
+            self.evictions += 1
+            removed += 1
+        return removed
+
+    def sweep(self) -> Dict:
+        """
+        Forgets files deleted behind the store's back, removes unreferenced
+        files past the TTL, then evicts unreferenced files least recently
+        used first until usage is back under the quota.
+        """
+        unreferenced = "NOT EXISTS (SELECT 1 FROM artifact_refs r WHERE r.path = a.path)"
+        with self._lock:
+            missing = [row[0] for row in self._conn.execute("SELECT path FROM artifacts") if not os.path.exists(row[0])]
+            for key in missing:
+                self._conn.execute("DELETE FROM artifacts WHERE path = ?", (key,))
+                self._conn.execute("DELETE FROM artifact_refs WHERE path = ?", (key,))
+
+            expired = []
+            if self.ttl_seconds > 0:
+                cutoff = time.time() - self.ttl_seconds
+                expired = [row[0] for row in self._conn.execute(
+                    f"SELECT path FROM artifacts a WHERE last_used < ? AND {unreferenced}", (cutoff,)
+                )]
+            removed = self._remove_locked(expired)
+            self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+            if self.quota_bytes > 0 and self._total > self.quota_bytes:
+                excess = self._total - self.quota_bytes
+                victims = []
+                for key, size in self._conn.execute(
+                    f"SELECT path, size FROM artifacts a WHERE last_used < ? AND {unreferenced} ORDER BY last_used",
+                    (time.time() - QUOTA_GRACE_SECONDS,),
+                ):
+                    if excess <= 0:
+                        break
+                    victims.append(key)
+                    excess -= size
+                removed += self._remove_locked(victims)
+                if self._total > self.quota_bytes:
+                    print(f"Artifacts use {self._total} bytes, over the {self.quota_bytes} byte quota, but the rest is in use")
+        return {"removed": removed, "forgotten": len(missing), "bytes": self._total}
+
+    def start_sweeper(self, interval: float = ARTIFACT_SWEEP_SECONDS, tasks: List[Callable] = ()):
+        """
+        Runs sweep() every interval seconds on a daemon thread, after the
+        extra maintenance tasks (stale upload cleanup, job retention, ...).
+        """
+        if self._sweeper is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                for task in (*tasks, self.sweep):
+                    try:
+                        task()
+                    except Exception as e:
+                        print(f"Artifact sweep task failed: {e}")
+                time.sleep(interval)
+
+        self._sweeper = threading.Thread(target=run, name="artifact-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            by_kind = {
+                kind: {"files": files, "bytes": size}
+                for kind, files, size in self._conn.execute("SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM artifacts GROUP BY kind")
+            }
+            referenced = self._conn.execute("SELECT COUNT(DISTINCT path) FROM artifact_refs").fetchone()[0]
+            return {
+                "bytes": self._total,
+                "quota_bytes": self.quota_bytes,
+                "ttl_hours": self.ttl_seconds / 3600,
+                "kinds": by_kind,
+                "referenced_files": referenced,
+                "evictions": self.evictions,
+                "freed_bytes": self.freed_bytes,
+            }
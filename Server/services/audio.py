@@ -1,6 +1,30 @@
 import os
+import sys
+import struct
 import subprocess
+import threading
+import numpy as np
 from pathlib import Path
+from typing import Optional, Union
+from dotenv import load_dotenv
+from services.cancellation import check_cancelled, on_cancel
+
+load_dotenv()
+
+# Whisper expects mono 16 kHz audio
+SAMPLE_RATE = 16000
+
+# 'memory' pipes decoded PCM straight into a NumPy buffer, 'file' writes a WAV first
+AUDIO_DECODE_MODE = os.getenv("AUDIO_DECODE_MODE", "memory")
+# Longer media is extracted to a WAV on disk and transcribed from there a
+# window at a time, so it is never held in memory whole (4h of float32 audio
+# is ~920 MB)
+MAX_IN_MEMORY_AUDIO_SECONDS = float(os.getenv("MAX_IN_MEMORY_AUDIO_SECONDS", "14400"))
+# Bytes read from the ffmpeg pipe per iteration
+DECODE_CHUNK_BYTES = 1024 * 1024
+
+class AudioTooLong(RuntimeError):
+    """Raised by decode_audio when the decoded audio exceeds max_seconds."""
 
 def extract_audio(video_path: str, output_path: str) -> str:
     """
@@ -26,14 +50,187 @@ def extract_audio(video_path: str, output_path: str) -> str:
         "-i", video_path,
         "-vn",
         "-acodec", "pcm_s16le",
-        "-ar", "16000",
+        "-ar", str(SAMPLE_RATE),
         "-ac", "1",
         output_path
     ]
 
-    try:
-        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"FFmpeg failed: {e.stderr.decode()}")
-    
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Cancelling the job kills ffmpeg instead of waiting for a long extraction
+    with on_cancel(process.kill):
+        _, stderr = process.communicate()
+    check_cancelled()
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed: {stderr.decode()}")
+
     return output_path
+
+def probe_duration(media_path: str) -> Optional[float]:
+    """
+    Returns the media duration in seconds using ffprobe, or None if it can't be determined.
+    """
+    command = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        media_path
+    ]
+    try:
+        result = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return float(result.stdout.decode().strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+def decode_audio(video_path: str, max_seconds: Optional[float] = MAX_IN_MEMORY_AUDIO_SECONDS, duration: Optional[float] = None) -> np.ndarray:
+    """
+    Decodes the audio track to a mono 16 kHz float32 array without touching disk.
+    ffmpeg's raw s16le output is read from a pipe in fixed-size chunks and
+    converted into a buffer sized from the probed duration, so peak memory is
+    the final array plus one chunk. max_seconds=None decodes any length.
+    """
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+
+    max_samples = int(max_seconds * SAMPLE_RATE) if max_seconds is not None else sys.maxsize
+    if duration is None:
+        duration = probe_duration(video_path)
+    # One extra second absorbs container/stream duration mismatch
+    capacity = int((duration + 1) * SAMPLE_RATE) if duration else SAMPLE_RATE * 60
+    buffer = np.empty(min(capacity, max_samples), dtype=np.float32)
+
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel", "error",
+        "-i", video_path,
+        "-vn",
+        "-f", "s16le",
+        "-acodec", "pcm_s16le",
+        "-ar", str(SAMPLE_RATE),
+        "-ac", "1",
+        "-"
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Drain stderr on the side so a chatty ffmpeg can never block on a full pipe
+    stderr_chunks = []
+    stderr_thread = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_thread.start()
+
+    filled = 0
+    leftover = b""
+    try:
+        # Cancelling the job kills ffmpeg; the read loop then sees EOF
+        with on_cancel(process.kill):
+            while True:
+                chunk = process.stdout.read(DECODE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                # Keep an odd trailing byte for the next read; samples are 2 bytes wide
+                data = leftover + chunk if leftover else chunk
+                usable = len(data) - (len(data) % 2)
+                leftover = data[usable:]
+                samples = np.frombuffer(data, dtype=np.int16, count=usable // 2)
+
+                end = filled + len(samples)
+                if end > max_samples:
+                    raise AudioTooLong(
+                        f"Audio is longer than {max_seconds:.0f}s; use AUDIO_DECODE_MODE=file for this media"
+                    )
+                if end > len(buffer):
+                    # Duration probe was short or missing; grow geometrically
+                    grown = np.empty(min(max_samples, max(end, int(len(buffer) * 1.5))), dtype=np.float32)
+                    grown[:filled] = buffer[:filled]
+                    buffer = grown
+
+                buffer[filled:end] = samples
+                buffer[filled:end] *= 1.0 / 32768.0
+                filled = end
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+        stderr_thread.join()
+
+    check_cancelled()
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg failed: {b''.join(stderr_chunks).decode(errors='replace')}")
+
+    # Don't let a view pin a much larger buffer than the audio needs
+    if filled < len(buffer) * 0.9:
+        return buffer[:filled].copy()
+    return buffer[:filled]
+
+def open_wav(wav_path: str) -> np.ndarray:
+    """
+    The samples of a mono 16 kHz 16-bit PCM WAV (as written by
+    extract_audio), memory-mapped: nothing is read until it is used.
+    """
+    with open(wav_path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"{wav_path} is not a WAV file")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{wav_path} has no audio data")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", f.read(16))
+                if (audio_format, channels, rate, bits) != (1, 1, SAMPLE_RATE, 16):
+                    raise ValueError(f"{wav_path} is not mono {SAMPLE_RATE} Hz 16-bit PCM")
+                f.seek(size - 16 + (size & 1), os.SEEK_CUR)
+            elif chunk_id == b"data":
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+    # The header size can be a placeholder when ffmpeg couldn't seek back
+    count = min(size, os.path.getsize(wav_path) - offset) // 2
+    if count == 0:
+        return np.zeros(0, dtype=np.int16)
+    return np.memmap(wav_path, dtype="<i2", mode="r", offset=offset, shape=(count,))
+
+def to_float32(samples: np.ndarray) -> np.ndarray:
+    """16-bit PCM samples as Whisper's float32 input, converted a chunk at a time."""
+    audio = np.empty(len(samples), dtype=np.float32)
+    step = DECODE_CHUNK_BYTES // 2
+    for start in range(0, len(samples), step):
+        audio[start:start + step] = samples[start:start + step]
+        audio[start:start + step] *= 1.0 / 32768.0
+    return audio
+
+def load_audio_file(path: str, max_seconds: Optional[float] = MAX_IN_MEMORY_AUDIO_SECONDS) -> np.ndarray:
+    """
+    An audio file as a float32 array, like decode_audio's output. WAVs from
+    extract_audio are read directly, and one longer than max_seconds comes
+    back as its memory-mapped int16 samples (see open_wav) for windowed
+    transcription. Anything else is decoded whole by ffmpeg.
+    """
+    try:
+        samples = open_wav(path)
+    except (ValueError, struct.error):
+        return decode_audio(path, max_seconds=None)
+    if max_seconds is not None and len(samples) > max_seconds * SAMPLE_RATE:
+        return samples
+    return to_float32(samples)
+
+def prepare_audio(video_path: str, wav_path: str) -> Union[str, np.ndarray]:
+    """
+    Produces Whisper input for a media file according to AUDIO_DECODE_MODE:
+    a float32 array decoded in memory, or the path of an extracted WAV file.
+    Media longer than MAX_IN_MEMORY_AUDIO_SECONDS always goes through a WAV,
+    including media ffprobe couldn't measure that turns out too long while
+    decoding; run_whisper then reads it a window at a time.
+    """
+    if AUDIO_DECODE_MODE == "memory":
+        duration = probe_duration(video_path)
+        if duration is None or duration <= MAX_IN_MEMORY_AUDIO_SECONDS:
+            try:
+                return decode_audio(video_path, duration=duration)
+            except AudioTooLong:
+                print(f"{video_path} is longer than {MAX_IN_MEMORY_AUDIO_SECONDS:.0f}s; decoding to a WAV instead")
+    return extract_audio(video_path, wav_path)
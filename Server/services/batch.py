@@ -0,0 +1,252 @@
+import os
+import time
+import shutil
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+from dotenv import load_dotenv
+from services.audio import SAMPLE_RATE, prepare_audio, probe_duration
+from services.cache import file_sha256
+from services.cancellation import activate, check_cancelled, current_token
+from services.engines import model_key
+from services.metrics import current_timer, stage
+from services.models import DEFAULT_MODEL_SIZE
+from services.subtitle import OUTPUT_FORMATS, SUBTITLE_FORMATS, write_subtitles
+from services.transcription import get_cached_segments, needs_word_timestamps, refine_and_resegment, run_whisper
+
+load_dotenv()
+
+# Files decoded ahead of the one being transcribed (each holds its PCM in memory)
+BATCH_PREFETCH = int(os.getenv("BATCH_PREFETCH", "1"))
+
+# Per-item settings a manifest may set in "defaults" or on each item
+ITEM_DEFAULTS = {
+    "language": None,
+    "mode": "native",
+    "model_size": None,
+    "engine": None,
+    "words_per_line": None,
+    "max_chars_per_line": None,
+    "romanization_policy": None,
+    "formats": None,
+    "output_dir": None,
+}
+
+
+def _inside(root: str, path: str) -> str:
+    resolved = os.path.normpath(os.path.join(root, path))
+    if os.path.commonpath([os.path.abspath(root), os.path.abspath(resolved)]) != os.path.abspath(root):
+        raise ValueError(f"Output path '{path}' is outside the batch output directory")
+    return resolved
+
+
+def load_manifest(manifest: Union[Dict, List], base_dir: Optional[str] = None, output_root: Optional[str] = None) -> List[Dict]:
+    """
+    Normalizes a batch manifest into one settings dict per file:
+
+        {"defaults": {"language": "hi", "mode": "native", "formats": ["srt"]},
+         "items": ["a.mp4", {"path": "b.mp4", "mode": "translate", "output": "b.en"}]}
+
+    A bare list of items works too. 'output' is the output path without
+    extension; by default it is the source name in 'output_dir' (or next to
+    the source). Relative media paths resolve against base_dir.
+    With output_root set, every output must stay inside it (relative paths
+    resolve against it), which is how the API confines writes.
+    Raises ValueError for malformed manifests.
+    """
+    if isinstance(manifest, list):
+        manifest = {"items": manifest}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("items"), list):
+        raise ValueError("Manifest must be a list of items or an object with an 'items' list")
+    if not manifest["items"]:
+        raise ValueError("Manifest has no items")
+    defaults = {**ITEM_DEFAULTS, **(manifest.get("defaults") or {})}
+
+    items = []
+    outputs = set()
+    for raw in manifest["items"]:
+        raw = {"path": raw} if isinstance(raw, str) else raw
+        if not isinstance(raw, dict) or not raw.get("path"):
+            raise ValueError(f"Manifest item without a path: {raw!r}")
+        unknown = set(raw) - set(ITEM_DEFAULTS) - {"path", "output"}
+        if unknown:
+            raise ValueError(f"Unknown manifest fields: {', '.join(sorted(unknown))}")
+        item = {**defaults, **raw}
+        if not item["language"]:
+            raise ValueError(f"No language given for {item['path']}")
+        item["path"] = os.path.join(base_dir, item["path"]) if base_dir else item["path"]
+        item["model_size"] = item["model_size"] or DEFAULT_MODEL_SIZE
+        item["formats"] = list(dict.fromkeys(item["formats"] or OUTPUT_FORMATS))
+        for fmt in item["formats"]:
+            if fmt not in SUBTITLE_FORMATS:
+                raise ValueError(f"Unknown format '{fmt}'. Available: {', '.join(SUBTITLE_FORMATS)}")
+
+        output = raw.get("output")
+        if output and os.path.splitext(output)[1] in {extension for _, extension, _ in SUBTITLE_FORMATS.values()}:
+            output = os.path.splitext(output)[0]
+        if not output:
+            stem = os.path.splitext(os.path.basename(item["path"]))[0]
+            output = os.path.join(item["output_dir"], stem) if item["output_dir"] else stem
+        if output_root:
+            item["output"] = _inside(output_root, output)
+        elif raw.get("output") or item["output_dir"]:
+            item["output"] = os.path.join(base_dir, output) if base_dir else output
+        else:
+            item["output"] = os.path.join(os.path.dirname(item["path"]), output)
+        if item["output"] in outputs:
+            raise ValueError(f"Two items write to {item['output']}")
+        outputs.add(item["output"])
+        item.pop("output_dir")
+        items.append(item)
+    return items
+
+
+def output_paths(item: Dict) -> Dict[str, str]:
+    return {fmt: item["output"] + SUBTITLE_FORMATS[fmt][1] for fmt in item["formats"]}
+
+
+def is_up_to_date(item: Dict) -> bool:
+    """True if every requested output exists and is newer than the source, like make."""
+    try:
+        source_mtime = os.path.getmtime(item["path"])
+    except OSError:
+        return False
+    paths = output_paths(item).values()
+    return all(os.path.exists(path) and os.path.getmtime(path) >= source_mtime for path in paths)
+
+
+class _Prepared:
+    """What the prefetch thread hands to the inference loop for one item."""
+
+    def __init__(self, content_hash: str, segments=None, audio=None, media_seconds: Optional[float] = None):
+        self.content_hash = content_hash
+        self.segments = segments
+        self.audio = audio
+        self.media_seconds = media_seconds
+
+
+def _prepare(item: Dict, wav_path: str) -> _Prepared:
+    """
+    Hash, transcript cache lookup and ffmpeg decode for one item. Runs on
+    the prefetch thread while the previous item is being transcribed.
+    """
+    content_hash = file_sha256(item["path"])
+    segments = get_cached_segments(
+        content_hash, item["language"], item["mode"], item["model_size"], item["engine"],
+        needs_word_timestamps(item["words_per_line"], item["max_chars_per_line"]),
+    )
+    if segments is not None:
+        return _Prepared(content_hash, segments=segments, media_seconds=probe_duration(item["path"]))
+    audio = prepare_audio(item["path"], wav_path)
+    media_seconds = len(audio) / SAMPLE_RATE if not isinstance(audio, str) else probe_duration(item["path"])
+    return _Prepared(content_hash, audio=audio, media_seconds=media_seconds)
+
+
+def run_batch(items: List[Dict], force: bool = False, prefetch: int = BATCH_PREFETCH, item_callback: Optional[Callable] = None) -> Dict:
+    """
+    Transcribes many files in one process: the model stays loaded across
+    items (grouped by engine and size, so it is loaded once per group) and
+    the next files are hashed and decoded by ffmpeg while the current one
+    is on the model. Files whose outputs are newer than the source are
+    skipped unless force is set; a failing file doesn't stop the batch.
+    item_callback: function(index, result) after each item, in processing order
+    Returns per-item results and totals.
+    """
+    started = time.perf_counter()
+    results = [{"path": item["path"], "status": "pending"} for item in items]
+    pending = []
+    for index, item in enumerate(items):
+        if not force and is_up_to_date(item):
+            results[index] = {"path": item["path"], "status": "skipped", "outputs": output_paths(item)}
+            if item_callback:
+                item_callback(index, results[index])
+        else:
+            pending.append(index)
+    # Stable, so files keep their manifest order within a model
+    pending.sort(key=lambda index: model_key(items[index]["model_size"], items[index]["engine"]))
+
+    token = current_token()
+    work_dir = tempfile.mkdtemp(prefix="matrix-batch-")
+
+    def prepare(index: int) -> _Prepared:
+        # Same cancel token as the batch, so cancelling also kills a prefetch ffmpeg
+        if token is None:
+            return _prepare(items[index], os.path.join(work_dir, f"{index}.wav"))
+        with activate(token):
+            return _prepare(items[index], os.path.join(work_dir, f"{index}.wav"))
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-prefetch")
+    futures: Dict[int, Future] = {}
+    media_seconds = 0.0
+    try:
+        for position, index in enumerate(pending):
+            for ahead in pending[position:position + 1 + max(0, prefetch)]:
+                if ahead not in futures:
+                    futures[ahead] = executor.submit(prepare, ahead)
+            check_cancelled()
+
+            item = items[index]
+            item_started = time.perf_counter()
+            wav_path = os.path.join(work_dir, f"{index}.wav")
+            try:
+                # Only the part of decoding that inference didn't hide
+                with stage("prefetch_wait"):
+                    prepared = futures.pop(index).result()
+                segments = prepared.segments
+                if segments is None:
+                    segments = run_whisper(
+                        prepared.audio, item["language"], item["mode"],
+                        content_hash=prepared.content_hash,
+                        model_size=item["model_size"],
+                        engine=item["engine"],
+                        word_timestamps=needs_word_timestamps(item["words_per_line"], item["max_chars_per_line"]),
+                    )
+                    # Free the PCM before refinement; the next file is already decoding
+                    prepared.audio = None
+                lines = refine_and_resegment(
+                    segments, item["mode"],
+                    words_per_line=item["words_per_line"],
+                    max_chars=item["max_chars_per_line"],
+                    romanization_policy=item["romanization_policy"],
+                )
+                check_cancelled()
+                os.makedirs(os.path.dirname(item["output"]) or ".", exist_ok=True)
+                with stage("write"):
+                    outputs = {fmt: write_subtitles(lines, path, fmt) for fmt, path in output_paths(item).items()}
+                media_seconds += prepared.media_seconds or 0
+                results[index] = {
+                    "path": item["path"],
+                    "status": "completed",
+                    "outputs": outputs,
+                    "transcript_cache_hit": prepared.segments is not None,
+                    "media_seconds": round(prepared.media_seconds, 3) if prepared.media_seconds else None,
+                    "seconds": round(time.perf_counter() - item_started, 3),
+                }
+            except Exception as e:
+                if token is not None and token.cancelled:
+                    raise
+                print(f"Batch item {item['path']} failed: {e}")
+                results[index] = {"path": item["path"], "status": "failed", "error": str(e)}
+            finally:
+                if os.path.exists(wav_path):
+                    os.remove(wav_path)
+            if item_callback:
+                item_callback(index, results[index])
+    finally:
+        for future in futures.values():
+            future.cancel()
+        executor.shutdown(wait=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    timer = current_timer()
+    if timer is not None:
+        timer.media_seconds = media_seconds
+    elapsed = time.perf_counter() - started
+    counts = {status: sum(1 for result in results if result["status"] == status) for status in ("completed", "skipped", "failed")}
+    return {
+        "items": results,
+        "total": len(items),
+        **counts,
+        "media_seconds": round(media_seconds, 3),
+        "seconds": round(elapsed, 3),
+    }
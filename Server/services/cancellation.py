@@ -0,0 +1,142 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled, at the next safe point."""
+
+
+class JobLost(JobCancelled):
+    """
+    Raised inside a job whose worker no longer owns it (its queue lease ran
+    out and the job was handed to another worker). The job must stop
+    without recording anything: status, outputs and files belong to the
+    new owner.
+    """
+
+
+class CancelToken:
+    """
+    Cancellation state of one job. cancel() may come from any thread; it
+    runs the callbacks registered by whatever the job is blocked on right
+    now (kill ffmpeg, cancel the LLM future, ...) and the job itself raises
+    JobCancelled the next time it calls check().
+
+    verify() -> bool, if given, is asked by confirm() whether the job is
+    still this process's to finish (a queue worker re-checks its lease).
+    """
+
+    def __init__(self, job_id: str, verify: Optional[Callable] = None):
+        self.job_id = job_id
+        self.lost = False
+        self._verify = verify
+        self._event = threading.Event()
+        self._callbacks: List[Callable] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def lose(self):
+        """Cancels a job another worker has taken over; check() raises JobLost."""
+        self.lost = True
+        self.cancel()
+
+    def confirm(self):
+        """check(), after making sure the job wasn't taken over meanwhile."""
+        if not self.lost and self._verify is not None and not self._verify():
+            self.lose()
+        self.check()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel callback for job {self.job_id} failed: {e}")
+
+    def check(self):
+        if self.lost:
+            raise JobLost(f"Job {self.job_id} was taken over by another worker")
+        if self._event.is_set():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def add_callback(self, callback: Callable) -> bool:
+        """Registers callback for cancel(); False (not registered) if already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._callbacks.append(callback)
+            return True
+
+    def remove_callback(self, callback: Callable):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+_current = threading.local()
+
+
+def current_token() -> Optional[CancelToken]:
+    return getattr(_current, "token", None)
+
+
+@contextmanager
+def activate(token: CancelToken):
+    """Makes token current for the calling thread while a job runs on it."""
+    previous = current_token()
+    _current.token = token
+    try:
+        yield token
+    finally:
+        _current.token = previous
+
+
+def check_cancelled():
+    """Raises JobCancelled if the job running on this thread was cancelled; no-op outside jobs."""
+    token = current_token()
+    if token is not None:
+        token.check()
+
+
+def confirm_ownership():
+    """
+    check_cancelled() right before a job records its results: raises
+    JobLost if the job has meanwhile been handed to another worker.
+    """
+    token = current_token()
+    if token is not None:
+        token.confirm()
+
+
+def job_lost() -> bool:
+    """True if the job running on this thread was taken over (see JobLost)."""
+    token = current_token()
+    return token is not None and token.lost
+
+
+@contextmanager
+def on_cancel(callback: Callable):
+    """
+    Runs callback (from the cancelling thread) if the current job is
+    cancelled while the block runs. Raises JobCancelled up front if it
+    already was.
+    """
+    token = current_token()
+    if token is None:
+        yield
+        return
+    if not token.add_callback(callback):
+        token.check()
+    try:
+        yield
+    finally:
+        token.remove_callback(callback)
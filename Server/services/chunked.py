@@ -0,0 +1,242 @@
+import os
+import threading
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from services.audio import SAMPLE_RATE, to_float32
+from services.cancellation import check_cancelled, on_cancel
+from services.vad import detect_speech
+
+load_dotenv()
+
+# Worker processes for long-media mode (0 or 1 disables it)
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "0"))
+# Window length and the overlap shared by neighbouring windows
+CHUNK_SECONDS = float(os.getenv("CHUNK_SECONDS", "600"))
+CHUNK_OVERLAP_SECONDS = float(os.getenv("CHUNK_OVERLAP_SECONDS", "5"))
+# Media shorter than this is always transcribed in a single pass
+LONG_MEDIA_SECONDS = float(os.getenv("LONG_MEDIA_SECONDS", "1800"))
+
+# --------------------------------------------------------------------------
+# WORKER PROCESS SIDE
+# --------------------------------------------------------------------------
+_worker_model = None
+
+def _init_worker(engine: Optional[str], model_size: str, threads: int):
+    """Loads one Whisper model per worker process."""
+    global _worker_model
+    from services.engines import get_engine
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        device = "cpu"
+    _worker_model, _ = get_engine(engine).load(model_size, device)
+
+def compact_segment(segment: Dict) -> Dict:
+    """
+    Keeps only what later stages use from a Whisper segment: timing, text,
+    decoder confidence and word timings.
+    """
+    compact = {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+    if segment.get("avg_logprob") is not None:
+        compact["avg_logprob"] = round(segment["avg_logprob"], 3)
+    if segment.get("words"):
+        compact["words"] = [
+            {"word": word["word"], "start": word["start"], "end": word["end"]}
+            for word in segment["words"]
+        ]
+    return compact
+
+def window_segments(model, samples: np.ndarray, options: Dict, vad: bool = False) -> List[Dict]:
+    """
+    Transcribes one window. int16 PCM (a slice of a memory-mapped WAV) is
+    converted to float32 here, so only one window is ever in memory; with
+    vad, silence inside the window is skipped and timestamps mapped back.
+    """
+    audio = to_float32(samples) if samples.dtype == np.int16 else samples
+    speech = None
+    if vad:
+        speech = detect_speech(audio)
+        if not speech.worth_skipping():
+            speech = None
+        elif not speech.regions:
+            return []
+        else:
+            audio = speech.compact(audio)
+    result = model.transcribe(audio, **options)
+    segments = [compact_segment(segment) for segment in result["segments"]]
+    return [speech.remap(segment) for segment in segments] if speech is not None else segments
+
+def _transcribe_window(samples: np.ndarray, options: Dict, vad: bool) -> List[Dict]:
+    return window_segments(_worker_model, samples, options, vad)
+
+# --------------------------------------------------------------------------
+# PARENT SIDE
+# --------------------------------------------------------------------------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_key: Optional[Tuple[str, str, int]] = None
+_pool_lock = threading.Lock()
+
+def _get_pool(engine: Optional[str], model_size: str, workers: int) -> ProcessPoolExecutor:
+    # The pool (and the models loaded in it) outlives a single job; it is
+    # only rebuilt when a different engine, model size or worker count is asked for
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None and _pool_key != (engine, model_size, workers):
+            _pool.shutdown(wait=True)
+            _pool = None
+        if _pool is None:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                # Never fork a process that already has torch threads running
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(engine, model_size, threads),
+            )
+            _pool_key = (engine, model_size, workers)
+        return _pool
+
+def use_chunked(num_samples: int, workers: int = CHUNK_WORKERS) -> bool:
+    return workers > 1 and num_samples / SAMPLE_RATE > LONG_MEDIA_SECONDS
+
+def plan_windows(num_samples: int, chunk_seconds: float = CHUNK_SECONDS, overlap_seconds: float = CHUNK_OVERLAP_SECONDS) -> List[Tuple[int, int]]:
+    """
+    Splits [0, num_samples) into windows of chunk_seconds that overlap their
+    neighbours by overlap_seconds. Returns (start_sample, end_sample) pairs.
+    """
+    size = int(chunk_seconds * SAMPLE_RATE)
+    overlap = min(int(overlap_seconds * SAMPLE_RATE), size // 2)
+    step = size - overlap
+    windows = []
+    start = 0
+    while True:
+        end = min(start + size, num_samples)
+        windows.append((start, end))
+        if end >= num_samples:
+            return windows
+        start += step
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def _stitch_window(windows: List[Tuple[int, int]], i: int, segments: List[Dict], stitched: List[Dict]):
+    """
+    Appends window i's segments to `stitched` (which already holds windows 0..i-1).
+    Timestamps are shifted by the window's offset. Inside an overlap the
+    cut point is its midpoint: each window keeps only segments whose centre
+    lies on its side, and a segment repeating the previous one's text across
+    the cut is dropped.
+    """
+    start, end = windows[i]
+    offset = start / SAMPLE_RATE
+    lower = -np.inf if i == 0 else (start + windows[i - 1][1]) / 2 / SAMPLE_RATE
+    upper = np.inf if i == len(windows) - 1 else (windows[i + 1][0] + end) / 2 / SAMPLE_RATE
+
+    for segment in segments:
+        seg_start = segment["start"] + offset
+        seg_end = segment["end"] + offset
+        centre = (seg_start + seg_end) / 2
+        if not lower <= centre < upper:
+            continue
+        if stitched:
+            previous = stitched[-1]
+            if seg_start < previous["end"] and _normalize(segment["text"]) == _normalize(previous["text"]):
+                continue
+            # Keep the timeline monotonic where windows disagree slightly
+            seg_start = max(seg_start, previous["end"])
+            seg_end = max(seg_end, seg_start)
+        stitched_segment = {"start": seg_start, "end": seg_end, "text": segment["text"]}
+        if segment.get("words"):
+            stitched_segment["words"] = [
+                {"word": word["word"], "start": word["start"] + offset, "end": word["end"] + offset}
+                for word in segment["words"]
+            ]
+        stitched.append(stitched_segment)
+
+def stitch_windows(windows: List[Tuple[int, int]], results: List[List[Dict]]) -> List[Dict]:
+    """
+    Merges per-window segments into one timeline.
+    """
+    stitched = []
+    for i, segments in enumerate(results):
+        _stitch_window(windows, i, segments, stitched)
+    return stitched
+
+def _sequential_windows(model, audio: np.ndarray, windows: List[Tuple[int, int]], options: Dict, vad: bool):
+    for i, (start, end) in enumerate(windows):
+        check_cancelled()
+        yield i, window_segments(model, audio[start:end], options, vad)
+
+def transcribe_chunked(
+    audio: np.ndarray,
+    options: Dict,
+    model_size: str,
+    engine: Optional[str] = None,
+    workers: int = CHUNK_WORKERS,
+    progress_callback=None,
+    segment_callback=None,
+    chunk_seconds: float = CHUNK_SECONDS,
+    overlap_seconds: float = CHUNK_OVERLAP_SECONDS,
+    vad: bool = False,
+    model=None,
+) -> List[Dict]:
+    """
+    Transcribes overlapping windows of `audio` in parallel worker processes and
+    stitches them back into one segment list on the original timeline.
+    audio: float32 samples, or int16 PCM such as open_wav()'s memory map,
+           converted one window at a time
+    vad: skip silence within each window (for audio not trimmed as a whole)
+    model: transcribe the windows one after another on this model instead
+           of the worker pool
+    progress_callback: function(done_windows, total_windows)
+    segment_callback: function(index, segment), called once the windows before
+                      a segment are done, so segments stream out in timeline order
+    """
+    check_cancelled()
+    windows = plan_windows(len(audio), chunk_seconds, overlap_seconds)
+    results: List[Optional[List[Dict]]] = [None] * len(windows)
+    stitched: List[Dict] = []
+    next_window = 0
+
+    if model is not None:
+        completed = _sequential_windows(model, audio, windows, options, vad)
+        cancel_windows = None
+    else:
+        pool = _get_pool(engine, model_size, workers)
+        # Slices of a memory map are only read when a worker is about to take
+        # them, so the windows waiting in the pool don't hold their audio
+        futures = {
+            pool.submit(_transcribe_window, audio[start:end], options, vad): i
+            for i, (start, end) in enumerate(windows)
+        }
+        completed = ((futures[future], future.result()) for future in as_completed(futures))
+
+        def cancel_windows():
+            # Windows already on a worker finish there; the rest never start
+            for future in futures:
+                future.cancel()
+
+    with on_cancel(cancel_windows) if cancel_windows else nullcontext():
+        for done, (window, segments) in enumerate(completed, start=1):
+            check_cancelled()
+            results[window] = segments
+
+            # Stitch the contiguous prefix of finished windows as soon as it grows
+            while next_window < len(windows) and results[next_window] is not None:
+                emitted = len(stitched)
+                _stitch_window(windows, next_window, results[next_window], stitched)
+                if segment_callback:
+                    for index in range(emitted, len(stitched)):
+                        segment_callback(index, stitched[index])
+                next_window += 1
+
+            if progress_callback:
+                progress_callback(done, len(windows))
+
+    return stitched
@@ -0,0 +1,210 @@
+import os
+import importlib.util
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from services.cancellation import check_cancelled
+
+load_dotenv()
+
+# Inference backend used when a job doesn't ask for one
+WHISPER_ENGINE = os.getenv("WHISPER_ENGINE", "whisper")
+# faster-whisper (CTranslate2) settings: weight precision on CPU / GPU and beam
+# size (1 = greedy, which is what openai-whisper's transcribe() does by default)
+CT2_COMPUTE_TYPE = os.getenv("CT2_COMPUTE_TYPE", "int8")
+CT2_GPU_COMPUTE_TYPE = os.getenv("CT2_GPU_COMPUTE_TYPE", "float16")
+CT2_BEAM_SIZE = int(os.getenv("CT2_BEAM_SIZE", "1"))
+
+
+def cpu_threads() -> int:
+    # Only one inference runs at a time, so let it use the cores the
+    # other job workers are not busy with (ffmpeg, LLM calls).
+    workers = int(os.getenv("TRANSCRIPTION_WORKERS", "1"))
+    return max(1, (os.cpu_count() or 1) - (workers - 1))
+
+
+class Engine:
+    """
+    An inference backend. load() returns a model whose
+    transcribe(audio, **options) takes the options built by
+    whisper_options() and returns openai-whisper's result structure:
+    {"segments": [{"start", "end", "text", "avg_logprob", "words"?}, ...]}.
+    """
+
+    name = ""
+    module = ""  # import name of the package the engine needs
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    def model_sizes(self) -> List[str]:
+        import whisper
+        return whisper.available_models()
+
+    def load(self, size: str, device: str) -> Tuple[object, float]:
+        """Returns the loaded model and its weight size in MB."""
+        raise NotImplementedError
+
+
+def _parameters_mb(model) -> float:
+    return sum(p.numel() * p.element_size() for p in model.parameters()) / (1024 * 1024)
+
+
+class WhisperEngine(Engine):
+    """openai-whisper in PyTorch: fp16 on CUDA, fp32 on CPU."""
+
+    name = "whisper"
+    module = "whisper"
+
+    def load(self, size, device):
+        import whisper
+        model = whisper.load_model(size, device=device)
+        return model, _parameters_mb(model)
+
+
+def _whisper_linear_mapping() -> Dict[type, type]:
+    """
+    quantize_dynamic's module mapping extended to whisper.model.Linear.
+    That class is nn.Linear plus a cast of the weights to the input dtype in
+    forward() (for fp16 on CUDA); its parameters and state are exactly
+    nn.Linear's. The stock int8 Linear.from_float accepts only the exact
+    nn.Linear type, so the conversion hands it an nn.Linear shell sharing
+    the whisper layer's parameters. On CPU everything is fp32 and the int8
+    module's forward() is what the cast would have computed anyway.
+    """
+    import torch
+    import whisper.model
+    from torch.ao.nn.quantized import dynamic as nnqd
+    from torch.ao.quantization.quantization_mappings import get_default_dynamic_quant_module_mappings
+
+    class WhisperDynamicLinear(nnqd.Linear):
+        @classmethod
+        def from_float(cls, mod, use_precomputed_fake_quant=False):
+            # Built on the meta device so no weights are allocated for the shell
+            plain = torch.nn.Linear(mod.in_features, mod.out_features, bias=mod.bias is not None, device="meta")
+            plain.weight = mod.weight
+            plain.bias = mod.bias
+            plain.qconfig = mod.qconfig
+            return nnqd.Linear.from_float(plain, use_precomputed_fake_quant=use_precomputed_fake_quant)
+
+    return {**get_default_dynamic_quant_module_mappings(), whisper.model.Linear: WhisperDynamicLinear}
+
+
+class QuantizedWhisperEngine(WhisperEngine):
+    """
+    openai-whisper with its Linear layers converted to int8 by PyTorch dynamic
+    quantization: weights are stored as int8 and activations quantized on the
+    fly. The attention and MLP matmuls dominate Whisper's CPU time, so this is
+    typically ~2x faster and ~3x smaller than fp32 at a small WER cost.
+    CPU only.
+    """
+
+    name = "whisper-int8"
+
+    def load(self, size, device):
+        import torch
+        import whisper
+        from torch.ao.quantization import default_dynamic_qconfig
+        model = whisper.load_model(size, device="cpu")
+        size_mb = _parameters_mb(model)
+        if "fbgemm" not in torch.backends.quantized.supported_engines:
+            torch.backends.quantized.engine = "qnnpack"  # ARM
+
+        linear_mb = sum(
+            module.weight.numel() * module.weight.element_size()
+            for module in model.modules() if isinstance(module, torch.nn.Linear)
+        ) / (1024 * 1024)
+        model = torch.ao.quantization.quantize_dynamic(
+            model,
+            {torch.nn.Linear: default_dynamic_qconfig, whisper.model.Linear: default_dynamic_qconfig},
+            mapping=_whisper_linear_mapping(),
+            dtype=torch.qint8,
+        )
+        # Packed int8 weights no longer show up in parameters()
+        return model, size_mb - linear_mb * 0.75
+
+
+class FasterWhisperModel:
+    """Adapts faster-whisper's segment generator to openai-whisper's transcribe() result."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, language=None, task="transcribe", initial_prompt=None, word_timestamps=False, **_):
+        segments, info = self.model.transcribe(
+            audio,
+            language=language,
+            task=task,
+            initial_prompt=initial_prompt,
+            word_timestamps=word_timestamps,
+            beam_size=CT2_BEAM_SIZE,
+        )
+        result = []
+        # Segments are decoded lazily as the generator advances, so each
+        # step is a safe point to stop a cancelled job
+        for segment in segments:
+            check_cancelled()
+            item = {
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "avg_logprob": segment.avg_logprob,
+            }
+            if segment.words:
+                item["words"] = [
+                    {"word": word.word, "start": word.start, "end": word.end, "probability": word.probability}
+                    for word in segment.words
+                ]
+            result.append(item)
+        return {"text": "".join(item["text"] for item in result), "segments": result, "language": info.language}
+
+
+class CTranslate2Engine(Engine):
+    """
+    faster-whisper: Whisper converted to CTranslate2, int8 weights on CPU
+    (CT2_COMPUTE_TYPE). Optional dependency: pip install faster-whisper.
+    """
+
+    name = "faster-whisper"
+    module = "faster_whisper"
+
+    def model_sizes(self):
+        import faster_whisper
+        return faster_whisper.available_models()
+
+    def load(self, size, device):
+        from faster_whisper import WhisperModel
+        compute_type = CT2_GPU_COMPUTE_TYPE if device == "cuda" else CT2_COMPUTE_TYPE
+        model = WhisperModel(size, device=device, compute_type=compute_type, cpu_threads=cpu_threads())
+        # CTranslate2 doesn't expose its weights; count the model against
+        # MAX_RESIDENT_MODELS only
+        return FasterWhisperModel(model), 0.0
+
+
+ENGINES: Dict[str, Engine] = {
+    engine.name: engine for engine in (WhisperEngine(), QuantizedWhisperEngine(), CTranslate2Engine())
+}
+
+
+def get_engine(name: Optional[str] = None) -> Engine:
+    name = name or WHISPER_ENGINE
+    engine = ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unknown engine '{name}'. Available: {', '.join(ENGINES)}")
+    if not engine.available():
+        raise ValueError(f"Engine '{name}' needs the '{engine.module}' package, which is not installed")
+    return engine
+
+
+def model_key(size: str, engine: Optional[str] = None) -> str:
+    """
+    Models are named 'size' (default engine) or 'engine:size', e.g. in
+    PRELOAD_MODELS=medium,faster-whisper:small. Returns the 'engine:size' form.
+    """
+    if ":" in size:
+        engine, size = size.split(":", 1)
+    return f"{engine or WHISPER_ENGINE}:{size}"
+
+
+def engines_status() -> Dict[str, bool]:
+    """Engine name -> whether its package is installed."""
+    return {name: engine.available() for name, engine in ENGINES.items()}
@@ -0,0 +1,122 @@
+import json
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from services.job_store import FINISHED_STATUSES
+
+# Jobs whose segment history is kept for late subscribers / partial downloads
+MAX_TRACKED_JOBS = 200
+
+
+class EventBus:
+    """
+    In-process fan-out of job events to Server-Sent Events subscribers.
+
+    publish() is safe to call from worker threads: events are handed to each
+    subscriber's event loop with call_soon_threadsafe. Segment events are also
+    remembered per job so a client connecting late (or reconnecting with
+    Last-Event-ID) can replay them, and so partial subtitles can be served
+    before the job finishes.
+
+    Events only reach subscribers in the publishing process. With
+    JOB_BACKEND=queue jobs run in worker processes, so API clients get
+    status events (relayed from the job store) but no segment events, and
+    partial_segments() has nothing for those jobs.
+    """
+
+    def __init__(self, max_jobs: int = MAX_TRACKED_JOBS):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._sequence: Dict[str, int] = {}
+        # job_id -> [(event_id, event)] of segment events, oldest job first
+        self._segment_events: "OrderedDict[str, List[Tuple[int, Dict]]]" = OrderedDict()
+        # job_id -> {(stage, index): segment}
+        self._segments: Dict[str, Dict[Tuple[str, int], Dict]] = {}
+
+    def publish(self, job_id: str, event_type: str, data: Dict):
+        with self._lock:
+            event_id = self._sequence.get(job_id, 0) + 1
+            self._sequence[job_id] = event_id
+            event = {"id": event_id, "event": event_type, "data": data}
+
+            if event_type == "segment":
+                if job_id not in self._segment_events:
+                    self._segment_events[job_id] = []
+                    self._segments[job_id] = {}
+                    while len(self._segment_events) > self.max_jobs:
+                        old_job, _ = self._segment_events.popitem(last=False)
+                        self._segments.pop(old_job, None)
+                        self._sequence.pop(old_job, None)
+                self._segment_events[job_id].append((event_id, event))
+                self._segments[job_id][(data["stage"], data["index"])] = data
+
+            elif data.get("status") in FINISHED_STATUSES and job_id not in self._segment_events:
+                # Nothing to replay for a finished status-only job; its
+                # final event is on its way to current subscribers below
+                self._sequence.pop(job_id, None)
+
+            subscribers = list(self._subscribers.get(job_id, []))
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def subscribe(self, job_id: str, last_event_id: int = 0) -> Tuple[asyncio.Queue, List[Dict]]:
+        """
+        Registers a subscriber on the running loop. Returns its queue plus the
+        stored segment events newer than last_event_id, to be sent first.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append((asyncio.get_running_loop(), queue))
+            replay = [event for event_id, event in self._segment_events.get(job_id, []) if event_id > last_event_id]
+        return queue, replay
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        with self._lock:
+            remaining = [(loop, q) for loop, q in self._subscribers.get(job_id, []) if q is not queue]
+            if remaining:
+                self._subscribers[job_id] = remaining
+            else:
+                self._subscribers.pop(job_id, None)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def forget(self, job_id: str):
+        """Drops a job's segment history and event ids (the job was deleted)."""
+        with self._lock:
+            self._segment_events.pop(job_id, None)
+            self._segments.pop(job_id, None)
+            self._sequence.pop(job_id, None)
+
+    def subscribed_jobs(self) -> List[str]:
+        with self._lock:
+            return list(self._subscribers)
+
+    def partial_segments(self, job_id: str) -> Optional[List[Dict]]:
+        """
+        Best segments available so far: refined ('final') text where it exists,
+        otherwise the raw Whisper ('draft') text. None if nothing was published.
+        """
+        with self._lock:
+            segments = self._segments.get(job_id)
+            if segments is None:
+                return None
+            merged = {}
+            for (stage, index), segment in segments.items():
+                if stage == "final" or index not in merged:
+                    merged[index] = segment
+        return [
+            {"start": s["start"], "end": s["end"], "text": s["text"], "stage": s["stage"]}
+            for _, s in sorted(merged.items())
+        ]
+
+
+def format_sse(event: Dict) -> str:
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+
+event_bus = EventBus()
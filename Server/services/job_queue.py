@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import importlib
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from services.job_store import JOBS_DB
+from services.scheduler import MAX_QUEUE_WAIT_SECONDS, QUEUE_POLICIES, QUEUE_POLICY, QueueFullError
+
+load_dotenv()
+
+# A claimed job goes back to the queue when its worker hasn't renewed the
+# lease for this long (crashed, killed, lost its disk)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+# How often workers renew leases and pick up cancel requests
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "2"))
+# A job that has taken down this many workers is failed instead of requeued
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+def task_name(fn: Callable) -> str:
+    """'module:function' reference a worker process can import."""
+    return f"{fn.__module__}:{fn.__qualname__}"
+
+
+def resolve_task(name: str) -> Callable:
+    module, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+class DurableQueue:
+    """
+    Job queue shared by API and worker processes through SQLite (the job
+    store's database, WAL mode), with the scheduler's interface on the API
+    side: submit(), cancel(), queue_position(), stats().
+
+    Workers (python worker.py) claim() the next job, which leases it to them
+    for lease_seconds. While a job runs its worker heartbeats to renew the
+    lease; a lease that runs out means the worker died, and the job is
+    requeued for the next claim (or failed once it has used up
+    max_attempts). Cancelling a claimed job sets a flag the worker picks up
+    with its next heartbeat.
+
+    Ordering matches JobScheduler: priority, then arrival order or, with the
+    shortest-first policy, media length (with the same aging).
+    """
+
+    def __init__(
+        self,
+        path: str = JOBS_DB,
+        max_queue: int = 16,
+        policy: str = QUEUE_POLICY,
+        max_wait_seconds: float = MAX_QUEUE_WAIT_SECONDS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}'. Available: {', '.join(QUEUE_POLICIES)}")
+        self.max_queue = max(0, max_queue)
+        self.policy = policy
+        self.max_wait_seconds = max_wait_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.RLock()
+
+        # Autocommit mode; multi-statement changes use BEGIN IMMEDIATE so
+        # two processes never claim the same job
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_queue ("
+            " job_id TEXT PRIMARY KEY,"
+            " task TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " priority INTEGER NOT NULL,"
+            " media_seconds REAL,"
+            " enqueued_at REAL NOT NULL,"
+            " state TEXT NOT NULL,"  # queued | leased
+            " worker TEXT,"
+            " lease_expires REAL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " cancel_requested INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_queue_state ON job_queue(state)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_workers ("
+            " worker TEXT PRIMARY KEY,"
+            " host TEXT NOT NULL,"
+            " pid INTEGER NOT NULL,"
+            " concurrency INTEGER NOT NULL,"
+            " started_at REAL NOT NULL,"
+            " last_seen REAL NOT NULL)"
+        )
+
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    # ----------------------------------------------------------------------
+    # Ordering
+    # ----------------------------------------------------------------------
+    def _sort_key(self, row, now: float):
+        job_id, priority, media_seconds, enqueued_at, seq = row
+        if self.policy == "shortest-first" and now - enqueued_at < self.max_wait_seconds:
+            return (-priority, 1, media_seconds if media_seconds is not None else float("inf"), seq)
+        return (-priority, 0, 0, seq)
+
+    def _ordered_locked(self) -> List[Tuple]:
+        rows = self._conn.execute(
+            "SELECT job_id, priority, media_seconds, enqueued_at, rowid FROM job_queue WHERE state = 'queued'"
+        ).fetchall()
+        now = time.time()
+        return sorted(rows, key=lambda row: self._sort_key(row, now))
+
+    def _live_workers_locked(self) -> List[Tuple]:
+        cutoff = time.time() - self.lease_seconds
+        return self._conn.execute(
+            "SELECT worker, host, pid, concurrency, started_at, last_seen FROM job_workers WHERE last_seen >= ?", (cutoff,)
+        ).fetchall()
+
+    def _idle_slots_locked(self) -> int:
+        capacity = sum(row[3] for row in self._live_workers_locked())
+        leased = self._conn.execute("SELECT COUNT(*) FROM job_queue WHERE state = 'leased'").fetchone()[0]
+        return max(0, capacity - leased)
+
+    def _position_locked(self, job_id: str) -> Optional[int]:
+        idle = self._idle_slots_locked()
+        for i, row in enumerate(self._ordered_locked()):
+            if row[0] == job_id:
+                return max(0, i + 1 - idle)
+        return None
+
+    # ----------------------------------------------------------------------
+    # API side (same interface as JobScheduler)
+    # ----------------------------------------------------------------------
+    def submit(self, job_id: str, fn: Callable, *args, priority: int = 0, media_seconds: Optional[float] = None, **kwargs) -> int:
+        """
+        Queues fn(*args, **kwargs) for a worker process. fn must be a
+        module-level function and the arguments JSON-serializable.
+        Returns the 1-based queue position (0 if a worker is free right away).
+        """
+        payload = json.dumps({"args": args, "kwargs": kwargs}, ensure_ascii=False)
+        with self._lock:
+            self._transaction()
+            try:
+                queued = self._conn.execute("SELECT COUNT(*) FROM job_queue WHERE state = 'queued'").fetchone()[0]
+                if queued >= self.max_queue + self._idle_slots_locked():
+                    raise QueueFullError(f"Job queue is full ({self.max_queue} waiting)")
+                self._conn.execute(
+                    "INSERT INTO job_queue (job_id, task, payload, priority, media_seconds, enqueued_at, state)"
+                    " VALUES (?, ?, ?, ?, ?, ?, 'queued')",
+                    (job_id, task_name(fn), payload, priority, media_seconds, time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._position_locked(job_id)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            return self._position_locked(job_id)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        'dequeued' if the job was still waiting, 'cancelling' if a worker
+        has it (it stops after that worker's next heartbeat), None if the
+        queue doesn't know the job.
+        """
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM job_queue WHERE job_id = ? AND state = 'queued'", (job_id,)).rowcount
+            if removed:
+                return "dequeued"
+            flagged = self._conn.execute("UPDATE job_queue SET cancel_requested = 1 WHERE job_id = ?", (job_id,)).rowcount
+            return "cancelling" if flagged else None
+
+    def contains(self, job_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM job_queue WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            workers = self._live_workers_locked()
+            running = dict(self._conn.execute(
+                "SELECT worker, COUNT(*) FROM job_queue WHERE state = 'leased' GROUP BY worker"
+            ).fetchall())
+            ordered = self._ordered_locked()
+            return {
+                "backend": "queue",
+                "workers": sum(row[3] for row in workers),
+                "running": sum(running.values()),
+                "queued": len(ordered),
+                "max_queue": self.max_queue,
+                "policy": self.policy,
+                "pending": [
+                    {"job_id": job_id, "priority": priority, "media_seconds": media_seconds}
+                    for job_id, priority, media_seconds, _, _ in ordered
+                ],
+                "nodes": [
+                    {
+                        "worker": worker,
+                        "host": host,
+                        "pid": pid,
+                        "concurrency": concurrency,
+                        "running": running.get(worker, 0),
+                        "uptime_seconds": round(time.time() - started_at, 1),
+                        "last_seen_seconds": round(time.time() - last_seen, 1),
+                    }
+                    for worker, host, pid, concurrency, started_at, last_seen in workers
+                ],
+            }
+
+    # ----------------------------------------------------------------------
+    # Worker side
+    # ----------------------------------------------------------------------
+    def register_worker(self, worker: str, concurrency: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_workers (worker, host, pid, concurrency, started_at, last_seen) VALUES (?, ?, ?, ?, ?, ?)",
+                (worker, socket.gethostname(), os.getpid(), concurrency, now, now),
+            )
+
+    def unregister_worker(self, worker: str):
+        """Clean shutdown: anything the worker still holds is requeued right away."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job_queue SET state = 'queued', worker = NULL, lease_expires = NULL, attempts = MAX(0, attempts - 1)"
+                " WHERE worker = ? AND state = 'leased'",
+                (worker,),
+            )
+            self._conn.execute("DELETE FROM job_workers WHERE worker = ?", (worker,))
+
+    def claim(self, worker: str) -> Optional[Tuple[str, str, List, Dict, int]]:
+        """
+        Leases the next job to worker. Returns (job_id, task, args, kwargs,
+        attempt) or None when nothing is queued.
+        """
+        with self._lock:
+            self._transaction()
+            try:
+                ordered = self._ordered_locked()
+                if not ordered:
+                    self._conn.execute("COMMIT")
+                    return None
+                job_id = ordered[0][0]
+                self._conn.execute(
+                    "UPDATE job_queue SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE job_id = ?",
+                    (worker, time.time() + self.lease_seconds, job_id),
+                )
+                task, payload, attempts = self._conn.execute(
+                    "SELECT task, payload, attempts FROM job_queue WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        payload = json.loads(payload)
+        return job_id, task, payload["args"], payload["kwargs"], attempts
+
+    def heartbeat(self, worker: str, job_ids: List[str]) -> Dict[str, str]:
+        """
+        Renews the worker's leases. Returns job_id -> 'ok', 'cancel' (the
+        job was cancelled) or 'lost' (the lease ran out and the job went
+        back to the queue, so this worker must stop working on it).
+        """
+        now = time.time()
+        with self._lock:
+            self._transaction()
+            try:
+                self._conn.execute("UPDATE job_workers SET last_seen = ? WHERE worker = ?", (now, worker))
+                self._conn.execute(
+                    "UPDATE job_queue SET lease_expires = ? WHERE worker = ? AND state = 'leased'",
+                    (now + self.lease_seconds, worker),
+                )
+                held = dict(self._conn.execute(
+                    "SELECT job_id, cancel_requested FROM job_queue WHERE worker = ? AND state = 'leased'", (worker,)
+                ).fetchall())
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {job_id: ("lost" if job_id not in held else "cancel" if held[job_id] else "ok") for job_id in job_ids}
+
+    def confirm(self, job_id: str, worker: str) -> bool:
+        """
+        True if worker still holds the job's lease, which is renewed, so
+        the job can't be requeued while its results are being recorded.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE job_queue SET lease_expires = ? WHERE job_id = ? AND worker = ? AND state = 'leased'",
+                (time.time() + self.lease_seconds, job_id, worker),
+            ).rowcount == 1
+
+    def complete(self, job_id: str, worker: str):
+        """Removes a finished job, unless its lease was lost and it now belongs to another worker."""
+        with self._lock:
+            self._conn.execute("DELETE FROM job_queue WHERE job_id = ? AND worker = ?", (job_id, worker))
+
+    def requeue_expired(self) -> Dict[str, List[str]]:
+        """
+        Handles jobs whose worker stopped heartbeating: requeued, failed
+        after max_attempts, or dropped if they were being cancelled anyway.
+        Returns the job ids by outcome ('requeued', 'failed', 'cancelled');
+        the caller records them in the job store.
+        """
+        outcome = {"requeued": [], "failed": [], "cancelled": []}
+        now = time.time()
+        with self._lock:
+            self._transaction()
+            try:
+                expired = self._conn.execute(
+                    "SELECT job_id, attempts, cancel_requested FROM job_queue WHERE state = 'leased' AND lease_expires < ?", (now,)
+                ).fetchall()
+                for job_id, attempts, cancel_requested in expired:
+                    if cancel_requested or attempts >= self.max_attempts:
+                        self._conn.execute("DELETE FROM job_queue WHERE job_id = ?", (job_id,))
+                        outcome["cancelled" if cancel_requested else "failed"].append(job_id)
+                    else:
+                        self._conn.execute(
+                            "UPDATE job_queue SET state = 'queued', worker = NULL, lease_expires = NULL WHERE job_id = ?", (job_id,)
+                        )
+                        outcome["requeued"].append(job_id)
+                # Workers gone for a long time no longer show up anywhere
+                self._conn.execute("DELETE FROM job_workers WHERE last_seen < ?", (now - 10 * self.lease_seconds,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return outcome
@@ -0,0 +1,276 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JOBS_DB = os.getenv("JOBS_DB", "jobs.sqlite3")
+# Progress ticks for one job are written at most once per this many seconds
+JOB_PROGRESS_FLUSH_SECONDS = float(os.getenv("JOB_PROGRESS_FLUSH_SECONDS", "1.0"))
+# Finished jobs older than this are purged (0 keeps them forever)
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "30"))
+# Upper bound on stored finished jobs, newest kept (0 = unlimited)
+JOB_RETENTION_MAX = int(os.getenv("JOB_RETENTION_MAX", "10000"))
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobStore:
+    """
+    Job records in a SQLite table (WAL mode), one row per job.
+
+    Every update touches only its own row, so the cost of a write no longer
+    grows with job history. Progress ticks are buffered in memory and
+    written at most once per flush interval per job; reads merge the buffer
+    so callers always see the latest value.
+    """
+
+    def __init__(self, path: str = JOBS_DB, flush_interval: float = JOB_PROGRESS_FLUSH_SECONDS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._pending: Dict[str, Dict] = {}
+        self._last_flush: Dict[str, float] = {}
+        self._creates_since_purge = 0
+        self._listeners: List[Callable] = []
+        self._delete_listeners: List[Callable] = []
+
+        # Autocommit mode; multi-statement writes use explicit transactions
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, updated_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated_at)")
+        # Raw Whisper segments per job (zlib-compressed JSON), kept for derived jobs
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_segments ("
+            " job_id TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL)"
+        )
+
+    def add_listener(self, callback: Callable):
+        """
+        callback(job_id, fields) runs after every change, including buffered
+        progress ticks that have not reached the database yet.
+        """
+        self._listeners.append(callback)
+
+    def add_delete_listener(self, callback: Callable):
+        """callback(job_ids) runs after jobs are deleted or purged by retention."""
+        self._delete_listeners.append(callback)
+
+    def _notify_deleted(self, job_ids: List[str]):
+        for callback in self._delete_listeners:
+            try:
+                callback(job_ids)
+            except Exception as e:
+                print(f"Job delete listener failed: {e}")
+
+    def _notify(self, job_id: str, fields: Dict):
+        for callback in self._listeners:
+            try:
+                callback(job_id, fields)
+            except Exception as e:
+                print(f"Job listener failed: {e}")
+
+    # ----------------------------------------------------------------------
+    # Reads
+    # ----------------------------------------------------------------------
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = json.loads(row[0])
+            job.update(self._pending.get(job_id, {}))
+            return job
+
+    def list(self, status: str = None, limit: int = 100) -> List[Dict]:
+        """Most recently updated jobs first, optionally filtered by status."""
+        with self._lock:
+            if status:
+                rows = self._conn.execute(
+                    "SELECT id, data FROM jobs WHERE status = ? ORDER BY updated_at DESC LIMIT ?",
+                    (status, limit),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id, data FROM jobs ORDER BY updated_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+            jobs = []
+            for job_id, data in rows:
+                job = json.loads(data)
+                job.update(self._pending.get(job_id, {}))
+                job["job_id"] = job_id
+                jobs.append(job)
+            return jobs
+
+    def get_segments(self, job_id: str) -> Optional[List[Dict]]:
+        """Raw Whisper segments stored for a job, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM job_segments WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    # ----------------------------------------------------------------------
+    # Writes
+    # ----------------------------------------------------------------------
+    def create(self, job_id: str, record: Dict):
+        now = time.time()
+        record = dict(record)
+        record.setdefault("created_at", now)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                (job_id, record.get("status", "pending"), record["created_at"], now, json.dumps(record)),
+            )
+            self._creates_since_purge += 1
+            if self._creates_since_purge >= 100:
+                self.purge_expired()
+
+    def update(self, job_id: str, **fields):
+        """Writes fields (plus any buffered progress) to the job row immediately."""
+        self._flush(job_id, fields)
+        if fields:
+            self._notify(job_id, fields)
+
+    def _flush(self, job_id: str, fields: Dict = None):
+        with self._lock:
+            fields = {**self._pending.pop(job_id, {}), **(fields or {})}
+            self._last_flush[job_id] = time.monotonic()
+            self._write(job_id, fields)
+
+    def update_progress(self, job_id: str, **fields):
+        """
+        Buffers high-frequency fields such as progress; they reach the
+        database at most once per flush interval (or with the next update()).
+        """
+        with self._lock:
+            self._pending.setdefault(job_id, {}).update(fields)
+            if time.monotonic() - self._last_flush.get(job_id, 0.0) >= self.flush_interval:
+                self._flush(job_id)
+        self._notify(job_id, fields)
+
+    def save_segments(self, job_id: str, segments: List[Dict]):
+        data = zlib.compress(json.dumps(segments, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_segments (job_id, data) VALUES (?, ?)", (job_id, data)
+            )
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._pending.pop(job_id, None)
+            self._last_flush.pop(job_id, None)
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._conn.execute("DELETE FROM job_segments WHERE job_id = ?", (job_id,))
+        self._notify_deleted([job_id])
+
+    def _write(self, job_id: str, fields: Dict):
+        if not fields:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                raise KeyError(job_id)
+            job = json.loads(row[0])
+            job.update(fields)
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE id = ?",
+                (job.get("status", "pending"), time.time(), json.dumps(job), job_id),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        if job.get("status") in FINISHED_STATUSES:
+            self._last_flush.pop(job_id, None)
+
+    # ----------------------------------------------------------------------
+    # Maintenance
+    # ----------------------------------------------------------------------
+    def purge_expired(self) -> int:
+        """Deletes finished jobs past the retention age / count limits."""
+        placeholders = ",".join("?" * len(FINISHED_STATUSES))
+        removed = []
+        with self._lock:
+            self._creates_since_purge = 0
+            if JOB_RETENTION_DAYS > 0:
+                cutoff = time.time() - JOB_RETENTION_DAYS * 86400
+                removed += [row[0] for row in self._conn.execute(
+                    f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ? RETURNING id",
+                    (*FINISHED_STATUSES, cutoff),
+                ).fetchall()]
+            if JOB_RETENTION_MAX > 0:
+                removed += [row[0] for row in self._conn.execute(
+                    f"DELETE FROM jobs WHERE id IN ("
+                    f" SELECT id FROM jobs WHERE status IN ({placeholders})"
+                    f" ORDER BY updated_at DESC LIMIT -1 OFFSET ?) RETURNING id",
+                    (*FINISHED_STATUSES, JOB_RETENTION_MAX),
+                ).fetchall()]
+            if removed:
+                self._conn.execute("DELETE FROM job_segments WHERE job_id NOT IN (SELECT id FROM jobs)")
+        if removed:
+            self._notify_deleted(removed)
+        return len(removed)
+
+    def fail_interrupted(self, message: str = "Interrupted by server restart", keep: Optional[Callable] = None, min_age: float = 0) -> List[str]:
+        """
+        Marks jobs left pending/processing by a previous process as failed;
+        returns their ids. keep(job_id) -> True spares a job that is still
+        alive elsewhere (e.g. in the durable queue); jobs updated within the
+        last min_age seconds are spared too (another process may be about
+        to enqueue them).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('pending', 'processing') AND updated_at <= ?",
+                (time.time() - min_age,),
+            ).fetchall()
+            failed = [job_id for (job_id,) in rows if keep is None or not keep(job_id)]
+            for job_id in failed:
+                self._write(job_id, {"status": "failed", "message": message})
+        return failed
+
+    def import_json(self, path: str) -> int:
+        """One-off migration of the legacy jobs.json file into an empty store."""
+        if not os.path.exists(path):
+            return 0
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM jobs LIMIT 1").fetchone():
+                return 0
+            with open(path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (job_id, job.get("status", "failed"), now, now, json.dumps(job))
+                    for job_id, job in legacy.items()
+                ],
+            )
+            self._conn.execute("COMMIT")
+        return len(legacy)
+
+
+job_store = JobStore()
@@ -0,0 +1,82 @@
+import time
+import threading
+import importlib
+from typing import Dict, List, Optional, Tuple
+
+# Imported first thing by main.py, so this is as close to process start as the app gets
+STARTED_AT = time.perf_counter()
+
+# Slow to import (seconds for torch); nothing imports them at module load,
+# the warmup thread does it once the server is already accepting requests
+HEAVY_MODULES = ("torch", "whisper", "openai")
+
+
+class Lifecycle:
+    """
+    Tracks start-up for the health endpoints:
+
+    - live:  the process is serving requests (/api/health)
+    - ready: heavy imports are done and every PRELOAD_MODELS model is
+             resident, so a job starts without a cold model load (/api/ready)
+    """
+
+    def __init__(self):
+        self.startup_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.errors: Dict[str, str] = {}
+        self._preload: List[str] = []
+        self._modules: Tuple[str, ...] = HEAVY_MODULES
+        self._warm = threading.Event()
+
+    def mark_serving(self):
+        self.startup_seconds = round(time.perf_counter() - STARTED_AT, 3)
+        print(f"Server ready to accept requests in {self.startup_seconds:.2f}s")
+
+    def start_warmup(self, models: List[str], modules: Tuple[str, ...] = HEAVY_MODULES):
+        """Imports the heavy modules and preloads models on a background thread."""
+        self._preload = list(models)
+        self._modules = tuple(modules)
+        threading.Thread(target=self._warmup, name="warmup", daemon=True).start()
+
+    def _warmup(self):
+        # Deferred so the import is cheap for anything that only needs the constants
+        from services.models import model_registry
+
+        started = time.perf_counter()
+        for module in self._modules:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                print(f"Failed to import {module}: {e}")
+                self.errors[module] = str(e)
+        self.errors.update(model_registry.preload(self._preload))
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        print(f"Warmup finished in {self.warmup_seconds:.2f}s")
+        self._warm.set()
+
+    def health(self) -> Dict:
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.perf_counter() - STARTED_AT, 3),
+            "startup_seconds": self.startup_seconds,
+        }
+
+    def readiness(self) -> Dict:
+        from services.models import model_registry
+
+        missing = [name for name in self._preload if not model_registry.is_loaded(name)]
+        warm = self._warm.is_set()
+        # A failed import or preload is degraded even while the rest still warms up
+        degraded = bool(self.errors) or (warm and bool(missing))
+        ready = warm and not degraded
+        return {
+            "ready": ready,
+            "status": "degraded" if degraded else ("ready" if ready else "warming"),
+            "startup_seconds": self.startup_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "models": {name: name not in missing for name in self._preload},
+            "errors": self.errors,
+        }
+
+
+lifecycle = Lifecycle()
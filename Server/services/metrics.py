@@ -0,0 +1,243 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Histogram buckets in seconds, from sub-second stages up to multi-hour jobs
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+# Real-time factor: processing time / media duration
+RTF_BUCKETS = (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterator[Tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, labels, value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=SECONDS_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()]
+        for labels, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), bucket_count
+            yield f"{self.name}_bucket", labels + (("le", "+Inf"),), count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class CallbackMetric(Metric):
+    """
+    A gauge or counter whose samples are read from another component when
+    the metrics are scraped (queue depth, cache statistics, ...).
+    callback() returns a number or a list of (labels dict, number).
+    """
+
+    def __init__(self, name: str, help_text: str, callback: Callable, kind: str = "gauge"):
+        super().__init__(name, help_text)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e}")
+            return
+        if isinstance(values, (int, float)):
+            values = [({}, values)]
+        for labels, value in values:
+            yield self.name, _label_key(labels), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.register(Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets=SECONDS_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, buckets))
+
+    def callback(self, name: str, help_text: str, callback: Callable, kind: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help_text, callback, kind))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram("matrix_stage_seconds", "Time spent per pipeline stage.")
+jobs_total = registry.counter("matrix_jobs_total", "Finished jobs by final status.")
+job_processing_seconds = registry.histogram("matrix_job_processing_seconds", "Wall time from job start to finish, excluding queueing.")
+job_rtf = registry.histogram("matrix_job_rtf", "Real-time factor of finished jobs (processing time / media duration).", RTF_BUCKETS)
+media_seconds_total = registry.counter("matrix_media_seconds_total", "Seconds of media processed by completed jobs.")
+llm_request_seconds = registry.histogram("matrix_llm_request_seconds", "Latency of individual LLM requests.")
+llm_requests_total = registry.counter("matrix_llm_requests_total", "LLM requests by outcome (ok, retry, error).")
+model_load_seconds = registry.histogram("matrix_model_load_seconds", "Time to load a Whisper model.")
+
+
+# --------------------------------------------------------------------------
+# Per-job stage timing
+# --------------------------------------------------------------------------
+class JobTimer:
+    """
+    Collects stage durations for one job. Stages are recorded by stage()
+    on the thread the job runs on; repeated stages add up.
+    """
+
+    def __init__(self, job_id: str, queued_seconds: Optional[float] = None):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.queued_seconds = queued_seconds
+        self.media_seconds: Optional[float] = None
+        self.details: Dict[str, Dict] = {}
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def detail(self, name: str, value: Dict):
+        """Extra per-job figures from a stage (e.g. the VAD summary), stored in the job record."""
+        self.details[name] = value
+
+    def report(self) -> Dict:
+        """Fields stored in the job record."""
+        elapsed = time.perf_counter() - self.started
+        report = {
+            "timings": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            "processing_seconds": round(elapsed, 3),
+        }
+        if self.queued_seconds is not None:
+            report["queued_seconds"] = round(self.queued_seconds, 3)
+        if self.media_seconds:
+            report["media_seconds"] = round(self.media_seconds, 3)
+            report["rtf"] = round(elapsed / self.media_seconds, 4)
+        report.update(self.details)
+        return report
+
+    def finish(self, status: str) -> Dict:
+        """Records the job in the process-wide metrics and returns report()."""
+        report = self.report()
+        jobs_total.inc(status=status)
+        job_processing_seconds.observe(report["processing_seconds"])
+        if status == "completed" and "rtf" in report:
+            job_rtf.observe(report["rtf"])
+            media_seconds_total.inc(report["media_seconds"])
+        return report
+
+
+_current = threading.local()
+
+
+def current_timer() -> Optional[JobTimer]:
+    return getattr(_current, "timer", None)
+
+
+@contextmanager
+def track_job(job_id: str, queued_seconds: Optional[float] = None):
+    """Makes a JobTimer current for the calling thread while the job runs."""
+    timer = JobTimer(job_id, queued_seconds)
+    previous = current_timer()
+    _current.timer = timer
+    try:
+        yield timer
+    finally:
+        _current.timer = previous
+
+
+@contextmanager
+def stage(name: str):
+    """Times a pipeline stage into matrix_stage_seconds and the current job, if any."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stage_seconds.observe(seconds, stage=name)
+        timer = current_timer()
+        if timer is not None:
+            timer.add(name, seconds)
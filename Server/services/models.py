@@ -0,0 +1,179 @@
+import os
+import time
+import threading
+import functools
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+from services.audio import SAMPLE_RATE
+from services.metrics import model_load_seconds, stage
+from services.engines import WHISPER_ENGINE, cpu_threads, engines_status, get_engine, model_key
+
+load_dotenv()
+
+DEFAULT_MODEL_SIZE = os.getenv("WHISPER_MODEL", "medium")
+# How many models may stay loaded at once, and their combined weight budget
+MAX_RESIDENT_MODELS = int(os.getenv("MAX_RESIDENT_MODELS", "2"))
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))  # 0 = no budget
+# Comma-separated models to load (and warm up) in the background when the
+# server starts, as 'size' or 'engine:size'; the server reports ready once
+# they are loaded. Empty disables.
+PRELOAD_MODELS = [name.strip() for name in os.getenv("PRELOAD_MODELS", DEFAULT_MODEL_SIZE).split(",") if name.strip()]
+
+# Whisper installs per-call hooks on a model, so two transcribe() calls must
+# never run on it at the same time. Serialising inference also keeps parallel
+# job workers from oversubscribing the GPU / CPU cores.
+inference_lock = threading.Lock()
+
+
+# torch and whisper take seconds to import, so nothing imports them at module
+# load; the first model load (or the start-up warmup thread) pays instead.
+@functools.lru_cache(maxsize=None)
+def available_models(engine: Optional[str] = None) -> List[str]:
+    return get_engine(engine).model_sizes()
+
+def validate_model(size: str, engine: Optional[str] = None) -> str:
+    """Raises ValueError for an unknown / not installed engine or model size; returns the engine name."""
+    backend = get_engine(engine)
+    if size not in available_models(backend.name):
+        raise ValueError(f"Unknown model size '{size}' for engine '{backend.name}'. Available: {', '.join(available_models(backend.name))}")
+    return backend.name
+
+
+class ModelRegistry:
+    """
+    Keeps up to max_resident Whisper models loaded, evicting the least
+    recently used one when the count or memory budget is exceeded. Models
+    are keyed 'engine:size' (see services/engines.py), so the same size on
+    two backends counts as two models.
+
+    Loads are serialised per model name, so concurrent requests for a model
+    that isn't resident yet wait for a single load instead of each starting
+    their own; different models can still load side by side.
+    """
+
+    def __init__(self, max_resident: int = MAX_RESIDENT_MODELS, budget_mb: float = MODEL_MEMORY_BUDGET_MB):
+        self.max_resident = max(1, max_resident)
+        self.budget_mb = budget_mb
+        self._device: Optional[str] = None
+        self._models: "OrderedDict[str, object]" = OrderedDict()
+        self._sizes_mb: Dict[str, float] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def device(self) -> str:
+        if self._device is None:
+            try:
+                import torch
+            except ImportError:
+                # CTranslate2-only deployments don't need PyTorch
+                self._device = "cpu"
+                return self._device
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            if device == "cpu":
+                torch.set_num_threads(cpu_threads())
+            self._device = device
+        return self._device
+
+    def get(self, name: str = DEFAULT_MODEL_SIZE, engine: Optional[str] = None):
+        name = model_key(name, engine)
+        engine, size = name.split(":", 1)
+        backend = get_engine(engine)
+        validate_model(size, engine)
+
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    return self._models[name]
+
+            print(f"Loading Whisper model: {name}...")
+            started = time.perf_counter()
+            with stage("model_load"):
+                model, size_mb = backend.load(size, self.device)
+            model_load_seconds.observe(time.perf_counter() - started, model=name)
+            print("Model loaded.")
+
+            with self._lock:
+                self._models[name] = model
+                self._sizes_mb[name] = size_mb
+                self.loads += 1
+                self._evict_locked(keep=name)
+        return model
+
+    def _evict_locked(self, keep: str):
+        def over_limit():
+            if len(self._models) > self.max_resident:
+                return True
+            return self.budget_mb > 0 and sum(self._sizes_mb.values()) > self.budget_mb
+
+        evicted = False
+        while len(self._models) > 1 and over_limit():
+            victim = next(name for name in self._models if name != keep)
+            # Jobs still holding a reference finish normally; memory is freed after
+            del self._models[victim]
+            del self._sizes_mb[victim]
+            self.evictions += 1
+            evicted = True
+            print(f"Evicted Whisper model: {victim}")
+        if evicted and self.device == "cuda":
+            import torch
+            torch.cuda.empty_cache()
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            return model_key(name) in self._models
+
+    def preload(self, names: List[str], warmup: bool = True) -> Dict[str, str]:
+        """
+        Loads models ahead of the first job, optionally running one second of
+        silence through each. Returns {name: error} for models that failed.
+        """
+        failed = {}
+        for name in names:
+            try:
+                model = self.get(name)
+                if warmup:
+                    with inference_lock:
+                        model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language="en", verbose=None)
+            except Exception as e:
+                print(f"Failed to preload model {name}: {e}")
+                failed[name] = str(e)
+        return failed
+
+    def resident(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+    def stats(self) -> Dict:
+        available = available_models()  # outside the lock: may import whisper
+        with self._lock:
+            return {
+                "device": self._device,  # None until the first model load
+                "default": DEFAULT_MODEL_SIZE,
+                "default_engine": WHISPER_ENGINE,
+                "available": available,
+                "engines": engines_status(),
+                "resident": [
+                    {"name": name, "size_mb": round(self._sizes_mb[name], 1)}
+                    for name in self._models
+                ],
+                "max_resident": self.max_resident,
+                "budget_mb": self.budget_mb,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,345 @@
+import os
+import re
+import time
+import random
+import hashlib
+import unicodedata
+import asyncio
+import threading
+import concurrent.futures
+from typing import Callable, List, Optional
+from dotenv import load_dotenv
+from services.cache import CACHE_DIR, SqliteLRUCache
+from services.cancellation import check_cancelled, on_cancel
+from services.metrics import llm_request_seconds, llm_requests_total
+
+load_dotenv()
+
+# --------------------------------------------------------------------------
+# CONFIG
+# --------------------------------------------------------------------------
+# Point OPENROUTER_BASE_URL at any OpenAI-compatible server (e.g. a local fake)
+LLM_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+# Requests in flight at once, shared by every job in the process
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+# Consecutive segments packed into one prompt (1 disables batching)
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1.0"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Per-job cap on request starts per second (0 = unlimited)
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "5"))
+# Max refined segments kept on disk before least-recently-used ones are evicted
+REFINE_CACHE_MAX_ENTRIES = int(os.getenv("REFINE_CACHE_MAX_ENTRIES", "200000"))
+
+# Bump whenever the prompts below change so stale cached refinements are ignored
+PROMPT_VERSION = "1"
+
+ROMANIZED_PROMPT = (
+    "You are a multilingual code-switching normalization expert. "
+    "The user will provide a raw speech transcription that may contain phonetic errors, "
+    "incorrect spellings, mixed scripts, or ASR (speech-to-text) artifacts.\n\n"
+
+    "YOUR TASK:\n"
+    "Convert the input into clean, natural, and readable Romanized text "
+    "while preserving the original spoken language(s) and sentence structure.\n\n"
+
+    "LANGUAGE RULES:\n"
+    "1. DO NOT translate between languages.\n"
+    "   - Preserve every word in the language it was spoken.\n"
+    "   - Only normalize spelling and readability.\n\n"
+
+    "2. English words MUST be written in correct standard English spelling.\n"
+    "   - Example: time, computer, subscribe, video, upload\n\n"
+
+    "3. Non-English words MUST be written in natural Romanization.\n"
+    "   - Hindi → Hinglish (kya, hum, hai, karenge)\n"
+    "   - Gujarati → Roman Gujarati (shu, tame, chhe)\n"
+    "   - Hinglish / Hingujarati → keep natural code-switching\n\n"
+
+    "4. Fix phonetic or broken ASR output into meaningful words.\n"
+    "   - Example: 'taiming' → 'timing'\n"
+    "   - Example: 'vidiyo' → 'video'\n\n"
+
+    "5. Maintain original sentence meaning, tone, and order.\n"
+    "   - Do NOT rephrase or rewrite stylistically.\n\n"
+
+    "FORMATTING RULES:\n"
+    "6. Use proper capitalization for names and sentence starts.\n"
+    "7. Add basic punctuation where clearly required.\n"
+    "8. Output ONLY the refined text. No explanations.\n\n"
+
+    "EXAMPLES:\n"
+    "Input: 'Mera naam raj hai aur aaj ham vidiyo edit karenge'\n"
+    "Output: 'Mera naam Raj hai aur aaj hum video edit karenge.'\n\n"
+
+    "Input: 'Iska taiming galat hai'\n"
+    "Output: 'Iska timing galat hai.'\n\n"
+
+    "Input: 'shu tame aaj office jasho ke nahi'\n"
+    "Output: 'Shu tame aaj office jasho ke nahi?'\n\n"
+
+    "Input: 'Aaj meeting ka time change ho gaya hai'\n"
+    "Output: 'Aaj meeting ka time change ho gaya hai.'"
+)
+
+TRANSLATE_PROMPT = (
+    "You are an expert translator. Translate the following text into natural, fluent English. "
+    "Maintain the original tone and meaning. Output ONLY the translation."
+)
+
+SYSTEM_PROMPTS = {
+    "romanized": ROMANIZED_PROMPT,
+    "translate": TRANSLATE_PROMPT,
+}
+
+# Appended to the system prompt when several segments share one request
+BATCH_INSTRUCTIONS = (
+    "\n\nBATCH FORMAT:\n"
+    "The input contains {count} numbered subtitle lines, one per line, written as '[n] text'. "
+    "Apply the task to each line independently. Do NOT merge, split, reorder or drop lines. "
+    "Reply with exactly {count} lines in the same '[n] refined text' format and nothing else."
+)
+
+_BATCH_LINE = re.compile(r"^\s*\[(\d+)\]\s?(.*)$")
+
+refinement_cache = SqliteLRUCache(
+    os.path.join(CACHE_DIR, "refinement.sqlite3"),
+    max_entries=REFINE_CACHE_MAX_ENTRIES,
+)
+
+def _model_name() -> str:
+    return os.getenv("OPENROUTER_MODEL", "meta-llama/llama-3.1-8b-instruct")
+
+def cache_key(text: str, mode: str, model_name: str) -> str:
+    """
+    Key for one refined segment. Whitespace and Unicode form are normalized so
+    Whisper's spacing quirks don't defeat the cache.
+    """
+    normalized = unicodedata.normalize("NFC", " ".join(text.split()))
+    raw = "\x1f".join([PROMPT_VERSION, model_name, mode, normalized])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# --------------------------------------------------------------------------
+# SHARED EVENT LOOP + CLIENT
+# --------------------------------------------------------------------------
+# All refinement runs on one long-lived loop thread so the HTTP connection
+# pool inside the client survives across jobs instead of being rebuilt per call.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_client = None  # openai.AsyncOpenAI, created on first use
+_semaphore: Optional[asyncio.Semaphore] = None
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-refinement", daemon=True).start()
+    return _loop
+
+def _get_client():
+    # Only ever called from the loop thread, so no locking needed
+    global _client, _semaphore
+    if _client is None:
+        # Imported on first use: the openai package is slow to import
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(
+            base_url=LLM_BASE_URL,
+            api_key=os.getenv("OPENROUTER_API_KEY") or "missing",
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=0, # retries are handled below with our own backoff
+        )
+        _semaphore = asyncio.Semaphore(max(1, LLM_CONCURRENCY))
+    return _client
+
+def configure_llm(base_url: str):
+    """
+    Points refinement at another OpenAI-compatible server. LLM_BASE_URL is
+    read from the environment once at import and the client keeps the URL it
+    was created with, so changing OPENROUTER_BASE_URL later has no effect:
+    this replaces both, and the next request builds a fresh client.
+    """
+    global LLM_BASE_URL, _client
+    LLM_BASE_URL = base_url
+    _client = None
+
+class RateLimiter:
+    """
+    Spaces out request starts so a single job never exceeds `rate` requests/second.
+    """
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            if self._next_start > now:
+                await asyncio.sleep(self._next_start - now)
+                now = self._next_start
+            self._next_start = now + self.interval
+
+# --------------------------------------------------------------------------
+# REQUESTS
+# --------------------------------------------------------------------------
+def _is_retryable(error: Exception) -> bool:
+    from openai import APIConnectionError, RateLimitError, InternalServerError
+    # APIConnectionError also covers timeouts
+    return isinstance(error, (APIConnectionError, RateLimitError, InternalServerError))
+
+async def _chat(system_prompt: str, user_prompt: str, limiter: RateLimiter) -> str:
+    client = _get_client()
+    model_name = _model_name()
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await limiter.wait()
+        try:
+            async with _semaphore:
+                started = time.perf_counter()
+                response = await client.chat.completions.create(
+                    extra_headers={
+                        "HTTP-Referer": "https://localhost:3000", # Optional
+                        "X-Title": "MatrixSRTTool", # Optional
+                    },
+                    model=model_name,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ]
+                )
+            llm_request_seconds.observe(time.perf_counter() - started)
+            llm_requests_total.inc(outcome="ok")
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                llm_requests_total.inc(outcome="error")
+                raise
+            llm_requests_total.inc(outcome="retry")
+            # Exponential backoff with jitter so parallel requests don't retry in lockstep
+            delay = LLM_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+            print(f"LLM request failed ({e}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+def _unpack_batch(reply: str, count: int) -> Optional[List[str]]:
+    """
+    Parses '[n] text' lines back into a list. Returns None when the model
+    did not keep the segment boundaries intact.
+    """
+    results = {}
+    for line in reply.splitlines():
+        match = _BATCH_LINE.match(line)
+        if match:
+            results[int(match.group(1))] = match.group(2).strip()
+    if sorted(results) != list(range(1, count + 1)):
+        return None
+    return [results[i] for i in range(1, count + 1)]
+
+async def _refine_one(text: str, mode: str, limiter: RateLimiter) -> Optional[str]:
+    try:
+        return await _chat(SYSTEM_PROMPTS[mode], text, limiter)
+    except Exception as e:
+        print(f"LLM Refinement Failed: {e}")
+        return None
+
+async def _refine_batch(texts: List[str], mode: str, limiter: RateLimiter) -> List[Optional[str]]:
+    """
+    Refines consecutive segments in one request. Failed segments come back as None.
+    """
+    if len(texts) == 1:
+        return [await _refine_one(texts[0], mode, limiter)]
+
+    packed = "\n".join(f"[{i}] {' '.join(t.split())}" for i, t in enumerate(texts, start=1))
+    system_prompt = SYSTEM_PROMPTS[mode] + BATCH_INSTRUCTIONS.format(count=len(texts))
+    try:
+        reply = await _chat(system_prompt, packed, limiter)
+    except Exception as e:
+        print(f"LLM Refinement Failed: {e}")
+        return [None] * len(texts)
+
+    refined = _unpack_batch(reply, len(texts))
+    if refined is None:
+        # The model merged or dropped lines; redo this batch one segment at a time
+        print(f"Batch reply lost segment boundaries, retrying {len(texts)} segments individually")
+        refined = await asyncio.gather(*(_refine_one(t, mode, limiter) for t in texts))
+    return list(refined)
+
+async def refine_segments_async(texts: List[str], mode: str, progress_callback: Callable = None, segment_callback: Callable = None) -> List[str]:
+    """
+    Refines many segment texts concurrently, packing LLM_BATCH_SIZE consecutive
+    segments per request. Cached refinements and repeated lines within the job
+    never reach the network. Output order and length always match the input;
+    segments that fail keep their original text.
+    progress_callback: function(done, total)
+    segment_callback: function(index, text), called as soon as each segment is final
+    """
+    if mode not in SYSTEM_PROMPTS:
+        return list(texts)
+
+    results = list(texts)
+    model_name = _model_name()
+
+    # 1. Serve what we can from the cache, and collapse duplicates so each
+    #    distinct line is only sent once
+    keys = {}
+    for i, text in enumerate(texts):
+        if text.strip():
+            keys.setdefault(cache_key(text, mode, model_name), []).append(i)
+    cached = refinement_cache.get_many(keys)
+    for key, value in cached.items():
+        for i in keys[key]:
+            results[i] = value
+            if segment_callback:
+                segment_callback(i, value)
+    missing = [key for key in keys if key not in cached]
+
+    done = len(texts) - sum(len(keys[key]) for key in missing)
+    if progress_callback and done:
+        progress_callback(done, len(texts))
+
+    # 2. Send the rest in batches of consecutive segments
+    batch_size = max(1, LLM_BATCH_SIZE)
+    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+    limiter = RateLimiter(LLM_REQUESTS_PER_SECOND)
+
+    async def run(batch):
+        nonlocal done
+        refined = await _refine_batch([texts[keys[key][0]] for key in batch], mode, limiter)
+        fresh = []
+        for key, text in zip(batch, refined):
+            if text is not None:
+                fresh.append((key, text))
+                for i in keys[key]:
+                    results[i] = text
+            if segment_callback:
+                for i in keys[key]:
+                    segment_callback(i, results[i])
+        refinement_cache.set_many(fresh)
+        done += sum(len(keys[key]) for key in batch)
+        if progress_callback:
+            progress_callback(done, len(texts))
+
+    await asyncio.gather(*(run(batch) for batch in batches))
+    return results
+
+def refine_segments(texts: List[str], mode: str, progress_callback: Callable = None, segment_callback: Callable = None) -> List[str]:
+    """
+    Blocking wrapper around refine_segments_async for worker threads.
+    """
+    if mode not in SYSTEM_PROMPTS or not texts:
+        return list(texts)
+    check_cancelled()
+    future = asyncio.run_coroutine_threadsafe(
+        refine_segments_async(texts, mode, progress_callback, segment_callback), _get_loop()
+    )
+    # Cancelling the job cancels the task on the loop, which aborts the
+    # requests in flight and drops the batches not sent yet
+    with on_cancel(future.cancel):
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            check_cancelled()
+            raise
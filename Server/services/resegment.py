@@ -0,0 +1,194 @@
+import os
+from bisect import bisect_right
+from typing import Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _optional_limit(name: str, cast):
+    value = os.getenv(name, "").strip()
+    return cast(value) if value else None
+
+
+# Limits applied whenever a transcript is resegmented, on top of what the job
+# asks for. Unset means no limit, so a words_per_line-only job gets plain
+# word-count lines (common values: 42 chars, 17 cps, 1.0 s)
+MAX_CHARS_PER_LINE = _optional_limit("SUBTITLE_MAX_CHARS", int)
+MAX_CHARS_PER_SECOND = _optional_limit("SUBTITLE_MAX_CPS", float)
+MAX_GAP_SECONDS = _optional_limit("SUBTITLE_MAX_GAP_SECONDS", float)
+
+
+class WordTimeline:
+    """
+    All words of a transcript in flat arrays: word i spans
+    [starts[i], ends[i]] and has text words[i] of chars[i] characters.
+    """
+
+    def __init__(self, words: List[str], starts: np.ndarray, ends: np.ndarray):
+        self.words = words
+        self.starts = starts
+        self.ends = ends
+        self.chars = np.fromiter((len(w) for w in words), dtype=np.int64, count=len(words))
+
+    def __len__(self):
+        return len(self.words)
+
+
+def build_timeline(segments: List[Dict]) -> WordTimeline:
+    """
+    Flattens segments into a WordTimeline.
+    Segments carrying Whisper word timestamps ('words') use them as-is; for
+    the rest (e.g. LLM-refined text) word times are interpolated inside the
+    segment in proportion to each word's length.
+    """
+    words: List[str] = []
+    starts: List[np.ndarray] = []
+    ends: List[np.ndarray] = []
+
+    # Segments without word timings are interpolated together in one pass
+    plain_words: List[str] = []
+    plain_counts: List[int] = []
+    plain_bounds: List[tuple] = []
+    plain_slots: List[int] = []  # position of each plain segment in the output order
+
+    for segment in segments:
+        timed = segment.get("words")
+        if timed:
+            items = [(w["word"].strip(), w["start"], w["end"]) for w in timed if w["word"].strip()]
+            if items:
+                words.extend(item[0] for item in items)
+                starts.append(np.fromiter((item[1] for item in items), dtype=np.float64, count=len(items)))
+                ends.append(np.fromiter((item[2] for item in items), dtype=np.float64, count=len(items)))
+            continue
+
+        split = segment["text"].split()
+        if not split:
+            continue
+        plain_slots.append(len(starts))
+        starts.append(None)
+        ends.append(None)
+        words.extend(split)
+        plain_words.extend(split)
+        plain_counts.append(len(split))
+        plain_bounds.append((segment["start"], segment["end"]))
+
+    if plain_counts:
+        counts = np.asarray(plain_counts)
+        bounds = np.asarray(plain_bounds, dtype=np.float64)
+        lengths = np.fromiter((len(w) for w in plain_words), dtype=np.float64, count=len(plain_words))
+
+        # Characters before each word within its own segment, and per-segment totals
+        seg_index = np.repeat(np.arange(len(counts)), counts)
+        cumulative = np.cumsum(lengths)
+        seg_end_cum = np.cumsum(np.bincount(seg_index, weights=lengths))
+        seg_start_cum = seg_end_cum - np.bincount(seg_index, weights=lengths)
+        before = cumulative - lengths - seg_start_cum[seg_index]
+        totals = (seg_end_cum - seg_start_cum)[seg_index]
+
+        seg_start = bounds[seg_index, 0]
+        duration = bounds[seg_index, 1] - seg_start
+        word_starts = seg_start + duration * (before / totals)
+        word_ends = seg_start + duration * ((before + lengths) / totals)
+
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        for n, slot in enumerate(plain_slots):
+            starts[slot] = word_starts[offsets[n]:offsets[n + 1]]
+            ends[slot] = word_ends[offsets[n]:offsets[n + 1]]
+
+    if not words:
+        empty = np.empty(0, dtype=np.float64)
+        return WordTimeline([], empty, empty)
+    return WordTimeline(words, np.concatenate(starts), np.concatenate(ends))
+
+
+def resegment(
+    segments: List[Dict],
+    max_words: Optional[int] = None,
+    max_chars: Optional[int] = MAX_CHARS_PER_LINE,
+    max_cps: Optional[float] = MAX_CHARS_PER_SECOND,
+    max_gap: Optional[float] = MAX_GAP_SECONDS,
+) -> List[Dict]:
+    """
+    Regroups a transcript into subtitle lines.
+    - A line never spans a silence longer than max_gap seconds.
+    - A line holds at most max_words words and max_chars characters
+      (a single longer word still gets its own line).
+    - A line is cut short when it couldn't be read at max_cps
+      characters/second before the next word starts; the line then ends at
+      the last word where it can, typically a pause. Speech too fast at any
+      line length keeps the longest line the other limits allow.
+    - Lines read faster than max_cps are held on screen longer, up to the
+      start of the next line.
+    Limits set to None/0 are ignored.
+    """
+    timeline = build_timeline(segments)
+    n = len(timeline)
+    if n == 0:
+        return []
+
+    # 1. Hard breaks: word i starts a new line when the gap before it is too long
+    hard_break = np.zeros(n, dtype=bool)
+    if max_gap:
+        hard_break[1:] = (timeline.starts[1:] - timeline.ends[:-1]) > max_gap
+    break_positions = np.flatnonzero(hard_break)
+
+    # Line width counts one separating space per word
+    width = np.concatenate(([0], np.cumsum(timeline.chars + 1)))
+    # A line ending at word i can stay on screen until word i + 1 starts
+    # (the last line gets no extra time when deciding where to break)
+    next_start = np.append(timeline.starts[1:], timeline.ends[-1])
+
+    # 2. Greedy line filling; each iteration places a whole line using
+    #    binary searches over the cumulative arrays (plus a vectorized
+    #    reading-speed search for lines that are too fast), so the Python
+    #    loop runs once per output line rather than once per word. Plain
+    #    lists make the scalar lookups far cheaper than NumPy calls here.
+    breaks = break_positions.tolist()
+    widths = width.tolist()
+    starts = timeline.starts.tolist()
+    next_starts = next_start.tolist()
+    line_starts = []
+    start = 0
+    while start < n:
+        end = n
+        next_break = bisect_right(breaks, start)
+        if next_break < len(breaks):
+            end = breaks[next_break]
+        if max_words:
+            end = min(end, start + max_words)
+        if max_chars:
+            # Largest end with width[end] - width[start] - 1 <= max_chars
+            end = min(end, bisect_right(widths, widths[start] + max_chars + 1) - 1)
+        end = max(end, start + 1)
+        if max_cps and end - start > 1 and widths[end] - widths[start] - 1 > max_cps * (next_starts[end - 1] - starts[start]):
+            # Too fast: longest line that can be read before the word after it starts
+            ends = np.arange(start + 1, end + 1)
+            chars = width[ends] - width[start] - 1
+            room = next_start[ends - 1] - timeline.starts[start]
+            readable = np.flatnonzero(chars <= max_cps * room)
+            if readable.size:
+                end = start + 1 + int(readable[-1])
+        line_starts.append(start)
+        start = end
+
+    bounds = np.asarray(line_starts + [n])
+    first, last = bounds[:-1], bounds[1:] - 1
+    line_start_times = timeline.starts[first]
+    line_end_times = timeline.ends[last].copy()
+
+    # 3. Reading speed: extend dense lines into the following silence
+    if max_cps:
+        chars = width[bounds[1:]] - width[first] - 1
+        needed = line_start_times + chars / max_cps
+        limit = np.append(line_start_times[1:], np.inf)
+        line_end_times = np.maximum(line_end_times, np.minimum(needed, limit))
+
+    words = timeline.words
+    return [
+        {"start": start, "end": end, "text": " ".join(words[a:b])}
+        for start, end, a, b in zip(
+            line_start_times.tolist(), line_end_times.tolist(), line_starts, bounds[1:].tolist()
+        )
+    ]
@@ -0,0 +1,190 @@
+import os
+import time
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from services.cancellation import CancelToken, activate
+
+load_dotenv()
+
+# Order of waiting jobs with the same priority:
+#   fifo            - arrival order
+#   shortest-first  - shortest media first, so short clips don't wait behind long ones
+QUEUE_POLICY = os.getenv("QUEUE_POLICY", "fifo")
+# With shortest-first, a job that has waited this long is no longer overtaken
+# by shorter ones (keeps long media from starving under a stream of short clips)
+MAX_QUEUE_WAIT_SECONDS = float(os.getenv("MAX_QUEUE_WAIT_SECONDS", "600"))
+
+QUEUE_POLICIES = ("fifo", "shortest-first")
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the pending queue is at capacity."""
+
+
+class _Entry:
+    __slots__ = ("job_id", "fn", "args", "kwargs", "priority", "media_seconds", "seq", "submitted", "token")
+
+    def __init__(self, job_id, fn, args, kwargs, priority, media_seconds, seq):
+        self.job_id = job_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.media_seconds = media_seconds
+        self.seq = seq
+        self.submitted = time.monotonic()
+        self.token = CancelToken(job_id)
+
+
+class JobScheduler:
+    """
+    Runs jobs on a fixed pool of worker threads fed by a bounded priority queue.
+
+    The pool size caps how many pipelines run at once, so heavy jobs never
+    pile up on the machine. Jobs beyond capacity wait in the queue and can
+    report their position; once the queue itself is full, submit() refuses
+    new work instead of accepting an unbounded backlog.
+
+    Waiting jobs run highest priority first, then in arrival order or, with
+    the shortest-first policy, shortest media first. Every job carries a
+    CancelToken: cancel() drops a waiting job from the queue or signals a
+    running one to stop at its next safe point.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 16, policy: str = QUEUE_POLICY, max_wait_seconds: float = MAX_QUEUE_WAIT_SECONDS):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}'. Available: {', '.join(QUEUE_POLICIES)}")
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.policy = policy
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: List[_Entry] = []
+        self._running: Dict[str, CancelToken] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def _ensure_started(self):
+        # Threads are started lazily so importing the module (e.g. under the
+        # uvicorn reloader) does not spawn workers that never get used.
+        if self._threads:
+            return
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job_id: str, fn: Callable, *args, priority: int = 0, media_seconds: Optional[float] = None, **kwargs) -> int:
+        """
+        Queues fn(*args, **kwargs) for execution.
+        priority: higher runs first
+        media_seconds: expected media duration, used by the shortest-first policy
+        Returns the 1-based queue position (0 if a worker is free right away).
+        """
+        with self._cond:
+            self._ensure_started()
+            if len(self._pending) >= self.max_queue + max(0, self.max_workers - len(self._running)):
+                raise QueueFullError(f"Job queue is full ({self.max_queue} waiting)")
+            self._pending.append(_Entry(job_id, fn, args, kwargs, priority, media_seconds, next(self._seq)))
+            position = self._position_locked(job_id)
+            self._cond.notify()
+        return position
+
+    def _sort_key(self, entry: _Entry, now: float):
+        if self.policy == "shortest-first" and now - entry.submitted < self.max_wait_seconds:
+            # Unknown durations go after every known one
+            length = entry.media_seconds if entry.media_seconds is not None else float("inf")
+            return (-entry.priority, 1, length, entry.seq)
+        return (-entry.priority, 0, 0, entry.seq)
+
+    def _ordered_locked(self) -> List[_Entry]:
+        # The queue is small (MAX_QUEUED_JOBS), and with aging the order
+        # changes over time anyway, so it is simply sorted when needed
+        now = time.monotonic()
+        return sorted(self._pending, key=lambda entry: self._sort_key(entry, now))
+
+    def _position_locked(self, job_id: str) -> Optional[int]:
+        idle = self.max_workers - len(self._running)
+        for i, entry in enumerate(self._ordered_locked()):
+            if entry.job_id == job_id:
+                return max(0, i + 1 - idle)
+        return None
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """Returns the job's 1-based position in the queue, or None if it is not waiting."""
+        with self._cond:
+            return self._position_locked(job_id)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancels a job. Returns 'dequeued' if it was still waiting (it will
+        never run), 'cancelling' if it is running and has been signalled,
+        or None if the scheduler doesn't know the job.
+        """
+        with self._cond:
+            for entry in self._pending:
+                if entry.job_id == job_id:
+                    self._pending.remove(entry)
+                    return "dequeued"
+            token = self._running.get(job_id)
+        if token is None:
+            return None
+        # Outside the lock: callbacks kill processes and may take a moment
+        token.cancel()
+        return "cancelling"
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "backend": "local",
+                "workers": self.max_workers,
+                "running": len(self._running),
+                "queued": len(self._pending),
+                "max_queue": self.max_queue,
+                "policy": self.policy,
+                "pending": [
+                    {"job_id": entry.job_id, "priority": entry.priority, "media_seconds": entry.media_seconds}
+                    for entry in self._ordered_locked()
+                ],
+            }
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                entry = self._ordered_locked()[0]
+                self._pending.remove(entry)
+                self._running[entry.job_id] = entry.token
+            try:
+                with activate(entry.token):
+                    entry.fn(*entry.args, **entry.kwargs)
+            except Exception as e:
+                # The job function is expected to record its own failure;
+                # never let one job take a worker thread down with it.
+                print(f"Worker error in job {entry.job_id}: {e}")
+            finally:
+                with self._cond:
+                    self._running.pop(entry.job_id, None)
+
+
+# Where jobs run:
+#   local  - scheduler threads inside the API process (single process)
+#   queue  - worker processes (python worker.py) claiming jobs from a durable
+#            SQLite queue, so API processes hold no job state
+JOB_BACKEND = os.getenv("JOB_BACKEND", "local")
+
+if JOB_BACKEND == "queue":
+    # Imported here: job_queue builds on the names defined above
+    from services.job_queue import DurableQueue
+
+    scheduler = DurableQueue(max_queue=int(os.getenv("MAX_QUEUED_JOBS", "16")))
+elif JOB_BACKEND == "local":
+    scheduler = JobScheduler(
+        max_workers=int(os.getenv("TRANSCRIPTION_WORKERS", "1")),
+        max_queue=int(os.getenv("MAX_QUEUED_JOBS", "16")),
+    )
+else:
+    raise ValueError(f"Unknown JOB_BACKEND '{JOB_BACKEND}'. Available: local, queue")
@@ -1,31 +1,167 @@
-from datetime import timedelta
-from typing import List, Dict
+import os
+import json
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+import numpy as np
+from dotenv import load_dotenv
 
-def format_timestamp(seconds: float) -> str:
+load_dotenv()
+
+# Write buffer for subtitle files
+WRITE_BUFFER_BYTES = 1024 * 1024
+# Cues formatted together; timestamps of a block are computed in one NumPy pass
+BLOCK_CUES = 4096
+
+
+def format_timestamp(seconds: float, separator: str = ",") -> str:
     """
-    Formats seconds into SRT timestamp format: HH:MM:SS,mmm
+    Formats seconds as HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (WebVTT) using
+    integer arithmetic on milliseconds.
     """
-    td = timedelta(seconds=seconds)
-    total_seconds = int(td.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    secs = total_seconds % 60
-    millis = int(td.microseconds / 1000)
-    
-    return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
+    hours, ms = divmod(max(0, int(seconds * 1000 + 0.5)), 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02}{separator}{ms:03}"
+
+
+def _blocks(segments: Iterable[Dict]) -> Iterator[List[Dict]]:
+    iterator = iter(segments)
+    while block := list(islice(iterator, BLOCK_CUES)):
+        yield block
+
+
+def _split_ms(block: List[Dict], key: str, unit_ms: int = 1):
+    """Hours, minutes, seconds and remainder (in units of unit_ms) for one timestamp per cue."""
+    values = np.fromiter((segment[key] for segment in block), dtype=np.float64, count=len(block))
+    ticks = (np.maximum(values, 0.0) * (1000 / unit_ms) + 0.5).astype(np.int64)
+    per_second = 1000 // unit_ms
+    secs, frac = np.divmod(ticks, per_second)
+    minutes, secs = np.divmod(secs, 60)
+    hours, minutes = np.divmod(minutes, 60)
+    return zip(hours.tolist(), minutes.tolist(), secs.tolist(), frac.tolist())
+
+
+def _timestamps(block: List[Dict], key: str, separator: str) -> List[str]:
+    template = f"%02d:%02d:%02d{separator}%03d"
+    return [template % parts for parts in _split_ms(block, key)]
+
+
+# ----------------------------------------------------------------------
+# Format writers: each yields the file as a sequence of text chunks,
+# one per block of cues
+# ----------------------------------------------------------------------
+def iter_srt(segments: Iterable[Dict]) -> Iterator[str]:
+    index = 0
+    for block in _blocks(segments):
+        starts, ends = _timestamps(block, "start", ","), _timestamps(block, "end", ",")
+        cues = []
+        for segment, start, end in zip(block, starts, ends):
+            index += 1
+            cues.append(f"{index}\n{start} --> {end}\n{segment['text']}\n")
+        yield ("\n" if index > len(block) else "") + "\n".join(cues)
+
+
+def iter_vtt(segments: Iterable[Dict]) -> Iterator[str]:
+    yield "WEBVTT\n"
+    for block in _blocks(segments):
+        starts, ends = _timestamps(block, "start", "."), _timestamps(block, "end", ".")
+        # "-->" would end the cue timing line early
+        yield "".join(
+            f"\n{start} --> {end}\n{segment['text'].replace('-->', '->')}\n"
+            for segment, start, end in zip(block, starts, ends)
+        )
+
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1920
+PlayResY: 1080
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,3,1,2,60,60,50,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def iter_ass(segments: Iterable[Dict]) -> Iterator[str]:
+    yield ASS_HEADER
+    for block in _blocks(segments):
+        # ASS uses H:MM:SS.cc (centiseconds)
+        starts = ["%d:%02d:%02d.%02d" % parts for parts in _split_ms(block, "start", unit_ms=10)]
+        ends = ["%d:%02d:%02d.%02d" % parts for parts in _split_ms(block, "end", unit_ms=10)]
+        cues = []
+        for segment, start, end in zip(block, starts, ends):
+            # Braces start override tags and newlines must be written as \N
+            text = segment["text"].replace("{", "(").replace("}", ")").replace("\n", "\\N")
+            cues.append(f"Dialogue: 0,{start},{end},Default,,0,0,0,,{text}\n")
+        yield "".join(cues)
+
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def iter_json(segments: Iterable[Dict]) -> Iterator[str]:
+    # A JSON array of {start, end, text}; each block is encoded in one call
+    yield "["
+    first = True
+    for block in _blocks(segments):
+        cues = _json_encoder.encode([{"start": s["start"], "end": s["end"], "text": s["text"]} for s in block])
+        yield ("" if first else ", ") + cues[1:-1]
+        first = False
+    yield "]\n"
+
+
+# format -> (writer, file extension, media type)
+SUBTITLE_FORMATS = {
+    "srt": (iter_srt, ".srt", "application/x-subrip"),
+    "vtt": (iter_vtt, ".vtt", "text/vtt"),
+    "ass": (iter_ass, ".ass", "text/x-ssa"),
+    "json": (iter_json, ".json", "application/json"),
+}
+
+# Formats written when a job finishes; others are rendered on first download
+OUTPUT_FORMATS = [
+    fmt.strip() for fmt in os.getenv("SUBTITLE_OUTPUT_FORMATS", "srt,json").split(",")
+    if fmt.strip() in SUBTITLE_FORMATS
+] or ["srt"]
+
+
+def _writer(fmt: str):
+    if fmt not in SUBTITLE_FORMATS:
+        raise ValueError(f"Unknown subtitle format '{fmt}'. Available: {', '.join(SUBTITLE_FORMATS)}")
+    return SUBTITLE_FORMATS[fmt][0]
+
+
+def render_subtitles(segments: Iterable[Dict], fmt: str = "srt") -> str:
+    return "".join(_writer(fmt)(segments))
+
+
+def write_subtitles(segments: Iterable[Dict], path: str, fmt: str = "srt") -> str:
+    """
+    Streams subtitles to path one cue at a time, so memory use does not grow
+    with the transcript. The file is written under a temporary name and
+    moved into place, so readers never see a half-written file.
+    """
+    writer = _writer(fmt)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) as f:
+        f.writelines(writer(segments))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_json_subtitles(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 
 def generate_srt(segments: List[Dict]) -> str:
     """
     Generates SRT content from transcription segments.
     """
-    srt_content = []
-    
-    for i, segment in enumerate(segments, start=1):
-        start_time = format_timestamp(segment["start"])
-        end_time = format_timestamp(segment["end"])
-        text = segment["text"]
-        
-        srt_block = f"{i}\n{start_time} --> {end_time}\n{text}\n"
-        srt_content.append(srt_block)
-        
-    return "\n".join(srt_content)
+    return render_subtitles(segments, "srt")
@@ -1,137 +1,69 @@
-import whisper
-import torch
-from indic_transliteration import sanscript
-from typing import List, Dict
+from typing import List, Dict, Union
+import numpy as np
 import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from openai import OpenAI
+from services.cancellation import check_cancelled
+from services.refinement import refine_segments
+from services.cache import CACHE_DIR, SqliteLRUCache
+from services.chunked import compact_segment, use_chunked, transcribe_chunked
+from services.models import DEFAULT_MODEL_SIZE, inference_lock, model_registry
+from services.engines import get_engine
+from services.resegment import MAX_CHARS_PER_LINE, resegment
+from services.metrics import current_timer, stage
+from services.audio import MAX_IN_MEMORY_AUDIO_SECONDS, load_audio_file
+from services.vad import VAD_ENABLED, detect_speech, vad_signature
+from services.transliteration import normalize_policy, romanize_segments, transliterate_batch
 
 load_dotenv()
 
-# Global model cache
-model = None
+# Ask Whisper for per-word timings when a job resegments, so lines break at
+# real word boundaries. Alignment costs extra inference per 30 s window, so
+# jobs that keep Whisper's segments never pay for it; 0 turns it off entirely
+# (resegmentation then interpolates word times)
+WORD_TIMESTAMPS = os.getenv("WORD_TIMESTAMPS", "1") == "1"
 
-def load_model(model_size="medium"):
-    global model
-    if model is None:
-        print(f"Loading Whisper model: {model_size}...")
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        model = whisper.load_model(model_size, device=device)
-        print("Model loaded.")
-    return model
+# Raw Whisper segments keyed by media content hash + decode options
+transcript_cache = SqliteLRUCache(
+    os.path.join(CACHE_DIR, "transcripts.sqlite3"),
+    max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "5000")),
+)
 
-def refine_text_with_llm(text: str, mode: str) -> str:
+def load_model(model_size=DEFAULT_MODEL_SIZE, engine: str = None):
     """
-    Refines transcription using OpenRouter LLM.
+    Returns a loaded Whisper model from the shared registry.
+    engine: inference backend (see services/engines.py), WHISPER_ENGINE if None
     """
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    # Basic check for placeholder or empty key
-    if not api_key or "sk-or-v1" not in api_key or "your_key_here" in api_key: 
-        # Note: The placeholder I wrote starts with sk-or-v1 so I should check against the exact placeholder string if I knew it, 
-        # but for now let's just proceed if it looks somewhat valid or skip if obviously default.
-        # Actually, let's just try to use it. If it fails, we catch the exception.
-        pass
-
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=api_key
-    )
-    
-    model_name = os.getenv("OPENROUTER_MODEL", "meta-llama/llama-3.1-8b-instruct")
-
-    system_prompt = "You are a helpful assistant."
-    user_prompt = text
-
-    if mode == "romanized":
-       system_prompt = (
-        "You are a multilingual code-switching normalization expert. "
-        "The user will provide a raw speech transcription that may contain phonetic errors, "
-        "incorrect spellings, mixed scripts, or ASR (speech-to-text) artifacts.\n\n"
-
-        "YOUR TASK:\n"
-        "Convert the input into clean, natural, and readable Romanized text "
-        "while preserving the original spoken language(s) and sentence structure.\n\n"
-
-        "LANGUAGE RULES:\n"
-        "1. DO NOT translate between languages.\n"
-        "   - Preserve every word in the language it was spoken.\n"
-        "   - Only normalize spelling and readability.\n\n"
-
-        "2. English words MUST be written in correct standard English spelling.\n"
-        "   - Example: time, computer, subscribe, video, upload\n\n"
-
-        "3. Non-English words MUST be written in natural Romanization.\n"
-        "   - Hindi → Hinglish (kya, hum, hai, karenge)\n"
-        "   - Gujarati → Roman Gujarati (shu, tame, chhe)\n"
-        "   - Hinglish / Hingujarati → keep natural code-switching\n\n"
-
-        "4. Fix phonetic or broken ASR output into meaningful words.\n"
-        "   - Example: 'taiming' → 'timing'\n"
-        "   - Example: 'vidiyo' → 'video'\n\n"
+    return model_registry.get(model_size, engine)
 
-        "5. Maintain original sentence meaning, tone, and order.\n"
-        "   - Do NOT rephrase or rewrite stylistically.\n\n"
-
-        "FORMATTING RULES:\n"
-        "6. Use proper capitalization for names and sentence starts.\n"
-        "7. Add basic punctuation where clearly required.\n"
-        "8. Output ONLY the refined text. No explanations.\n\n"
-
-        "EXAMPLES:\n"
-        "Input: 'Mera naam raj hai aur aaj ham vidiyo edit karenge'\n"
-        "Output: 'Mera naam Raj hai aur aaj hum video edit karenge.'\n\n"
-
-        "Input: 'Iska taiming galat hai'\n"
-        "Output: 'Iska timing galat hai.'\n\n"
-
-        "Input: 'shu tame aaj office jasho ke nahi'\n"
-        "Output: 'Shu tame aaj office jasho ke nahi?'\n\n"
+def refine_text_with_llm(text: str, mode: str) -> str:
+    """
+    Refines a single transcription segment using the OpenRouter LLM.
+    Whole transcripts should go through refine_segments, which batches requests.
+    """
+    return refine_segments([text], mode)[0]
 
-        "Input: 'Aaj meeting ka time change ho gaya hai'\n"
-        "Output: 'Aaj meeting ka time change ho gaya hai.'"
-    )
+def resegments(words_per_line: int = None, max_chars: int = None) -> bool:
+    """True if a job with these line limits is resegmented (see refine_and_resegment)."""
+    return bool((words_per_line and words_per_line > 0) or (max_chars and max_chars > 0))
 
-    elif mode == "translate":
-        system_prompt = (
-            "You are an expert translator. Translate the following text into natural, fluent English. "
-            "Maintain the original tone and meaning. Output ONLY the translation."
-        )
-    else:
-        return text
+def needs_word_timestamps(words_per_line: int = None, max_chars: int = None) -> bool:
+    return WORD_TIMESTAMPS and resegments(words_per_line, max_chars)
 
-    try:
-        response = client.chat.completions.create(
-            extra_headers={
-                "HTTP-Referer": "https://localhost:3000", # Optional
-                "X-Title": "MatrixSRTTool", # Optional
-            },
-            model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"LLM Refinement Failed: {e}")
-        return text
-
-def transcribe_audio(audio_path: str, language: str, mode: str, words_per_line: int = None, progress_callback=None):
+def whisper_options(language: str, mode: str, word_timestamps: bool = False) -> Dict:
     """
-    Transcribes audio using Whisper.
+    Builds the model.transcribe() options for a job.
     language: 'en', 'hi', 'gu', etc.
     mode: 'native' (script), 'romanized' (transliterated to english chars), or 'translate' (english translation)
-    words_per_line: Optional[int] - Max words per subtitle line
-    progress_callback: function(percentage)
+    word_timestamps: align words too (see needs_word_timestamps)
     """
-    model = load_model()
-    
     # Validation / Adjustment for Whisper language codes
     # Whisper supports: en, hi, gu
     whisper_lang = language
     
-    # Transcribe options
-    task = "transcribe"
     initial_prompt = None
     
     if mode == "romanized":
@@ -145,110 +77,300 @@ def transcribe_audio(audio_path: str, language: str, mode: str, words_per_line:
     options = {
         "language": whisper_lang,
         "task": "transcribe", # Always transcribe first to capture phonetic content
-        "verbose": False
+        "verbose": False,
+        "word_timestamps": word_timestamps
     }
     
     if initial_prompt:
         options["initial_prompt"] = initial_prompt
+    return options
+
+def transcript_cache_key(content_hash: str, options: Dict, model_size: str, engine: str = None) -> str:
+    """
+    Raw Whisper output only depends on the media bytes, the model, the
+    engine running it, the decode options and the VAD settings.
+    """
+    engine = get_engine(engine).name
+    raw = "\x1f".join([
+        content_hash,
+        # Entries from before engines existed are openai-whisper ones
+        model_size if engine == "whisper" else f"{engine}:{model_size}",
+        options.get("language") or "",
+        options.get("task") or "",
+        options.get("initial_prompt") or "",
+        "words" if options.get("word_timestamps") else "",
+        # Empty with VAD off, so entries from before the pre-pass stay valid
+        vad_signature(),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def get_cached_segments(content_hash: str, language: str, mode: str, model_size: str = DEFAULT_MODEL_SIZE, engine: str = None, word_timestamps: bool = False):
+    """
+    Returns the raw Whisper segments for previously transcribed media, or None.
+    Segments with word timings serve any job; ones without only serve jobs
+    that don't need word_timestamps.
+    """
+    if not content_hash:
+        return None
+    variants = [True] if word_timestamps else [True, False]
+    keys = [
+        transcript_cache_key(content_hash, whisper_options(language, mode, words), model_size, engine)
+        for words in variants
+    ]
+    cached = transcript_cache.get_many(keys)
+    for key in keys:
+        if key in cached:
+            return json.loads(cached[key])
+    return None
+
+@contextmanager
+def cancellable_decode(model):
+    """
+    Whisper's transcribe() calls model.decode() once per 30 s window, which
+    is the one point where it can stop cleanly. Shadow the method on the
+    instance (inference_lock is held, so no other job uses the model) to
+    check for cancellation before each window.
+    """
+    decode = getattr(model, "decode", None)
+    if decode is None:
+        # Engines without a per-window decode() check for cancellation themselves
+        yield model
+        return
+
+    def checked_decode(*args, **kwargs):
+        check_cancelled()
+        return decode(*args, **kwargs)
+
+    model.decode = checked_decode
+    try:
+        yield model
+    finally:
+        del model.decode
+
+def run_whisper(audio: Union[str, np.ndarray], language: str, mode: str, progress_callback=None, content_hash: str = None, model_size: str = DEFAULT_MODEL_SIZE, segment_callback=None, engine: str = None, word_timestamps: bool = False) -> List[Dict]:
+    """
+    Runs Whisper and returns the raw segments (start, end, text).
+    audio: path to an audio file (a WAV from extract_audio is read directly),
+           or a mono 16 kHz float32 array from decode_audio
+    When content_hash is given the result is stored in the transcript cache.
+    progress_callback: function(percentage)
+    segment_callback: function(index, segment) for each raw segment as it becomes available
+    engine: inference backend (see services/engines.py), WHISPER_ENGINE if None
+    word_timestamps: align words too; see needs_word_timestamps
+    """
+    options = whisper_options(language, mode, word_timestamps)
+    engine = get_engine(engine).name
 
     # Notify start of whisper
     if progress_callback:
         progress_callback(10) # 10% done (audio loading / model loading assumption)
 
-    result = model.transcribe(audio_path, **options)
-    segments = result["segments"]
-    
-    processed_segments = []
-    total_segments = len(segments)
-    
-    for i, segment in enumerate(segments):
-        text = segment["text"]
-        start = segment["start"]
-        end = segment["end"]
-        
-        # Refine with LLM if mode matches
-        if mode in ["romanized", "translate"]:
-             text = refine_text_with_llm(text, mode)
-        
-        # Fallback for Native mode / Just raw text
-        
-        processed_segments.append({
-            "start": start,
-            "end": end,
-            "text": text.strip()
-        })
-
+    def chunk_progress(done, total):
         if progress_callback:
+            # Whisper owns the 10-50% band of the transcription progress
+            progress_callback(10 + (done / total * 40))
+
+    if isinstance(audio, str):
+        # Usually a WAV from extract_audio: read the samples here rather than
+        # letting Whisper run ffmpeg on it again, so VAD and chunked mode apply
+        # too. Past MAX_IN_MEMORY_AUDIO_SECONDS it stays on disk (int16 PCM)
+        with stage("decode"):
+            audio = load_audio_file(audio, MAX_IN_MEMORY_AUDIO_SECONDS)
+    windowed = audio.dtype == np.int16
+
+    # Only speech reaches the model; timestamps are mapped back afterwards
+    # (windowed audio is trimmed one window at a time instead)
+    speech = None
+    if VAD_ENABLED and not windowed:
+        check_cancelled()
+        with stage("vad"):
+            speech = detect_speech(audio)
+            if speech.worth_skipping():
+                print(f"VAD: transcribing {speech.speech_seconds:.1f}s of speech in {len(speech.regions)} regions, skipping {speech.skipped_fraction:.0%}")
+                audio = speech.compact(audio)
+            else:
+                speech = None
+    if speech is not None:
+        segment_callback = speech.remap_callback(segment_callback)
+
+    whisper_seconds = 0.0
+    with inference_lock:
+        if speech is not None and not speech.regions:
+            # Nothing but silence: no model load, no inference
+            segments = []
+        elif use_chunked(len(audio)):
+            # Long media: overlapping windows across the worker process pool
+            # (worker start-up and model loads happen inside this stage)
+            started = time.perf_counter()
+            with stage("whisper"):
+                segments = transcribe_chunked(
+                    audio, options, model_size, engine=engine, vad=windowed and VAD_ENABLED,
+                    progress_callback=chunk_progress, segment_callback=segment_callback,
+                )
+            whisper_seconds = time.perf_counter() - started
+        elif windowed:
+            # Too long to hold in memory: the same overlapping windows, one
+            # after another on this process's model
+            model = load_model(model_size, engine)
+            started = time.perf_counter()
+            with stage("whisper"), cancellable_decode(model):
+                segments = transcribe_chunked(
+                    audio, options, model_size, engine=engine, vad=VAD_ENABLED, model=model,
+                    progress_callback=chunk_progress, segment_callback=segment_callback,
+                )
+            whisper_seconds = time.perf_counter() - started
+        else:
+            model = load_model(model_size, engine)
+            check_cancelled()
+            started = time.perf_counter()
+            with stage("whisper"), cancellable_decode(model):
+                result = model.transcribe(audio, **options)
+            whisper_seconds = time.perf_counter() - started
+            segments = [compact_segment(segment) for segment in result["segments"]]
+            if segment_callback:
+                for index, segment in enumerate(segments):
+                    segment_callback(index, segment)
+
+    if speech is not None:
+        segments = [speech.remap(segment) for segment in segments]
+        timer = current_timer()
+        report = speech.report(whisper_seconds)
+        if timer is not None:
+            timer.detail("vad", report)
+
+    if content_hash:
+        key = transcript_cache_key(content_hash, options, model_size, engine)
+        transcript_cache.set(key, json.dumps(segments, ensure_ascii=False))
+    return segments
+
+def romanize(segments: List[Dict], policy: str = None, progress_callback=None, segment_callback=None):
+    """
+    Romanized-mode text for each segment, following the romanization policy
+    ('llm', 'local' or 'local-then-llm', see services/transliteration.py).
+    Returns the texts and the indices of segments that were romanized locally.
+    progress_callback: function(done, total) for the LLM part
+    segment_callback: function(index, text) as each segment is ready
+    """
+    texts = [segment["text"] for segment in segments]
+    policy = normalize_policy(policy)
+    if policy == "llm":
+        return refine_segments(texts, "romanized", progress_callback=progress_callback, segment_callback=segment_callback), set()
+
+    local_texts, confident = romanize_segments(segments)
+    if policy == "local":
+        confident = [True] * len(segments)
+    pending = [index for index, ok in enumerate(confident) if not ok]
+    local = set(range(len(segments))) - set(pending)
+
+    if segment_callback:
+        for index in sorted(local):
+            segment_callback(index, local_texts[index])
+
+    if pending:
+        print(f"Romanized {len(local)} segments locally, sending {len(pending)} low-confidence segments to the LLM...")
+
+        def pending_segment(position, text):
+            if segment_callback:
+                segment_callback(pending[position], text)
+
+        refined = refine_segments([texts[index] for index in pending], "romanized", progress_callback=progress_callback, segment_callback=pending_segment)
+        for index, text in zip(pending, refined):
+            # An LLM failure hands back the original text; the local result beats that
+            if text == texts[index]:
+                local.add(index)
+            else:
+                local_texts[index] = text
+    elif progress_callback:
+        progress_callback(len(segments), len(segments))
+    return local_texts, local
+
+def refine_and_resegment(segments: List[Dict], mode: str, words_per_line: int = None, progress_callback=None, segment_callback=None, max_chars: int = None, romanization_policy: str = None) -> List[Dict]:
+    """
+    Post-Whisper stages: romanization / LLM refinement, then resegmentation.
+    words_per_line / max_chars: line limits; resegmentation only runs if one is set
+    romanization_policy: overrides ROMANIZATION_POLICY for romanized mode
+    progress_callback: function(percentage)
+    segment_callback: function(index, segment) as each refined segment is ready
+    """
+    def refinement_progress(done, total):
+        if progress_callback and total:
             # Whisper done (say 50%), so we map remaining 50% to refinement
-            # Base progress 50%.
-            # Each segment adds to the remaining 50%.
-            current_progress = 50 + ((i + 1) / total_segments * 50)
-            progress_callback(current_progress)
+            progress_callback(50 + (done / total * 50))
+
+    # Refine with LLM if mode matches (native mode passes text through untouched)
+    def refined_segment(index, text):
+        if segment_callback:
+            segment = segments[index]
+            segment_callback(index, {"start": segment["start"], "end": segment["end"], "text": text.strip()})
+
+    texts = [segment["text"] for segment in segments]
+    words = [segment.get("words") for segment in segments]
+    if mode == "romanized":
+        with stage("refine"):
+            texts, local = romanize(segments, romanization_policy, progress_callback=refinement_progress, segment_callback=refined_segment)
+            words = romanize_words(segments, texts, local)
+    elif mode == "translate":
+        with stage("refine"):
+            texts = refine_segments(texts, mode, progress_callback=refinement_progress, segment_callback=refined_segment)
+    elif progress_callback:
+        progress_callback(100)
+
+    processed_segments = []
+    for segment, text, segment_words in zip(segments, texts, words):
+        processed = {"start": segment["start"], "end": segment["end"], "text": text.strip()}
+        # Word timings only stay valid while the words are Whisper's own
+        # (or their one-to-one local transliteration)
+        if segment_words and (text == segment["text"] or segment_words is not segment.get("words")):
+            processed["words"] = segment_words
+        processed_segments.append(processed)
 
     # Resegmentation (if requested)
-    if words_per_line and words_per_line > 0:
-        print(f"Resegmenting to {words_per_line} words per line...")
-        processed_segments = resegment_text(processed_segments, words_per_line)
+    if resegments(words_per_line, max_chars):
+        print(f"Resegmenting to {words_per_line or '-'} words / {max_chars or MAX_CHARS_PER_LINE or '-'} chars per line...")
+        with stage("resegment"):
+            processed_segments = resegment_text(processed_segments, words_per_line, max_chars or MAX_CHARS_PER_LINE)
+    else:
+        for segment in processed_segments:
+            segment.pop("words", None)
     
     return processed_segments
 
-def resegment_text(segments: List[Dict], max_words: int) -> List[Dict]:
+def romanize_words(segments: List[Dict], texts: List[str], local: set) -> List:
     """
-    Resegments the text into chunks of roughly 'max_words' length.
-    Uses linear interpolation for timestamps since we don't have word-level timestamps.
+    Word timings for romanized segments: words of locally transliterated
+    segments are transliterated in one batch and kept when they still line
+    up with the segment text; other segments keep Whisper's words.
     """
-    # 1. Flatten to words with interpolated timestamps
-    all_words = []
-    
-    for seg in segments:
-        text = seg["text"].strip()
-        if not text:
-            continue
-            
-        start = seg["start"]
-        end = seg["end"]
-        duration = end - start
-        
-        words = text.split()
-        num_words = len(words)
-        
-        if num_words == 0:
-            continue
-            
-        # Time per word (naive distribution)
-        time_per_word = duration / num_words
-        
-        for i, word in enumerate(words):
-            word_start = start + (i * time_per_word)
-            word_end = start + ((i + 1) * time_per_word)
-            all_words.append({
-                "word": word,
-                "start": word_start,
-                "end": word_end
-            })
-            
-    # 2. Regroup into new segments
-    new_segments = []
-    current_segment_words = []
-    current_start = None
-    
-    for i, w in enumerate(all_words):
-        if not current_segment_words:
-            current_start = w["start"]
-            
-        current_segment_words.append(w["word"])
-        
-        # Check if we reached max words or end of list
-        if len(current_segment_words) >= max_words or i == len(all_words) - 1:
-            segment_text = " ".join(current_segment_words)
-            segment_end = w["end"]
-            
-            new_segments.append({
-                "start": current_start,
-                "end": segment_end,
-                "text": segment_text
-            })
-            
-            current_segment_words = []
-            
-    return new_segments
+    words = [segment.get("words") for segment in segments]
+    indices = [index for index in sorted(local) if words[index]]
+    romanized = iter(transliterate_batch([word["word"] for index in indices for word in words[index]]))
+    for index in indices:
+        converted = [{**word, "word": next(romanized)} for word in words[index]]
+        matches = " ".join(word["word"] for word in converted).split() == texts[index].split()
+        words[index] = converted if matches else None
+    return words
+
+def transcribe_audio(audio_path: Union[str, np.ndarray], language: str, mode: str, words_per_line: int = None, progress_callback=None, content_hash: str = None, model_size: str = DEFAULT_MODEL_SIZE, engine: str = None):
+    """
+    Transcribes audio using Whisper.
+    audio_path: path to an audio file, or a mono 16 kHz float32 array
+    language: 'en', 'hi', 'gu', etc.
+    mode: 'native' (script), 'romanized' (transliterated to english chars), or 'translate' (english translation)
+    words_per_line: Optional[int] - Max words per subtitle line
+    progress_callback: function(percentage)
+    content_hash: Optional[str] - Hash of the source media; enables the transcript cache
+    model_size: Whisper model name ('tiny', 'base', 'small', 'medium', ...)
+    engine: inference backend ('whisper', 'whisper-int8', 'faster-whisper'); WHISPER_ENGINE if None
+    """
+    word_timestamps = needs_word_timestamps(words_per_line)
+    segments = get_cached_segments(content_hash, language, mode, model_size, engine, word_timestamps)
+    if segments is None:
+        segments = run_whisper(audio_path, language, mode, progress_callback=progress_callback, content_hash=content_hash, model_size=model_size, engine=engine, word_timestamps=word_timestamps)
+    return refine_and_resegment(segments, mode, words_per_line=words_per_line, progress_callback=progress_callback)
+
+def resegment_text(segments: List[Dict], max_words: int, max_chars: int = MAX_CHARS_PER_LINE) -> List[Dict]:
+    """
+    Resegments the text into lines of at most 'max_words' words and 'max_chars' characters.
+    Uses Whisper word timestamps where segments carry them, otherwise interpolates.
+    """
+    return resegment(segments, max_words=max_words, max_chars=max_chars)
@@ -0,0 +1,193 @@
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How romanized mode turns Devanagari/Gujarati into Latin script:
+#   llm              - every segment goes to the LLM (default)
+#   local            - offline transliteration only, no network calls
+#   local-then-llm   - offline first; only low-confidence segments go to the LLM
+#                      (also accepted as local-then-llm-only-for-low-confidence)
+ROMANIZATION_POLICY = os.getenv("ROMANIZATION_POLICY", "llm")
+# Segments Whisper decoded with a lower average log-probability than this are
+# considered low confidence (likely ASR errors the LLM can repair)
+TRANSLITERATION_MIN_LOGPROB = float(os.getenv("TRANSLITERATION_MIN_LOGPROB", "-0.8"))
+
+POLICIES = ("llm", "local", "local-then-llm")
+POLICY_ALIASES = {"local-then-llm-only-for-low-confidence": "local-then-llm"}
+
+
+def normalize_policy(policy: Optional[str]) -> str:
+    policy = policy or ROMANIZATION_POLICY
+    policy = POLICY_ALIASES.get(policy, policy)
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown romanization policy '{policy}'. Available: {', '.join(POLICIES)}")
+    return policy
+
+
+# --------------------------------------------------------------------------
+# Mapping tables (Devanagari; Gujarati is folded onto Devanagari first)
+# --------------------------------------------------------------------------
+VIRAMA = "्"
+NUKTA = "़"
+INHERENT_A = "अ"  # written after a consonant that keeps its inherent vowel
+
+VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "i", "उ": "u", "ऊ": "u", "ऋ": "ri", "ॠ": "ri",
+    "ऌ": "li", "ए": "e", "ऐ": "ai", "ओ": "o", "औ": "au", "ऑ": "o", "ऍ": "e", "ऎ": "e", "ऒ": "o",
+}
+VOWEL_SIGNS = {
+    "ा": "aa", "ि": "i", "ी": "i", "ु": "u", "ू": "u", "ृ": "ri", "ॄ": "ri", "े": "e",
+    "ै": "ai", "ो": "o", "ौ": "au", "ॉ": "o", "ॅ": "e", "ॆ": "e", "ॊ": "o",
+}
+CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n", "ऩ": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ऱ": "r", "ल": "l", "ळ": "l", "ऴ": "l", "व": "v",
+    "श": "sh", "ष": "sh", "स": "s", "ह": "h",
+    # Precomposed nukta letters (U+0958..U+095F)
+    **dict(zip(map(chr, range(0x0958, 0x0960)), ["q", "kh", "g", "z", "r", "rh", "f", "y"])),
+}
+OTHER_SIGNS = {
+    "ं": "n", "ँ": "n", "ः": "h", VIRAMA: "", "ऽ": "", "।": ".", "॥": ".", "ॐ": "om",
+    **{chr(0x0966 + digit): str(digit) for digit in range(10)},
+}
+
+# Consonant + nukta sequences mapped to their precomposed letters
+_NUKTA_FORMS = {unicodedata.normalize("NFD", letter): letter for letter in CONSONANTS if len(unicodedata.normalize("NFD", letter)) == 2}
+
+# English words as Hindi writes them. Spelled out phonetically they would
+# come out as 'vidiyo' or 'ophis', so they are put back in English instead
+LOANWORDS = {
+    "वीडियो": "video", "विडियो": "video", "ऑफिस": "office", "ऑफ़िस": "office",
+    "कंप्यूटर": "computer", "कम्प्यूटर": "computer", "प्रोग्रामिंग": "programming", "कोडिंग": "coding",
+    "इंटरनेट": "internet", "मोबाइल": "mobile", "फोन": "phone", "फ़ोन": "phone", "ऐप": "app",
+    "ऑनलाइन": "online", "ईमेल": "email", "लैपटॉप": "laptop", "वेबसाइट": "website", "लिंक": "link",
+    "सॉफ्टवेयर": "software", "सॉफ़्टवेयर": "software", "टेक्नोलॉजी": "technology", "डेटा": "data",
+    "डाटा": "data", "सर्वर": "server", "अपडेट": "update", "डाउनलोड": "download", "अपलोड": "upload",
+    "आर्टिफिशियल": "artificial", "इंटेलिजेंस": "intelligence", "चैनल": "channel",
+    "सब्सक्राइब": "subscribe", "लाइक": "like", "कमेंट": "comment", "शेयर": "share",
+    "डिस्क्रिप्शन": "description", "ट्यूटोरियल": "tutorial", "टॉपिक": "topic", "टोपिक": "topic",
+    "इम्पोर्टेन्ट": "important", "इंपॉर्टेंट": "important", "इम्पॉर्टेंट": "important",
+    "प्रॉब्लम": "problem", "प्रोब्लम": "problem", "टाइम": "time", "कैमरा": "camera", "फोटो": "photo",
+    "फ़ोटो": "photo", "मैसेज": "message", "गेम": "game", "म्यूजिक": "music", "म्यूज़िक": "music",
+    "स्कूल": "school", "कॉलेज": "college", "क्लास": "class", "एग्जाम": "exam", "एग्ज़ाम": "exam",
+    "क्वेश्चन": "question", "आंसर": "answer", "डॉक्टर": "doctor", "हॉस्पिटल": "hospital",
+    "बैंक": "bank", "कंपनी": "company", "बिजनेस": "business", "बिज़नेस": "business",
+    "मार्केट": "market", "स्टेशन": "station", "टिकट": "ticket", "ट्रेन": "train",
+    "हेलो": "hello", "हैलो": "hello", "प्लीज": "please", "प्लीज़": "please", "सॉरी": "sorry",
+    "ओके": "okay", "थैंक्स": "thanks", "वेलकम": "welcome", "फ्रेंड्स": "friends",
+    "गाइज": "guys", "गाइज़": "guys",
+}
+
+
+def _gujarati_to_devanagari() -> Dict[int, int]:
+    """Gujarati code points mirror Devanagari's at a fixed offset; map those whose names match."""
+    table = {}
+    for code in range(0x0A80, 0x0B00):
+        name = unicodedata.name(chr(code), "")
+        target = code - 0x180
+        if name and unicodedata.name(chr(target), "") == name.replace("GUJARATI", "DEVANAGARI"):
+            table[code] = target
+    return table
+
+
+_C = "".join(CONSONANTS)
+_M = "".join(VOWEL_SIGNS)
+_INDIC = "ऀ-ॿ"
+# Anything that carries a vowel sound when it precedes a consonant
+_VOCALIC = f"{_C}{''.join(VOWELS)}{_M}ंँः"
+
+_GUJARATI_TABLE = _gujarati_to_devanagari()
+_NUKTA_RE = re.compile("|".join(map(re.escape, _NUKTA_FORMS)))
+# The candra vowels (ऑ/ॉ, ऍ/ॅ) only occur in English borrowings; words
+# with them that LOANWORDS doesn't know are left to the LLM
+_LOANWORD_HINT_RE = re.compile("[ऑॉऍॅ]")
+# A word-final consonant (not a one-letter word) loses its inherent vowel: कमल -> kamal
+_FINAL_SCHWA_RE = re.compile(f"(?<=[{_INDIC}])([{_C}])(?![{_INDIC}])")
+# Medial schwa deletion (V C a C V -> V C C V), run on the reversed text so
+# the rule is applied right to left: समझना -> samajhna, बचपन -> bachpan
+_MEDIAL_SCHWA_RE = re.compile(f"(?<=[{_C}{_M}])([{_C}])([{_C}])(?=[{_VOCALIC}])")
+# Consonants with nothing after them still sound their inherent vowel
+_INHERENT_RE = re.compile(f"([{_C}])(?![{_M}{VIRAMA}])")
+_TABLE = str.maketrans({**VOWELS, **VOWEL_SIGNS, **CONSONANTS, **OTHER_SIGNS})
+# Post-processing on the Latin output
+_LONG_A_FINAL_RE = re.compile(r"aa\b")       # kyaa -> kya, tha not thaa
+_NASAL_LABIAL_RE = re.compile(r"n(?=[pbm])")  # kanpani -> kampani
+# Letters of any script besides Latin left in the output
+_UNMAPPED_RE = re.compile(r"[^\W\d_A-Za-zÀ-ɏ]")
+
+# Separates batch items; never produced by the tables above
+_SEPARATOR = "\n\x1e\n"
+
+
+def _fold(text: str) -> str:
+    """NFC, Gujarati folded onto Devanagari, nukta letters precomposed."""
+    text = unicodedata.normalize("NFC", text).translate(_GUJARATI_TABLE)
+    return _NUKTA_RE.sub(lambda match: _NUKTA_FORMS[match.group(0)], text)
+
+
+_LOANWORDS = {_fold(word): english for word, english in LOANWORDS.items()}
+# Whole words only; danda and digits end a word like spaces do
+_LETTERS = "ऀ-ॣॱ-ॿ"
+_LOANWORD_RE = re.compile(
+    f"(?<![{_LETTERS}])(" + "|".join(map(re.escape, sorted(_LOANWORDS, key=len, reverse=True))) + f")(?![{_LETTERS}])"
+)
+
+
+def _transliterate_joined(text: str) -> str:
+    text = _LOANWORD_RE.sub(lambda match: _LOANWORDS[match.group(1)], _fold(text)).replace(NUKTA, "")
+    text = _FINAL_SCHWA_RE.sub(lambda match: match.group(1) + VIRAMA, text)
+    text = _MEDIAL_SCHWA_RE.sub(lambda match: match.group(1) + VIRAMA + match.group(2), text[::-1])[::-1]
+    text = _INHERENT_RE.sub(lambda match: match.group(1) + INHERENT_A, text)
+    text = text.translate(_TABLE)
+    text = _LONG_A_FINAL_RE.sub("a", text)
+    return _NASAL_LABIAL_RE.sub("m", text)
+
+
+def transliterate_batch(texts: List[str]) -> List[str]:
+    """
+    Romanizes Devanagari and Gujarati text (Hinglish-style, e.g. "kya hum
+    aaj video banayenge"). Latin text passes through unchanged. The whole
+    batch goes through each regex / translate table in a single call.
+    """
+    if not texts:
+        return []
+    if any(_SEPARATOR in text for text in texts):
+        return [_transliterate_joined(text) for text in texts]
+    return _transliterate_joined(_SEPARATOR.join(texts)).split(_SEPARATOR)
+
+
+def has_unknown_loanword(text: str) -> bool:
+    """True if text has an English borrowing that LOANWORDS can't spell back."""
+    return bool(_LOANWORD_HINT_RE.search(_LOANWORD_RE.sub("", _fold(text))))
+
+
+def is_confident(romanized: str, avg_logprob: Optional[float] = None, source: Optional[str] = None) -> bool:
+    """
+    False when the local result needs the LLM: letters the tables could not
+    map are left over, the source text (if given) has an English word the
+    tables would spell phonetically, or Whisper itself was unsure about the
+    segment.
+    """
+    if _UNMAPPED_RE.search(romanized):
+        return False
+    if source is not None and has_unknown_loanword(source):
+        return False
+    return avg_logprob is None or avg_logprob >= TRANSLITERATION_MIN_LOGPROB
+
+
+def romanize_segments(segments: List[Dict]) -> Tuple[List[str], List[bool]]:
+    """Local romanization of segment texts plus a confidence flag per segment."""
+    romanized = transliterate_batch([segment["text"] for segment in segments])
+    confident = [
+        is_confident(text, segment.get("avg_logprob"), source=segment["text"])
+        for text, segment in zip(romanized, segments)
+    ]
+    return romanized, confident
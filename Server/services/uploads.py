@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import aiofiles
+from typing import AsyncIterator, Dict, Optional
+from dotenv import load_dotenv
+from services.cache import HASH_CHUNK_SIZE
+
+load_dotenv()
+
+# Largest upload accepted, in bytes (default 10 GiB)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 ** 3)))
+# Unfinished uploads untouched for this long are deleted (0 keeps them)
+UPLOAD_TTL_HOURS = float(os.getenv("UPLOAD_TTL_HOURS", "24"))
+
+
+class UploadNotFound(KeyError):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    """The client resumed from an offset the server doesn't have."""
+    def __init__(self, expected: int):
+        super().__init__(f"Upload is at offset {expected}")
+        self.expected = expected
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadSession:
+    def __init__(self, upload_id: str, filename: str, total_size: Optional[int], part_path: str, meta_path: str):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.total_size = total_size
+        self.part_path = part_path
+        self.meta_path = meta_path
+        self.offset = 0
+        self.digest = hashlib.sha256()
+        # One append at a time per upload; a retried chunk waits for the stale one
+        self.lock = asyncio.Lock()
+
+    def info(self) -> Dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "offset": self.offset,
+            "total_size": self.total_size,
+        }
+
+
+class UploadManager:
+    """
+    Resumable uploads: init -> append chunks at an explicit offset -> finalize.
+
+    Bytes are streamed to a .part file with async I/O while the SHA-256 and
+    size are computed on the fly, so finalize is instant and memory use is
+    one request chunk regardless of file size. Session metadata is kept in a
+    small sidecar file; after a restart the session is rebuilt by rehashing
+    the bytes already received.
+    """
+
+    def __init__(self, upload_dir: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.upload_dir = upload_dir
+        self.max_bytes = max_bytes
+        self._sessions: Dict[str, UploadSession] = {}
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def _paths(self, upload_id: str):
+        base = os.path.join(self.upload_dir, upload_id)
+        return f"{base}.part", f"{base}.upload.json"
+
+    def init(self, filename: str, total_size: Optional[int] = None) -> Dict:
+        if total_size is not None and total_size > self.max_bytes:
+            raise UploadTooLarge(f"File exceeds the {self.max_bytes} byte upload limit")
+
+        upload_id = str(uuid.uuid4())
+        part_path, meta_path = self._paths(upload_id)
+        session = UploadSession(upload_id, filename, total_size, part_path, meta_path)
+        open(part_path, "wb").close()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"filename": filename, "total_size": total_size}, f)
+        self._sessions[upload_id] = session
+        return session.info()
+
+    async def _get(self, upload_id: str) -> UploadSession:
+        session = self._sessions.get(upload_id)
+        if session is not None:
+            return session
+
+        # Not in memory (server restarted): rebuild from the files on disk
+        part_path, meta_path = self._paths(upload_id)
+        if not (os.path.exists(part_path) and os.path.exists(meta_path)):
+            raise UploadNotFound(upload_id)
+        async with aiofiles.open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.loads(await f.read())
+        session = UploadSession(upload_id, meta["filename"], meta.get("total_size"), part_path, meta_path)
+        async with aiofiles.open(part_path, "rb") as f:
+            while chunk := await f.read(HASH_CHUNK_SIZE):
+                session.digest.update(chunk)
+                session.offset += len(chunk)
+        return self._sessions.setdefault(upload_id, session)
+
+    async def status(self, upload_id: str) -> Dict:
+        return (await self._get(upload_id)).info()
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict:
+        """
+        Appends a request body at `offset`. If the connection drops midway,
+        everything received so far is kept and the client resumes from status().
+        """
+        session = await self._get(upload_id)
+        async with session.lock:
+            if offset != session.offset:
+                raise UploadOffsetMismatch(session.offset)
+            limit = min(self.max_bytes, session.total_size or self.max_bytes)
+            async with aiofiles.open(session.part_path, "ab") as f:
+                async for chunk in chunks:
+                    if session.offset + len(chunk) > limit:
+                        raise UploadTooLarge(f"Upload exceeds {limit} bytes")
+                    session.digest.update(chunk)
+                    await f.write(chunk)
+                    session.offset += len(chunk)
+        return session.info()
+
+    async def finalize(self, upload_id: str) -> Dict:
+        session = await self._get(upload_id)
+        async with session.lock:
+            if session.total_size is not None and session.offset != session.total_size:
+                raise UploadOffsetMismatch(session.offset)
+            extension = os.path.splitext(session.filename)[1]
+            file_path = os.path.join(self.upload_dir, f"{upload_id}{extension}")
+            os.replace(session.part_path, file_path)
+            os.remove(session.meta_path)
+            self._sessions.pop(upload_id, None)
+        return {
+            "file_id": upload_id,
+            "file_path": file_path,
+            "original_filename": session.filename,
+            "content_hash": session.digest.hexdigest(),
+            "size": session.offset,
+        }
+
+    def purge_stale(self, max_age_hours: float = UPLOAD_TTL_HOURS) -> int:
+        """Deletes unfinished uploads that have not received a chunk for max_age_hours."""
+        if max_age_hours <= 0:
+            return 0
+        cutoff = time.time() - max_age_hours * 3600
+        removed = 0
+        for name in os.listdir(self.upload_dir):
+            if not name.endswith(".part"):
+                continue
+            upload_id = name[: -len(".part")]
+            part_path, meta_path = self._paths(upload_id)
+            try:
+                if os.path.getmtime(part_path) >= cutoff:
+                    continue
+                for path in (part_path, meta_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            except OSError as e:
+                print(f"Failed to remove stale upload {upload_id}: {e}")
+                continue
+            self._sessions.pop(upload_id, None)
+            removed += 1
+        return removed
+
+    async def abort(self, upload_id: str):
+        session = await self._get(upload_id)
+        async with session.lock:
+            for path in (session.part_path, session.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._sessions.pop(upload_id, None)
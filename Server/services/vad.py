@@ -0,0 +1,174 @@
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from dotenv import load_dotenv
+from services.audio import SAMPLE_RATE
+from services.metrics import registry
+
+load_dotenv()
+
+# Energy-based voice activity pre-pass: only the audio around speech reaches Whisper
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+# Frames this far above the noise floor count as speech...
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))
+# ...unless that would put the threshold within VAD_DYNAMIC_RANGE_DB of the
+# loudest frames (audio with no real quiet parts is kept whole)
+VAD_DYNAMIC_RANGE_DB = float(os.getenv("VAD_DYNAMIC_RANGE_DB", "15"))
+# Frames quieter than this (dBFS) are never speech
+VAD_MIN_DB = float(os.getenv("VAD_MIN_DB", "-55"))
+# Pauses shorter than this stay inside a speech region
+VAD_MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "1.0"))
+# Bursts shorter than this (clicks, door slams) are dropped
+VAD_MIN_SPEECH_SECONDS = float(os.getenv("VAD_MIN_SPEECH_SECONDS", "0.25"))
+# Audio kept on both sides of every region so word onsets/tails aren't clipped
+VAD_PAD_SECONDS = float(os.getenv("VAD_PAD_SECONDS", "0.3"))
+
+FRAME_SECONDS = 0.03
+# Below this the trimmed audio isn't worth changing what Whisper sees
+MIN_SKIP_FRACTION = 0.05
+
+skipped_seconds_total = registry.counter("matrix_vad_skipped_seconds_total", "Seconds of media the VAD pre-pass kept away from Whisper.")
+saved_seconds_total = registry.counter("matrix_vad_saved_seconds_total", "Estimated Whisper seconds saved by the VAD pre-pass.")
+
+
+def vad_signature() -> str:
+    """Settings that change what Whisper sees; part of the transcript cache key."""
+    if not VAD_ENABLED:
+        return ""
+    return f"vad:{VAD_MARGIN_DB}:{VAD_DYNAMIC_RANGE_DB}:{VAD_MIN_DB}:{VAD_MIN_SILENCE_SECONDS}:{VAD_MIN_SPEECH_SECONDS}:{VAD_PAD_SECONDS}"
+
+
+def frame_energies(audio: np.ndarray, frame: int) -> np.ndarray:
+    """Mean power of each frame in dBFS (the last partial frame is dropped)."""
+    frames = audio[: len(audio) // frame * frame].reshape(-1, frame)
+    # einsum works on the strided view, so long media needs no squared copy
+    power = np.einsum("ij,ij->i", frames, frames) / frame
+    return 10 * np.log10(power + 1e-10)
+
+
+class SpeechRegions:
+    """
+    Where the speech is in a track, as sample ranges, and the mapping
+    between the original timeline and the compacted audio that only holds
+    those ranges back to back.
+    """
+
+    def __init__(self, regions: List[Tuple[int, int]], total_samples: int):
+        self.regions = regions
+        self.total_samples = total_samples
+        lengths = [end - start for start, end in regions]
+        self._original_starts = np.array([start / SAMPLE_RATE for start, _ in regions])
+        self._compact_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) / SAMPLE_RATE if regions else np.array([])
+        self.speech_samples = sum(lengths)
+
+    @property
+    def speech_seconds(self) -> float:
+        return self.speech_samples / SAMPLE_RATE
+
+    @property
+    def skipped_seconds(self) -> float:
+        return (self.total_samples - self.speech_samples) / SAMPLE_RATE
+
+    @property
+    def skipped_fraction(self) -> float:
+        return 1 - self.speech_samples / self.total_samples if self.total_samples else 0.0
+
+    def worth_skipping(self) -> bool:
+        return self.skipped_fraction >= MIN_SKIP_FRACTION
+
+    def compact(self, audio: np.ndarray) -> np.ndarray:
+        return np.concatenate([audio[start:end] for start, end in self.regions]) if self.regions else audio[:0]
+
+    def to_original(self, seconds: float, end: bool = False) -> float:
+        """
+        Maps a time on the compacted audio back onto the original track. A
+        time exactly on a join belongs to the region before it when it ends
+        something (end=True) and to the region after it otherwise.
+        """
+        if not self.regions:
+            return seconds
+        index = int(np.searchsorted(self._compact_starts, seconds, side="left" if end else "right")) - 1
+        index = max(0, index)
+        return float(self._original_starts[index] + seconds - self._compact_starts[index])
+
+    def remap(self, segment: Dict) -> Dict:
+        """A copy of a Whisper segment (and its words) with original-timeline timestamps."""
+        remapped = {**segment, "start": self.to_original(segment["start"]), "end": self.to_original(segment["end"], end=True)}
+        if segment.get("words"):
+            remapped["words"] = [
+                {**word, "start": self.to_original(word["start"]), "end": self.to_original(word["end"], end=True)}
+                for word in segment["words"]
+            ]
+        return remapped
+
+    def remap_callback(self, segment_callback: Optional[Callable]) -> Optional[Callable]:
+        if segment_callback is None:
+            return None
+        return lambda index, segment: segment_callback(index, self.remap(segment))
+
+    def report(self, whisper_seconds: float) -> Dict:
+        """
+        Job record summary. Whisper's cost is close to linear in audio
+        length, so the time saved is estimated from the speed it ran at on
+        the speech that was kept (unknown when there was no speech at all).
+        """
+        skipped_seconds_total.inc(self.skipped_seconds)
+        report = {
+            "regions": len(self.regions),
+            "speech_seconds": round(self.speech_seconds, 3),
+            "skipped_seconds": round(self.skipped_seconds, 3),
+            "skipped_fraction": round(self.skipped_fraction, 4),
+            "seconds_saved": None,
+        }
+        if self.speech_seconds:
+            saved = whisper_seconds / self.speech_seconds * self.skipped_seconds
+            saved_seconds_total.inc(saved)
+            report["seconds_saved"] = round(saved, 3)
+        return report
+
+
+def detect_speech(audio: np.ndarray) -> SpeechRegions:
+    """
+    Finds speech in mono 16 kHz PCM by frame energy against an adaptive
+    threshold: the noise floor (10th percentile of frame energy) plus
+    VAD_MARGIN_DB, capped at VAD_DYNAMIC_RANGE_DB below the loud frames
+    (95th percentile) so tracks without quiet parts are kept whole.
+    Silence, room tone and beds well below the voice are dropped; music as
+    loud as the speech is kept, since an energy detector can't tell it
+    apart and dropping speech is worse than transcribing music.
+    """
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    if len(audio) < frame:
+        return SpeechRegions([(0, len(audio))] if len(audio) else [], len(audio))
+
+    energies = frame_energies(audio, frame)
+    floor, loud = np.percentile(energies, [10, 95])
+    threshold = max(VAD_MIN_DB, min(floor + VAD_MARGIN_DB, loud - VAD_DYNAMIC_RANGE_DB))
+    active = energies > threshold
+
+    # Runs of active frames as [start, end) frame indices
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], active.astype(np.int8), [0]])))
+    runs = list(zip(edges[::2], edges[1::2]))
+
+    # Close short pauses, then drop short bursts
+    min_gap = int(VAD_MIN_SILENCE_SECONDS / FRAME_SECONDS)
+    merged: List[List[int]] = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    min_frames = max(1, int(VAD_MIN_SPEECH_SECONDS / FRAME_SECONDS))
+
+    pad = int(VAD_PAD_SECONDS * SAMPLE_RATE)
+    regions: List[Tuple[int, int]] = []
+    for start, end in merged:
+        if end - start < min_frames:
+            continue
+        start = max(0, start * frame - pad)
+        end = len(audio) if end == len(energies) else min(len(audio), end * frame + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return SpeechRegions(regions, len(audio))
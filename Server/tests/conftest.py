@@ -0,0 +1,16 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+# Services open their SQLite files (refinement cache, job store) at import
+# time, so point them at a scratch directory before any test imports them
+_scratch = tempfile.mkdtemp(prefix="matrix-tests-")
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ.setdefault("CACHE_DIR", os.path.join(_scratch, "cache"))
+os.environ.setdefault("JOBS_DB", os.path.join(_scratch, "jobs.sqlite3"))
+# uploads/ and outputs/ are relative to the working directory
+os.chdir(_scratch)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,134 @@
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+
+from benchmarks.fakes import StubWhisperModel
+from services import transcription
+from services.audio import SAMPLE_RATE, load_audio_file, open_wav
+
+
+def write_wav(path, samples):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.astype("<i2").tobytes())
+    return str(path)
+
+
+def speech_and_silence():
+    """10 s of tone, 20 s of near silence, 10 s of tone."""
+    rng = np.random.default_rng(0)
+    t = np.arange(10 * SAMPLE_RATE) / SAMPLE_RATE
+    tone = 8000 * np.sin(2 * np.pi * 220 * t)
+    quiet = rng.normal(0, 3, 20 * SAMPLE_RATE)
+    return np.concatenate([tone, quiet, tone]).astype(np.int16)
+
+
+def test_wav_samples_are_read_directly(tmp_path):
+    samples = np.array([0, 16384, -32768, 32767, -1], dtype=np.int16)
+    path = write_wav(tmp_path / "audio.wav", samples)
+    assert open_wav(path).tolist() == samples.tolist()
+    audio = load_audio_file(path)
+    assert audio.dtype == np.float32
+    assert audio.tolist() == pytest.approx([0, 0.5, -1, 32767 / 32768, -1 / 32768])
+
+
+def test_wav_with_other_format_is_rejected(tmp_path):
+    path = tmp_path / "stereo.wav"
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(44100)
+        f.writeframes(b"\0" * 400)
+    with pytest.raises(ValueError):
+        open_wav(str(path))
+
+
+def test_other_files_go_through_ffmpeg(tmp_path):
+    source = write_wav(tmp_path / "audio.wav", speech_and_silence()[:SAMPLE_RATE])
+    flac = str(tmp_path / "audio.flac")
+    try:
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-i", source, flac], check=True)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("ffmpeg is not available")
+    assert len(load_audio_file(flac)) == SAMPLE_RATE
+
+
+def test_wav_input_skips_silence(tmp_path, monkeypatch):
+    seen = []
+
+    class Model(StubWhisperModel):
+        def transcribe(self, audio, **options):
+            seen.append(len(audio))
+            return super().transcribe(audio, **options)
+
+    class Engine:
+        name = "whisper"
+
+    monkeypatch.setattr(transcription, "get_engine", lambda engine=None: Engine())
+    monkeypatch.setattr(transcription, "load_model", lambda model_size, engine=None: Model(segment_seconds=2.0))
+    monkeypatch.setattr(transcription, "VAD_ENABLED", True)
+
+    path = write_wav(tmp_path / "audio.wav", speech_and_silence())
+    segments = transcription.run_whisper(path, "hi", "native")
+
+    # Only the two tones (plus padding) reached the model
+    assert seen and seen[0] < 25 * SAMPLE_RATE
+    assert segments
+    for segment in segments:
+        assert not 11 < segment["start"] < 29
+
+
+def test_long_wav_is_transcribed_a_window_at_a_time(tmp_path, monkeypatch):
+    seen = []
+
+    class Model(StubWhisperModel):
+        def transcribe(self, audio, **options):
+            seen.append((audio.dtype, len(audio)))
+            return super().transcribe(audio, **options)
+
+    class Engine:
+        name = "whisper"
+
+    monkeypatch.setattr(transcription, "get_engine", lambda engine=None: Engine())
+    monkeypatch.setattr(transcription, "load_model", lambda model_size, engine=None: Model(segment_seconds=2.0))
+    monkeypatch.setattr(transcription, "VAD_ENABLED", True)
+    monkeypatch.setattr(transcription, "MAX_IN_MEMORY_AUDIO_SECONDS", 20)
+
+    path = write_wav(tmp_path / "audio.wav", speech_and_silence())
+    segments = transcription.run_whisper(path, "hi", "native")
+
+    # Converted window by window, with the silence skipped inside it
+    assert seen and all(dtype == np.float32 for dtype, _ in seen)
+    assert seen[0][1] < 25 * SAMPLE_RATE
+    assert segments
+    for segment in segments:
+        assert not 11 < segment["start"] < 29
+
+
+def test_int16_windows_are_stitched_in_order():
+    from services.chunked import transcribe_chunked
+
+    seen = []
+
+    class Model(StubWhisperModel):
+        def transcribe(self, audio, **options):
+            seen.append(len(audio))
+            return super().transcribe(audio, **options)
+
+    samples = speech_and_silence()
+    streamed = []
+    segments = transcribe_chunked(
+        samples, {}, "stub", model=Model(segment_seconds=2.0), vad=True,
+        chunk_seconds=10, overlap_seconds=2,
+        segment_callback=lambda index, segment: streamed.append(index),
+    )
+    # 40 s in 10 s windows stepping 8 s; the all-silent windows never reach the model
+    assert len(seen) < 5
+    assert streamed == list(range(len(segments)))
+    starts = [segment["start"] for segment in segments]
+    assert starts == sorted(starts)
+    assert starts[-1] >= 30
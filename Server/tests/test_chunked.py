@@ -0,0 +1,51 @@
+from services.audio import SAMPLE_RATE
+from services.chunked import plan_windows, stitch_windows
+
+
+def seconds(windows):
+    return [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in windows]
+
+
+def segment(start, end, text, words=None):
+    result = {"start": start, "end": end, "text": text}
+    if words:
+        result["words"] = words
+    return result
+
+
+def test_windows_overlap_and_cover_the_audio():
+    assert seconds(plan_windows(25 * SAMPLE_RATE, chunk_seconds=10, overlap_seconds=2)) == [(0, 10), (8, 18), (16, 25)]
+    assert seconds(plan_windows(5 * SAMPLE_RATE, chunk_seconds=10, overlap_seconds=2)) == [(0, 5)]
+    # The overlap never exceeds half a window
+    assert seconds(plan_windows(20 * SAMPLE_RATE, chunk_seconds=10, overlap_seconds=8)) == [(0, 10), (5, 15), (10, 20)]
+
+
+def test_stitching_cuts_overlaps_at_their_midpoint():
+    windows = plan_windows(25 * SAMPLE_RATE, chunk_seconds=10, overlap_seconds=2)
+    results = [
+        [
+            segment(0, 4, "one"),
+            segment(4, 8, "two"),
+            segment(8, 9.6, "three"),
+            segment(9.6, 10, "four"),  # centre past the cut at 9s: window 1's
+        ],
+        [
+            segment(0.5, 1.6, "Three "),  # repeats the text across the cut
+            segment(1.6, 2, "four"),
+            segment(2, 8.8, "five", words=[{"word": "five", "start": 2, "end": 8.8}]),
+            segment(8.8, 10, "six"),  # centre past the cut at 17s: window 2's
+        ],
+        [
+            segment(0, 2, "six"),  # starts before "five" ends in window 1
+            segment(2, 9, "seven"),
+        ],
+    ]
+    stitched = stitch_windows(windows, results)
+
+    assert [s["text"] for s in stitched] == ["one", "two", "three", "four", "five", "six", "seven"]
+    assert [(s["start"], s["end"]) for s in stitched] == [
+        (0, 4), (4, 8), (8, 9.6), (9.6, 10), (10, 16.8), (16.8, 18), (18, 25),
+    ]
+    # Word timings are shifted with their segment
+    assert stitched[4]["words"] == [{"word": "five", "start": 10, "end": 16.8}]
+    assert "words" not in stitched[0]
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from services import engines
+
+torch = pytest.importorskip("torch")
+whisper = pytest.importorskip("whisper")
+
+
+@pytest.fixture
+def random_tiny_whisper(monkeypatch):
+    """whisper.load_model returning tiny-sized Whisper with random weights (no checkpoint download)."""
+    from whisper.model import ModelDimensions, Whisper
+
+    def load_model(size, device="cpu"):
+        torch.manual_seed(0)
+        dims = ModelDimensions(
+            n_mels=80, n_audio_ctx=1500, n_audio_state=384, n_audio_head=6, n_audio_layer=2,
+            n_vocab=51865, n_text_ctx=448, n_text_state=384, n_text_head=6, n_text_layer=2,
+        )
+        return Whisper(dims).to(device)
+
+    monkeypatch.setattr(whisper, "load_model", load_model)
+    return load_model
+
+
+def test_quantized_engine_loads_and_transcribes(random_tiny_whisper):
+    model, size_mb = engines.QuantizedWhisperEngine().load("tiny", "cpu")
+
+    linears = [module for module in model.modules() if isinstance(module, torch.nn.Linear)]
+    assert linears == []
+    quantized = [module for module in model.modules() if isinstance(module, torch.ao.nn.quantized.dynamic.Linear)]
+    # Per block: query/key/value/out for each attention and two MLP layers;
+    # 2 encoder blocks (self-attention) and 2 decoder blocks (self + cross)
+    assert len(quantized) == 2 * 6 + 2 * 10
+    assert 0 < size_mb < engines._parameters_mb(random_tiny_whisper("tiny"))
+
+    audio = np.random.default_rng(0).standard_normal(16000 * 2).astype(np.float32) * 0.1
+    result = model.transcribe(audio, language="en", temperature=0.0, sample_len=8, condition_on_previous_text=False)
+    assert isinstance(result["segments"], list)
+
+
+def test_quantized_layers_match_the_float_model(random_tiny_whisper):
+    reference = random_tiny_whisper("tiny")
+    model, _ = engines.QuantizedWhisperEngine().load("tiny", "cpu")
+    mel = whisper.log_mel_spectrogram(np.zeros(16000 * 30, dtype=np.float32)).unsqueeze(0)
+    with torch.no_grad():
+        expected = reference.encoder(mel)
+        actual = model.encoder(mel)
+    # int8 weights: close to the float encoder, not bit-identical
+    correlation = np.corrcoef(expected.flatten().numpy(), actual.flatten().numpy())[0, 1]
+    assert correlation > 0.99
@@ -0,0 +1,120 @@
+import json
+import time
+
+import pytest
+
+from services.cancellation import CancelToken, JobLost, activate, confirm_ownership, job_lost
+from services.job_queue import DurableQueue, resolve_task
+from services.scheduler import QueueFullError
+
+LEASE = 0.2
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return DurableQueue(path=str(tmp_path / "jobs.sqlite3"), max_queue=4, lease_seconds=LEASE, max_attempts=2)
+
+
+def expire_leases():
+    time.sleep(LEASE * 1.5)
+
+
+def test_claim_follows_priority_then_arrival(queue):
+    queue.submit("low", json.dumps, [1])
+    queue.submit("high", json.dumps, [2], priority=5)
+    queue.submit("low2", json.dumps, [3])
+    assert [queue.claim("w1")[0] for _ in range(3)] == ["high", "low", "low2"]
+    assert queue.claim("w1") is None
+
+
+def test_claim_returns_an_importable_task(queue):
+    queue.submit("job", json.dumps, {"a": 1}, sort_keys=True)
+    job_id, task, args, kwargs, attempt = queue.claim("w1")
+    assert (job_id, args, kwargs, attempt) == ("job", [{"a": 1}], {"sort_keys": True}, 1)
+    assert resolve_task(task)(*args, **kwargs) == '{"a": 1}'
+
+
+def test_queue_full(queue):
+    for i in range(4):
+        queue.submit(f"job{i}", json.dumps, i)
+    with pytest.raises(QueueFullError):
+        queue.submit("one-too-many", json.dumps, 5)
+
+
+def test_heartbeat_renews_lease_and_reports_cancel(queue):
+    queue.submit("a", json.dumps, 1)
+    queue.submit("b", json.dumps, 2)
+    queue.claim("w1")
+    queue.claim("w1")
+    assert queue.cancel("b") == "cancelling"
+    for _ in range(3):
+        time.sleep(LEASE / 2)
+        assert queue.heartbeat("w1", ["a", "b"]) == {"a": "ok", "b": "cancel"}
+    # Heartbeats kept the leases alive past the original expiry
+    assert queue.requeue_expired() == {"requeued": [], "failed": [], "cancelled": []}
+
+
+def test_cancel_waiting_job(queue):
+    queue.submit("a", json.dumps, 1)
+    assert queue.cancel("a") == "dequeued"
+    assert not queue.contains("a")
+    assert queue.cancel("a") is None
+
+
+def test_expired_lease_is_requeued_and_old_worker_loses_it(queue):
+    queue.submit("a", json.dumps, 1)
+    queue.claim("w1")
+    expire_leases()
+    assert queue.requeue_expired()["requeued"] == ["a"]
+
+    job_id, _, _, _, attempt = queue.claim("w2")
+    assert (job_id, attempt) == ("a", 2)
+    # The first worker comes back: it must not keep or finish the job
+    assert queue.heartbeat("w1", ["a"]) == {"a": "lost"}
+    assert not queue.confirm("a", "w1")
+    queue.complete("a", "w1")
+    assert queue.contains("a")
+
+    assert queue.confirm("a", "w2")
+    queue.complete("a", "w2")
+    assert not queue.contains("a")
+
+
+def test_job_fails_after_max_attempts(queue):
+    queue.submit("a", json.dumps, 1)
+    for _ in range(2):
+        queue.claim("w1")
+        expire_leases()
+        outcome = queue.requeue_expired()
+    assert outcome == {"requeued": [], "failed": ["a"], "cancelled": []}
+    assert not queue.contains("a")
+
+
+def test_expired_cancelling_job_is_dropped(queue):
+    queue.submit("a", json.dumps, 1)
+    queue.claim("w1")
+    queue.cancel("a")
+    expire_leases()
+    assert queue.requeue_expired()["cancelled"] == ["a"]
+
+
+def test_clean_shutdown_requeues_without_using_an_attempt(queue):
+    queue.register_worker("w1", concurrency=1)
+    queue.submit("a", json.dumps, 1)
+    queue.claim("w1")
+    queue.unregister_worker("w1")
+    assert queue.claim("w2")[4] == 1
+
+
+def test_taken_over_job_cannot_record_results(queue):
+    queue.submit("a", json.dumps, 1)
+    queue.claim("w1")
+    token = CancelToken("a", verify=lambda: queue.confirm("a", "w1"))
+    with activate(token):
+        confirm_ownership()
+        expire_leases()
+        queue.requeue_expired()
+        queue.claim("w2")
+        with pytest.raises(JobLost):
+            confirm_ownership()
+        assert job_lost()
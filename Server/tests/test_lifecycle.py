@@ -0,0 +1,41 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import routes
+from services.lifecycle import Lifecycle
+
+
+def warmed(modules):
+    lifecycle = Lifecycle()
+    lifecycle.start_warmup([], modules=modules)
+    assert lifecycle._warm.wait(10)
+    return lifecycle
+
+
+def test_warm_without_errors_is_ready():
+    status = warmed(("json",)).readiness()
+    assert status["ready"] is True
+    assert status["status"] == "ready"
+
+
+def test_failed_import_is_degraded(monkeypatch):
+    lifecycle = warmed(("json", "no_such_module_for_readiness"))
+    status = lifecycle.readiness()
+    assert status["ready"] is False
+    assert status["status"] == "degraded"
+    assert "no_such_module_for_readiness" in status["errors"]
+
+    monkeypatch.setattr(routes, "lifecycle", lifecycle)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    response = TestClient(app).get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "degraded"
+
+
+def test_error_during_warmup_is_degraded():
+    lifecycle = Lifecycle()
+    lifecycle.errors["whisper"] = "import failed"
+    status = lifecycle.readiness()
+    assert status["ready"] is False
+    assert status["status"] == "degraded"
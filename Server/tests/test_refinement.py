@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from benchmarks.fakes import FakeLLMServer
+from services import refinement
+from services.cache import SqliteLRUCache
+
+TEXTS = [f"line number {i}" for i in range(10)]
+
+
+@pytest.fixture
+def llm(tmp_path, monkeypatch):
+    """Starts a FakeLLMServer with the given options and points refinement at it."""
+    servers = []
+
+    def start(**options):
+        server = FakeLLMServer(**options).start()
+        servers.append(server)
+        refinement.configure_llm(server.base_url)
+        return server
+
+    monkeypatch.setattr(refinement, "LLM_REQUESTS_PER_SECOND", 0)
+    monkeypatch.setattr(refinement, "LLM_BACKOFF_SECONDS", 0.05)
+    monkeypatch.setattr(refinement, "LLM_BATCH_SIZE", 4)
+    monkeypatch.setattr(refinement, "refinement_cache", SqliteLRUCache(str(tmp_path / "refinement.sqlite3"), max_entries=1000))
+    # Restored on teardown; configure_llm replaces both
+    monkeypatch.setattr(refinement, "LLM_BASE_URL", refinement.LLM_BASE_URL)
+    monkeypatch.setattr(refinement, "_client", None)
+    yield start
+    refinement._client = None
+    for server in servers:
+        server.stop()
+
+
+def test_batches_consecutive_segments(llm):
+    server = llm()
+    refined = refinement.refine_segments(TEXTS, "translate")
+    assert refined == [text.capitalize() for text in TEXTS]
+    # 10 segments in batches of 4
+    assert server.requests == 3
+
+
+def test_duplicates_and_blank_lines_are_not_sent(llm):
+    server = llm()
+    texts = ["same line", "  ", "same line", "other line", "same   line"]
+    refined = refinement.refine_segments(texts, "translate")
+    assert refined == ["Same line", "  ", "Same line", "Other line", "Same line"]
+    assert server.requests == 1
+
+
+def test_falls_back_to_single_segments_when_batch_is_merged(llm):
+    server = llm(merge_batches=True)
+    refined = refinement.refine_segments(TEXTS[:4], "translate")
+    assert refined == [text.capitalize() for text in TEXTS[:4]]
+    # One merged batch reply, then one request per segment
+    assert server.requests == 1 + 4
+
+
+def test_retries_with_backoff(llm, monkeypatch):
+    monkeypatch.setattr(refinement.random, "random", lambda: 0.5)
+    server = llm(fail_first=2)
+    started = time.perf_counter()
+    refined = refinement.refine_segments(TEXTS[:2], "translate")
+    elapsed = time.perf_counter() - started
+    assert refined == ["Line number 0", "Line number 1"]
+    assert server.requests == 3
+    # Two retries: 0.05 * 1 + 0.05 * 2
+    assert elapsed >= 0.15
+
+
+def test_exhausted_retries_keep_original_text(llm, monkeypatch):
+    monkeypatch.setattr(refinement, "LLM_MAX_RETRIES", 1)
+    server = llm(fail_first=100)
+    assert refinement.refine_segments(TEXTS[:2], "translate") == TEXTS[:2]
+    assert server.requests == 2
+    # Failures are not cached: the next run asks again
+    refinement.refine_segments(TEXTS[:2], "translate")
+    assert server.requests == 4
+
+
+def test_cache_hits_skip_the_network(llm):
+    server = llm()
+    first = refinement.refine_segments(TEXTS, "translate")
+    requests = server.requests
+    progress = []
+    second = refinement.refine_segments(TEXTS, "translate", progress_callback=lambda done, total: progress.append((done, total)))
+    assert second == first
+    assert server.requests == requests
+    assert progress == [(10, 10)]
+    # The cache is keyed by mode too
+    refinement.refine_segments(TEXTS[:1], "romanized")
+    assert server.requests == requests + 1
+
+
+def test_unknown_mode_is_passed_through(llm):
+    server = llm()
+    assert refinement.refine_segments(TEXTS, "original") == TEXTS
+    assert server.requests == 0
+
+
+def test_configure_llm_replaces_the_cached_client(llm):
+    first = llm()
+    refinement.refine_segments(["first server"], "translate")
+    second = llm()
+    refinement.refine_segments(["second server"], "translate")
+    assert (first.requests, second.requests) == (1, 1)
@@ -0,0 +1,90 @@
+import inspect
+
+import pytest
+
+from services import resegment as resegment_module
+from services.resegment import build_timeline, resegment
+
+NO_LIMITS = {"max_chars": None, "max_cps": None, "max_gap": None}
+
+
+def timed_segment(words):
+    """One Whisper segment from (word, start, end) triples."""
+    return {
+        "start": words[0][1],
+        "end": words[-1][2],
+        "text": " ".join(w for w, _, _ in words),
+        "words": [{"word": f" {w}", "start": s, "end": e} for w, s, e in words],
+    }
+
+
+def evenly_spaced(count, word="word", duration=0.5):
+    return [(f"{word}{i}", i * duration, (i + 1) * duration) for i in range(count)]
+
+
+def texts(lines):
+    return [line["text"] for line in lines]
+
+
+def test_plain_segments_are_interpolated_by_word_length():
+    timeline = build_timeline([{"start": 10, "end": 16, "text": "ab abcd"}, {"start": 20, "end": 21, "text": "  "}])
+    assert timeline.words == ["ab", "abcd"]
+    assert timeline.starts.tolist() == [10, 12]
+    assert timeline.ends.tolist() == [12, 16]
+
+
+def test_max_words():
+    lines = resegment([timed_segment(evenly_spaced(8))], max_words=3, **NO_LIMITS)
+    assert texts(lines) == ["word0 word1 word2", "word3 word4 word5", "word6 word7"]
+    assert [(line["start"], line["end"]) for line in lines] == [(0, 1.5), (1.5, 3.0), (3.0, 4.0)]
+
+
+def test_max_chars_counts_separating_spaces():
+    words = [("abcd", i, i + 1) for i in range(5)]
+    lines = resegment([timed_segment(words)], **dict(NO_LIMITS, max_chars=9))
+    assert texts(lines) == ["abcd abcd", "abcd abcd", "abcd"]
+    # A single word longer than the limit still gets its own line
+    lines = resegment([timed_segment([("abcdefghijkl", 0, 1), ("ab", 1, 2)])], **dict(NO_LIMITS, max_chars=9))
+    assert texts(lines) == ["abcdefghijkl", "ab"]
+
+
+def test_long_silence_breaks_a_line():
+    words = [("one", 0, 0.5), ("two", 0.5, 1), ("three", 3, 3.5), ("four", 3.5, 4)]
+    lines = resegment([timed_segment(words)], max_words=10, **dict(NO_LIMITS, max_gap=1.0))
+    assert texts(lines) == ["one two", "three four"]
+
+
+def test_reading_speed_breaks_at_a_pause_and_holds_lines():
+    # Three words, a pause, then five words spoken too fast to read
+    words = [(f"abcdefghi{i}", i * 0.3, (i + 1) * 0.3) for i in range(3)]
+    words += [(f"abcdefghi{i}", 2 + (i - 3) * 0.3, 2 + (i - 2) * 0.3) for i in range(3, 8)]
+    lines = resegment([timed_segment(words)], **dict(NO_LIMITS, max_cps=17))
+    assert [len(line["text"].split()) for line in lines] == [3, 5]
+    first, second = lines
+    # Held on screen until readable, but never into the next line
+    assert first["end"] == pytest.approx(32 / 17)
+    assert second["start"] == 2
+    assert second["end"] == pytest.approx(2 + 54 / 17)
+
+
+def test_readable_lines_are_not_broken_or_held():
+    lines = resegment([timed_segment(evenly_spaced(4, word="a"))], **dict(NO_LIMITS, max_cps=17))
+    assert texts(lines) == ["a0 a1 a2 a3"]
+    assert lines[0]["end"] == 2.0
+
+
+def test_default_limits_are_opt_in(monkeypatch):
+    for name in ("SUBTITLE_MAX_CHARS", "SUBTITLE_MAX_CPS", "SUBTITLE_MAX_GAP_SECONDS"):
+        monkeypatch.delenv(name, raising=False)
+    assert resegment_module._optional_limit("SUBTITLE_MAX_CHARS", int) is None
+    monkeypatch.setenv("SUBTITLE_MAX_CPS", " 17 ")
+    assert resegment_module._optional_limit("SUBTITLE_MAX_CPS", float) == 17.0
+
+    defaults = inspect.signature(resegment).parameters
+    assert defaults["max_chars"].default is resegment_module.MAX_CHARS_PER_LINE
+    assert defaults["max_cps"].default is resegment_module.MAX_CHARS_PER_SECOND
+    assert defaults["max_gap"].default is resegment_module.MAX_GAP_SECONDS
+
+
+def test_empty_transcript():
+    assert resegment([{"start": 0, "end": 1, "text": " "}], max_words=3) == []
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import routes
+from services.artifacts import ArtifactStore
+from services.job_store import job_store
+from services.scheduler import QueueFullError
+
+
+class FullOnceScheduler:
+    """Rejects the first submission like a full queue, then accepts."""
+
+    policy = "fifo"
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        if not self.submitted:
+            self.submitted.append(None)
+            raise QueueFullError("Job queue is full (0 waiting)")
+        self.submitted.append(job_id)
+        return 1
+
+    def queue_position(self, job_id):
+        return None
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "media"), path=str(tmp_path / "artifacts.sqlite3"))
+    monkeypatch.setattr(routes, "artifact_store", store)
+    monkeypatch.setattr(routes, "scheduler", FullOnceScheduler())
+    monkeypatch.setattr(routes, "validate_model", lambda size, engine=None: "whisper")
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    return TestClient(app), store
+
+
+def test_full_queue_keeps_the_upload_for_a_retry(client):
+    client, store = client
+    media = os.path.join(store.media_dir, "clip.mp4")
+    with open(media, "wb") as f:
+        f.write(b"media")
+    store.register(media, "media")
+    form = {"file_path": media, "language": "hi", "mode": "native"}
+
+    rejected = client.post("/api/transcribe", data=form)
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "30"
+    assert os.path.exists(media)
+    assert store.is_tracked(media)
+
+    accepted = client.post("/api/transcribe", data=form)
+    assert accepted.status_code == 200
+    job_id = accepted.json()["job_id"]
+    assert routes.scheduler.submitted == [None, job_id]
+    assert job_store.get(job_id)["status"] == "pending"
+
+
+def test_full_queue_keeps_batch_media(client):
+    client, store = client
+    media = os.path.join(store.media_dir, "clip.mp4")
+    with open(media, "wb") as f:
+        f.write(b"media")
+    store.register(media, "media")
+
+    manifest = {"defaults": {"language": "hi"}, "items": [media]}
+    assert client.post("/api/batch", json=manifest).status_code == 503
+    assert os.path.exists(media)
+    assert client.post("/api/batch", json=manifest).status_code == 200
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from benchmarks.fakes import StubWhisperModel
+from services import transcription
+from services.cache import SqliteLRUCache
+
+
+class Engine:
+    name = "whisper"
+
+
+@pytest.fixture
+def whisper_stub(tmp_path, monkeypatch):
+    calls = []
+
+    class Model(StubWhisperModel):
+        def transcribe(self, audio, **options):
+            calls.append(options)
+            return super().transcribe(audio, **options)
+
+    monkeypatch.setattr(transcription, "get_engine", lambda engine=None: Engine())
+    monkeypatch.setattr(transcription, "load_model", lambda model_size, engine=None: Model())
+    monkeypatch.setattr(transcription, "transcript_cache", SqliteLRUCache(str(tmp_path / "transcripts.sqlite3"), max_entries=100))
+    monkeypatch.setattr(transcription, "VAD_ENABLED", False)
+    return calls
+
+
+def test_word_timestamps_only_for_resegmented_jobs(monkeypatch):
+    monkeypatch.setattr(transcription, "WORD_TIMESTAMPS", True)
+    assert not transcription.needs_word_timestamps()
+    assert not transcription.needs_word_timestamps(words_per_line=0)
+    assert transcription.needs_word_timestamps(words_per_line=5)
+    assert transcription.needs_word_timestamps(max_chars=42)
+    monkeypatch.setattr(transcription, "WORD_TIMESTAMPS", False)
+    assert not transcription.needs_word_timestamps(words_per_line=5)
+    assert transcription.whisper_options("hi", "native")["word_timestamps"] is False
+
+
+def test_cached_word_timings_serve_every_job(whisper_stub):
+    audio = np.zeros(10 * 16000, dtype=np.float32)
+    segments = transcription.run_whisper(audio, "hi", "native", content_hash="abc", word_timestamps=True)
+    assert whisper_stub[0]["word_timestamps"] is True
+    assert segments[0]["words"]
+
+    assert transcription.get_cached_segments("abc", "hi", "native", word_timestamps=True) == segments
+    assert transcription.get_cached_segments("abc", "hi", "native") == segments
+
+
+def test_plain_segments_dont_serve_jobs_needing_words(whisper_stub):
+    audio = np.zeros(10 * 16000, dtype=np.float32)
+    segments = transcription.run_whisper(audio, "hi", "native", content_hash="abc")
+    assert whisper_stub[0]["word_timestamps"] is False
+    assert "words" not in segments[0]
+
+    assert transcription.get_cached_segments("abc", "hi", "native") == segments
+    assert transcription.get_cached_segments("abc", "hi", "native", word_timestamps=True) is None
@@ -0,0 +1,60 @@
+import pytest
+
+from services.transliteration import is_confident, normalize_policy, romanize_segments, transliterate_batch
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("कमल", "kamal"),
+    ("समझना", "samajhna"),
+    ("बचपन", "bachpan"),
+    ("कंबल", "kambal"),
+    ("क्या हम आज वीडियो बनायेंगे", "kya ham aaj video banaayenge"),
+    ("તમે શું કરો છો", "tame shun karo chho"),
+    ("already latin, 42!", "already latin, 42!"),
+])
+def test_transliterate(text, expected):
+    assert transliterate_batch([text]) == [expected]
+
+
+def test_batch_keeps_one_result_per_text():
+    texts = ["कमल", "", "hello", "बचपन"]
+    assert transliterate_batch(texts) == ["kamal", "", "hello", "bachpan"]
+    assert transliterate_batch([]) == []
+    # Texts containing the internal separator are handled one by one
+    assert transliterate_batch(["कमल\n\x1e\nकमल", "बचपन"]) == ["kamal\n\x1e\nkamal", "bachpan"]
+
+
+def test_known_loanwords_are_spelled_in_english():
+    assert transliterate_batch(["मेरा ऑफ़िस।", "नई कंपनी", "વીડિયો", "वीडियोवाला"]) == ["mera office.", "nai company", "video", "vidiyovaala"]
+
+
+def test_confidence():
+    assert is_confident("kya ham")
+    assert not is_confident("kya 漢")
+    assert not is_confident("kya", avg_logprob=-2.0)
+    # English words the tables don't know go to the LLM
+    assert not is_confident("ham lojistiks men", source="हम लॉजिस्टिक्स में")
+    assert is_confident("ham office men", source="हम ऑफिस में")
+    romanized, confident = romanize_segments([
+        {"text": "कमल", "avg_logprob": -0.1},
+        {"text": "कमल", "avg_logprob": -2.0},
+    ])
+    assert romanized == ["kamal", "kamal"]
+    assert confident == [True, False]
+
+
+def test_loanword_segment_goes_to_the_llm():
+    romanized, confident = romanize_segments([
+        {"text": "आज का वीडियो", "avg_logprob": -0.1},
+        {"text": "आज का लॉजिस्टिक्स अपडेट", "avg_logprob": -0.1},
+    ])
+    assert romanized == ["aaj ka video", "aaj ka lojistiks update"]
+    assert confident == [True, False]
+
+
+def test_policies():
+    assert normalize_policy(None) == "llm"
+    assert normalize_policy("local") == "local"
+    assert normalize_policy("local-then-llm-only-for-low-confidence") == "local-then-llm"
+    with pytest.raises(ValueError):
+        normalize_policy("offline")
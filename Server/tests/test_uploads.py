@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from services.uploads import UploadManager, UploadNotFound, UploadOffsetMismatch, UploadTooLarge
+
+DATA = bytes(range(256)) * 40
+
+
+async def body(*chunks, fail_after=None):
+    """A request body; fail_after simulates the connection dropping after that many chunks."""
+    for i, chunk in enumerate(chunks):
+        if i == fail_after:
+            raise ConnectionResetError("client went away")
+        yield chunk
+
+
+def test_chunks_at_the_right_offset_are_appended(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload_id = manager.init("clip.mp4", total_size=len(DATA))["upload_id"]
+        await manager.append(upload_id, 0, body(DATA[:1000], DATA[1000:4000]))
+        info = await manager.append(upload_id, 4000, body(DATA[4000:]))
+        assert info["offset"] == len(DATA)
+        return await manager.finalize(upload_id)
+
+    result = asyncio.run(scenario())
+    assert result["size"] == len(DATA)
+    assert result["content_hash"] == hashlib.sha256(DATA).hexdigest()
+    assert result["file_path"].endswith(".mp4")
+    with open(result["file_path"], "rb") as f:
+        assert f.read() == DATA
+    # Only the finished file is left behind
+    assert os.listdir(tmp_path) == [os.path.basename(result["file_path"])]
+
+
+def test_wrong_offset_reports_the_expected_one(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload_id = manager.init("clip.mp4")["upload_id"]
+        await manager.append(upload_id, 0, body(DATA[:100]))
+        with pytest.raises(UploadOffsetMismatch) as error:
+            await manager.append(upload_id, 50, body(DATA[50:100]))
+        return error.value.expected
+
+    assert asyncio.run(scenario()) == 100
+
+
+def test_dropped_connection_keeps_received_bytes(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload_id = manager.init("clip.mp4", total_size=len(DATA))["upload_id"]
+        with pytest.raises(ConnectionResetError):
+            await manager.append(upload_id, 0, body(DATA[:1000], DATA[1000:2000], DATA[2000:], fail_after=2))
+        offset = (await manager.status(upload_id))["offset"]
+        await manager.append(upload_id, offset, body(DATA[offset:]))
+        return offset, await manager.finalize(upload_id)
+
+    offset, result = asyncio.run(scenario())
+    assert offset == 2000
+    assert result["content_hash"] == hashlib.sha256(DATA).hexdigest()
+
+
+def test_upload_resumes_after_restart(tmp_path):
+    async def before_restart():
+        manager = UploadManager(str(tmp_path))
+        upload_id = manager.init("clip.mp4", total_size=len(DATA))["upload_id"]
+        await manager.append(upload_id, 0, body(DATA[:3000]))
+        return upload_id
+
+    async def after_restart(upload_id):
+        manager = UploadManager(str(tmp_path))
+        status = await manager.status(upload_id)
+        await manager.append(upload_id, status["offset"], body(DATA[status["offset"]:]))
+        return status, await manager.finalize(upload_id)
+
+    upload_id = asyncio.run(before_restart())
+    status, result = asyncio.run(after_restart(upload_id))
+    assert status == {"upload_id": upload_id, "filename": "clip.mp4", "offset": 3000, "total_size": len(DATA)}
+    assert result["content_hash"] == hashlib.sha256(DATA).hexdigest()
+
+
+def test_finalize_rejects_incomplete_upload(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload_id = manager.init("clip.mp4", total_size=len(DATA))["upload_id"]
+        await manager.append(upload_id, 0, body(DATA[:10]))
+        with pytest.raises(UploadOffsetMismatch):
+            await manager.finalize(upload_id)
+
+    asyncio.run(scenario())
+
+
+def test_size_limits(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path), max_bytes=1000)
+        with pytest.raises(UploadTooLarge):
+            manager.init("big.mp4", total_size=1001)
+        upload_id = manager.init("clip.mp4", total_size=500)["upload_id"]
+        with pytest.raises(UploadTooLarge):
+            await manager.append(upload_id, 0, body(DATA[:400], DATA[400:600]))
+        # Bytes up to the limit were kept
+        assert (await manager.status(upload_id))["offset"] == 400
+
+    asyncio.run(scenario())
+
+
+def test_abort_removes_the_session(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload_id = manager.init("clip.mp4")["upload_id"]
+        await manager.abort(upload_id)
+        assert os.listdir(tmp_path) == []
+        with pytest.raises(UploadNotFound):
+            await manager.status(upload_id)
+
+    asyncio.run(scenario())
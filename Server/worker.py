@@ -0,0 +1,162 @@
+"""
+Inference worker for JOB_BACKEND=queue: claims jobs from the durable queue
+the API processes submit to and runs them, so the API tier stays stateless
+and inference scales by starting more workers (on this or other machines).
+
+    python worker.py --concurrency 2 --models medium
+
+Run it from Server/ with the same .env as the API. Workers must share
+JOBS_DB, CACHE_DIR, uploads/ and outputs/ with the API (same machine or a
+shared filesystem). Ctrl+C stops claiming and waits for running jobs; a
+second Ctrl+C exits right away and their leases expire, so another worker
+picks them up after JOB_LEASE_SECONDS.
+"""
+import os
+import sys
+import time
+import uuid
+import signal
+import socket
+import argparse
+import threading
+from typing import Dict
+
+from services.scheduler import JOB_BACKEND, scheduler
+from services.job_queue import JOB_HEARTBEAT_SECONDS, resolve_task
+from services.cancellation import CancelToken, activate
+from services.job_store import job_store
+from services.models import PRELOAD_MODELS, model_registry
+from api.jobs import recover_expired
+
+# Seconds between claim attempts while the queue is empty
+IDLE_POLL_SECONDS = 0.5
+
+
+class Worker:
+    """
+    Runs `concurrency` claim loops plus a heartbeat thread. The heartbeat
+    renews the leases of running jobs, cancels those cancelled through the
+    API and requeues the jobs of workers that died.
+
+    A worker that loses a lease anyway (stalled for longer than the lease,
+    so the job went to another worker) stops the job: its token raises
+    JobLost, and job functions re-check the lease before recording their
+    results, so a stale holder never writes status, outputs or files.
+    """
+
+    def __init__(self, queue, worker_id: str, concurrency: int = 1):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self._running: Dict[str, CancelToken] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def run(self):
+        self.queue.register_worker(self.worker_id, self.concurrency)
+        threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True).start()
+        threads = [
+            threading.Thread(target=self._claim_loop, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(timeout=1)
+        finally:
+            self.queue.unregister_worker(self.worker_id)
+
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+
+    def stop(self):
+        """Stops claiming; running jobs finish first."""
+        self._stopping.set()
+
+    def _claim_loop(self):
+        while not self._stopping.is_set():
+            try:
+                claimed = self.queue.claim(self.worker_id)
+            except Exception as e:
+                print(f"Claim failed: {e}")
+                claimed = None
+            if claimed is None:
+                self._stopping.wait(IDLE_POLL_SECONDS)
+                continue
+            self._run(*claimed)
+
+    def _run(self, job_id: str, task: str, args, kwargs, attempt: int):
+        token = CancelToken(job_id, verify=lambda: self.queue.confirm(job_id, self.worker_id))
+        with self._lock:
+            self._running[job_id] = token
+        print(f"Job {job_id}: {task} (attempt {attempt})")
+        try:
+            fn = resolve_task(task)
+            with activate(token):
+                fn(*args, **kwargs)
+        except Exception as e:
+            # Job functions record their own failures; this is a task that
+            # can't even be imported (e.g. a worker older than the API)
+            print(f"Worker error in job {job_id}: {e}")
+            job_store.update(job_id, status="failed", message=str(e))
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+            self.queue.complete(job_id, self.worker_id)
+
+    def _heartbeat_loop(self):
+        while True:
+            try:
+                with self._lock:
+                    running = dict(self._running)
+                states = self.queue.heartbeat(self.worker_id, list(running))
+                for job_id, state in states.items():
+                    if state == "cancel" and not running[job_id].cancelled:
+                        print(f"Job {job_id}: cancel requested")
+                        running[job_id].cancel()
+                    elif state == "lost" and not running[job_id].lost:
+                        print(f"Job {job_id}: lease lost to another worker, stopping")
+                        running[job_id].lose()
+                recover_expired(self.queue)
+            except Exception as e:
+                print(f"Heartbeat failed: {e}")
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("TRANSCRIPTION_WORKERS", "1")),
+                        help="jobs run at once (default TRANSCRIPTION_WORKERS)")
+    parser.add_argument("--models", nargs="*", default=PRELOAD_MODELS,
+                        help="models to load before claiming jobs (default PRELOAD_MODELS)")
+    parser.add_argument("--id", dest="worker_id", help="worker name (default host-pid-random)")
+    args = parser.parse_args()
+
+    if JOB_BACKEND != "queue":
+        sys.exit("Workers need JOB_BACKEND=queue, for the API processes as well")
+
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    errors = model_registry.preload(args.models)
+    for name, error in errors.items():
+        print(f"Failed to preload {name}: {error}")
+
+    worker = Worker(scheduler, worker_id, args.concurrency)
+
+    def interrupt(signum, frame):
+        if worker.stopping:
+            print("Exiting; running jobs will be requeued once their leases expire")
+            os._exit(1)
+        print("Finishing running jobs (Ctrl+C again to exit now)...")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, interrupt)
+    signal.signal(signal.SIGTERM, interrupt)
+    print(f"Worker {worker_id} ready: {worker.concurrency} slot(s), models {', '.join(args.models) or 'none'}")
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()